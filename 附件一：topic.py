@@ -1,12 +1,15 @@
-import requests
 import re
+import os
+import importlib
 import pandas as pd
+import numpy as np
 import time
 from tqdm import tqdm
 
 # 硅基流动 API 配置
 URL = "https://api.siliconflow.cn/v1/chat/completions"
-TOKEN = "……"  # 替换为你的API密钥
+TOKENS = ["……"]  # 替换为你的API密钥，可填多个，请求会分散到各密钥上（附件二十二）
+RPM_PER_KEY = 30  # 每个密钥每分钟的请求数上限（替代原先每条请求后固定 sleep）
 INPUT_EXCEL = "D:/111PythonLearning/data/帖子.xlsx"  # 输入文件路径（需包含'combine_notes'列）
 OUTPUT_EXCEL = "D:/111PythonLearning/data/deal/result_topic.xlsx"  # 输出文件路径
 
@@ -14,46 +17,87 @@ OUTPUT_EXCEL = "D:/111PythonLearning/data/deal/result_topic.xlsx"  # 输出文
 TOPIC_LIST = ["cattax", "communicate", "daily", "learn", "Music", "取名", "物价对比"]
 
 # 优化后的Prompt（明确要求返回指定主题词或"不相关"）
-PROMPT = """
+# 固定说明和示例放在系统消息中（逐字节不变，可命中服务商的前缀缓存），用户消息只含帖子内容
+PROMPT_INSTRUCTIONS = f"""
 你是社交媒体数据分析专家，需要分析帖子主题：
-1. 从列表中选择与帖子内容最匹配的主题词：{topic_list}
+1. 从列表中选择与帖子内容最匹配的主题词：{"、".join(TOPIC_LIST)}
 2. 若均不匹配，返回"不相关"
 3. 仅返回结果，不添加任何解释、标点或多余文字
-帖子内容：{content}
 """
+PROMPT_EXAMPLES = [
+    ({"帖子内容": "My cat says hi! Paying the cat tax to enter RedNote 🐱"}, "cattax"),
+    ({"帖子内容": "同样一杯咖啡，美国要5美元，国内十几块，物价差距太大了"}, "物价对比"),
+    ({"帖子内容": "Can someone give me a Chinese name? My name is Emily"}, "取名"),
+    ({"帖子内容": "转让二手自行车，九成新，同城自提"}, "不相关"),
+]
+prompts = importlib.import_module("附件二十：提示词构建")
+TOPIC_PROMPT = prompts.PromptBuilder(PROMPT_INSTRUCTIONS, PROMPT_EXAMPLES)
+# 模型梯度使用附件二十一的 MODEL_LADDER：先用小模型，回复无效、"匹配失败"或两次投票不一致时升级
+CHEAP_VOTES = 2  # 小模型的投票次数
+routing = importlib.import_module("附件二十一：模型路由")
 RETRY_TIMES = 3  # 失败重试次数
 SLEEP_SECONDS = 2  # 请求间隔时间
 BATCH_SIZE = 80  # 批量保存间隔
 
-def call_api(content):
+# 本地主题匹配配置（TOPIC_MODE = "local" 时生效）
+TOPIC_MODE = "api"  # "api"：逐条调用API；"local"：本地向量匹配，仅低置信度帖子调用API
+SEED_EXCEL = "D:/111PythonLearning/data/deal/seed_topic.xlsx"  # LLM标注的种子集（格式同输出文件），不存在时自动抽样标注
+SEED_SIZE = 200  # 自动标注的种子帖子数
+NGRAM_SIZES = (1, 2, 3)  # 字符 n-gram 长度
+HASH_DIM = 2 ** 18  # 哈希特征维度
+SIMILARITY_THRESHOLD = 0.15  # 最高相似度低于该值判为"不相关"
+MARGIN_THRESHOLD = 0.02  # 前两名相似度之差低于该值时交给API判断
+MATCH_BATCH = 20000  # 每批相似度计算的帖子数
+
+# 发送给API前清理帖子内容（去链接、话题标签刷屏、重复表情），超出预算时保留首尾
+CONTENT_TOKEN_BUDGET = 600  # combine_notes 的 token 预算（本地估算）
+clip = importlib.import_module("附件十九：文本裁剪")
+
+# 运行监控（延迟、token 用量、失败原因、吞吐量），定期写出状态文件
+STATUS_FILE = None  # 为空时写在输出文件旁：<输出文件>.status.json（或 .prom）
+STATUS_FORMAT = "json"  # "json" 或 "prometheus"
+monitor = importlib.import_module("附件十六：标注监控")
+credentials = importlib.import_module("附件二十二：密钥池")
+reader = importlib.import_module("附件二十三：流式读取")
+metrics = None  # 运行时由 process_excel 创建
+_pool = None  # 首次调用API时按 TOKENS 创建
+_response_cache = {}  # 相同内容只调用一次API
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = credentials.CredentialPool(TOKENS, rpm=RPM_PER_KEY)
+    return _pool
+
+def call_api(content, model=None):
     """调用API获取主题匹配结果"""
-    # 格式化Prompt，传入主题词列表和帖子内容
-    formatted_prompt = PROMPT.format(
-        topic_list=TOPIC_LIST,
-        content=content
-    )
     payload = {
-        "model": "deepseek-ai/DeepSeek-V3",
-        "messages": [{"role": "user", "content": formatted_prompt}],
+        "model": model or routing.MODEL_LADDER[-1],
+        "messages": TOPIC_PROMPT.messages(帖子内容=content),
         "max_tokens": 50,  # 只需返回一个词，减少冗余
         "temperature": 0.1,  # 降低随机性，确保结果稳定
         "top_p": 0.8
     }
     headers = {
-        "Authorization": f"Bearer {TOKEN}",
-        "Content-Type": "application/json"
+        "Content-Type": "application/json"  # Authorization 由密钥池填入
     }
+    start = time.time()
     try:
-        response = requests.post(
+        response = get_pool().post(
             URL,
             json=payload,
             headers=headers,
             timeout=10  # 超时时间设为10秒
         )
         response.raise_for_status()  # 触发HTTP错误（如401、500）
+        data = response.json()
+        if metrics:
+            metrics.observe_request(time.time() - start, data.get('usage'), payload['model'])
         # 提取模型返回的文本（去除首尾空格）
-        return response.json()['choices'][0]['message']['content'].strip()
+        return data['choices'][0]['message']['content'].strip()
     except Exception as e:
+        if metrics:
+            metrics.record_failure(monitor.classify_error(e))
         print(f"API调用异常: {str(e)[:30]}")
         return None  # 失败时返回None
 
@@ -74,17 +118,171 @@ def parse_topic(generated_text):
     # 其他情况视为匹配失败
     return "匹配失败"
 
+def request_with_retry(content, model):
+    """同一模型的网络/服务错误重试，返回原始回复（全部失败时为None）"""
+    for retry in range(RETRY_TIMES):
+        api_result = call_api(content, model)
+        if api_result is not None:
+            return api_result  # 成功获取结果，退出重试
+        time.sleep(SLEEP_SECONDS * (retry + 1))  # 重试间隔递增
+    return None
+
+def is_valid_topic(topic):
+    return topic in TOPIC_LIST or topic == "不相关"
+
+def call_api_with_retry(content):
+    """调用API（带重试机制和模型梯度）并解析主题"""
+    if content in _response_cache:
+        if metrics:
+            metrics.record_cache_hit()
+        return _response_cache[content]
+    prompt_content, tokens_before, tokens_after = clip.fit_text(content, CONTENT_TOKEN_BUDGET)
+    if metrics:
+        metrics.record_truncation(tokens_before, tokens_after)
+    router = routing.ModelRouter(parse_topic, is_valid_topic, votes=CHEAP_VOTES)
+    api_result, topic, _, _ = router.route(lambda model: request_with_retry(prompt_content, model), metrics)
+    if topic == "匹配失败" and metrics:
+        metrics.record_failure("parse_failure")
+    if api_result is not None:
+        _response_cache[content] = topic
+    return topic
+
+
+def start_metrics(total_rows, done_rows=0):
+    """创建本次运行的监控对象"""
+    global metrics
+    status_path = STATUS_FILE or os.path.splitext(OUTPUT_EXCEL)[0] + (
+        ".status.prom" if STATUS_FORMAT == "prometheus" else ".status.json")
+    metrics = monitor.LabelingMetrics("topic", total_rows, status_path, STATUS_FORMAT, done_rows=done_rows)
+    metrics.register_prompt(TOPIC_PROMPT)
+    metrics.register_pool(get_pool())
+    return metrics
+
+#------------------------------------------------------------------------------------------此线下方为本地主题匹配
+def hashed_ngram_tfidf(texts, idf=None):
+    """
+    字符 n-gram 哈希 TF-IDF 向量（行已L2归一化的稀疏矩阵）
+    所有文本拼接为一个码点数组，n-gram 哈希用 numpy 整体计算，跨文本边界的 n-gram 被剔除
+    """
+    from scipy import sparse  # 只有本地模式用到
+    texts = [t.lower() for t in texts]
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    lengths = np.array([len(t) for t in texts])
+    doc_ids = np.repeat(np.arange(len(texts)), lengths)
+    rows, cols = [], []
+    for n in NGRAM_SIZES:
+        if len(codes) < n:
+            continue
+        h = np.zeros(len(codes) - n + 1, dtype=np.int64)
+        for k in range(n):
+            h = (h * 1000003 + codes[k:len(codes) - n + 1 + k]) % 2147483647
+        valid = doc_ids[:len(h)] == doc_ids[n - 1:]  # n-gram 首尾在同一文本内
+        rows.append(doc_ids[:len(h)][valid])
+        cols.append((h[valid] + n * 7919) % HASH_DIM)
+    rows = np.concatenate(rows) if rows else np.array([], dtype=np.int64)
+    cols = np.concatenate(cols) if cols else np.array([], dtype=np.int64)
+    tf = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(texts), HASH_DIM))
+    tf.sum_duplicates()
+    if idf is None:
+        doc_freq = np.bincount(tf.indices, minlength=HASH_DIM)
+        idf = np.log((1 + len(texts)) / (1 + doc_freq)) + 1
+    tfidf = tf.multiply(idf).tocsr()
+    norms = np.sqrt(np.asarray(tfidf.multiply(tfidf).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ tfidf, idf
+
+
+def build_centroids(seed_vectors, seed_labels):
+    """由种子集计算各主题的归一化质心，返回 (主题列表, 质心矩阵)"""
+    seed_labels = np.asarray(seed_labels)
+    topics = [t for t in TOPIC_LIST if (seed_labels == t).any()]
+    centroids = np.vstack([np.asarray(seed_vectors[seed_labels == t].mean(axis=0)) for t in topics])
+    centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+    return topics, centroids
+
+
+def assign_topics(vectors, topics, centroids):
+    """批量余弦相似度匹配，返回 (主题, 最高相似度, 前两名差值)"""
+    labels, best_scores, margins = [], [], []
+    for start in range(0, vectors.shape[0], MATCH_BATCH):
+        sims = np.asarray(vectors[start:start + MATCH_BATCH] @ centroids.T)
+        order = np.argsort(-sims, axis=1)
+        best = sims[np.arange(len(sims)), order[:, 0]]
+        second = sims[np.arange(len(sims)), order[:, 1]] if sims.shape[1] > 1 else np.zeros(len(sims))
+        batch_labels = np.array(topics, dtype=object)[order[:, 0]]
+        batch_labels[best < SIMILARITY_THRESHOLD] = "不相关"
+        labels.append(batch_labels)
+        best_scores.append(best)
+        margins.append(best - second)
+    return np.concatenate(labels), np.concatenate(best_scores), np.concatenate(margins)
+
+
+def load_seed_set(contents):
+    """读取种子集；不存在时随机抽取 SEED_SIZE 条帖子调用API标注并保存"""
+    if os.path.exists(SEED_EXCEL):
+        df_seed = pd.read_excel(SEED_EXCEL, header=None, names=['combine_notes', 'matched_topic'])
+        df_seed = df_seed[df_seed['matched_topic'] != 'matched_topic']  # 去掉可能存在的表头行
+        print(f"读取种子集 {len(df_seed)} 条")
+    else:
+        sample = pd.Series(contents).sample(n=min(SEED_SIZE, len(contents)), random_state=42)
+        seed_data = []
+        answers = credentials.ordered_map(call_api_with_retry, list(sample), get_pool().concurrency)
+        for content, topic in zip(tqdm(sample, desc="标注种子集"), answers):
+            seed_data.append([content, topic])
+        df_seed = pd.DataFrame(seed_data, columns=['combine_notes', 'matched_topic'])
+        df_seed.to_excel(SEED_EXCEL, index=False, header=False)
+        print(f"种子集已保存至：{SEED_EXCEL}")
+    return df_seed[df_seed['matched_topic'].isin(TOPIC_LIST)]
+
+
+def process_excel_local():
+    """本地模式：向量化匹配全部帖子，仅把低置信度帖子交给API"""
+    try:
+        if 'combine_notes' not in reader.read_header(INPUT_EXCEL):
+            print("错误：输入文件必须包含'combine_notes'列（帖子内容）")
+            return
+        # 向量化需要全部帖子，但只读取'combine_notes'一列
+        contents = [str(c).strip() if pd.notna(c) else "" for c, in reader.iter_rows(INPUT_EXCEL, ['combine_notes'])]
+    except Exception as e:
+        print(f"读取输入文件失败：{e}")
+        return
+    print(f"成功读取数据，共 {len(contents)} 条帖子")
+
+    df_seed = load_seed_set(contents)
+    if df_seed.empty:
+        print("错误：种子集中没有有效主题，无法构建质心")
+        return
+    vectors, idf = hashed_ngram_tfidf(contents)
+    seed_vectors, _ = hashed_ngram_tfidf(df_seed['combine_notes'].astype(str).tolist(), idf=idf)
+    topics, centroids = build_centroids(seed_vectors, df_seed['matched_topic'].tolist())
+    labels, best_scores, margins = assign_topics(vectors, topics, centroids)
+
+    # 低置信度：相似度过阈值但前两名难以区分
+    uncertain = np.where((best_scores >= SIMILARITY_THRESHOLD) & (margins < MARGIN_THRESHOLD))[0]
+    print(f"本地匹配完成，{len(uncertain)} 条低置信度帖子交由API判断")
+    start_metrics(len(uncertain))
+    results = credentials.ordered_map(call_api_with_retry, [contents[i] for i in uncertain], get_pool().concurrency)
+    for i, topic in zip(tqdm(uncertain, desc="API复核"), results):
+        labels[i] = topic
+        metrics.record_row()
+    print(metrics.summary())
+
+    result_data = [['combine_notes', 'matched_topic']] + [[c, t] for c, t in zip(contents, labels)]
+    pd.DataFrame(result_data).to_excel(OUTPUT_EXCEL, index=False, header=False)
+    print(f"\n全部处理完成！结果已保存至：{OUTPUT_EXCEL}")
+    print(pd.Series(labels).value_counts())
+
+
 def process_excel():
     """主函数：处理Excel文件，批量分析帖子主题"""
-    # 1. 读取输入数据（仅保留必要的'combine_notes'列）
+    # 1. 检查输入（只读表头和行数；'combine_notes'列在处理时流式读取，见附件二十三）
     try:
-        df_input = pd.read_excel(INPUT_EXCEL)
         # 检查必要列是否存在
-        if 'combine_notes' not in df_input.columns:
+        if 'combine_notes' not in reader.read_header(INPUT_EXCEL):
             print("错误：输入文件必须包含'combine_notes'列（帖子内容）")
             return
-        total_rows = len(df_input)
-        print(f"成功读取数据，共 {total_rows} 条帖子")
+        total_rows = reader.count_rows(INPUT_EXCEL)
+        print(f"成功读取数据，共 {total_rows if total_rows is not None else '未知'} 条帖子")
     except Exception as e:
         print(f"读取输入文件失败：{e}")
         return
@@ -103,42 +301,33 @@ def process_excel():
         # 首次运行：添加表头
         result_data.append(['combine_notes', 'matched_topic'])  # 帖子内容 | 匹配的主题
 
-    # 3. 逐行处理帖子
+    # 3. 逐行处理帖子（多线程，请求分散到密钥池的各个密钥上，按原顺序返回）
+    start_metrics(total_rows, processed_count)
+    # 获取帖子内容（处理空值），从续传位置开始边读边请求，跳过的行不会被读入内存
+    contents = (str(c).strip() if pd.notna(c) else ""
+                for c, in reader.iter_rows(INPUT_EXCEL, ['combine_notes'], start=processed_count))
     try:
+        # 调用API（带重试机制）并解析结果
+        results = credentials.ordered_map(lambda c: (c, call_api_with_retry(c)), contents, get_pool().concurrency)
         # 进度条：从已处理的行数开始
-        pbar = tqdm(range(processed_count, total_rows), desc="处理进度", initial=processed_count)
-        for i in pbar:
-            row = df_input.iloc[i]
-            # 获取帖子内容（处理空值）
-            content = str(row['combine_notes']).strip() if pd.notna(row['combine_notes']) else ""
-
-            # 调用API（带重试机制）
-            api_result = None
-            for retry in range(RETRY_TIMES):
-                api_result = call_api(content)
-                if api_result is not None:
-                    break  # 成功获取结果，退出重试
-                time.sleep(SLEEP_SECONDS * (retry + 1))  # 重试间隔递增
-
-            # 解析结果
-            matched_topic = parse_topic(api_result)
-
+        pbar = tqdm(results, desc="处理进度", initial=processed_count, total=total_rows)
+        for content, matched_topic in pbar:
             # 保存到结果列表
             result_data.append([content, matched_topic])
             processed_count += 1
+            metrics.record_row()
+            pbar.set_postfix(metrics.postfix())
 
             # 批量保存（减少文件写入次数）
-            if processed_count % BATCH_SIZE == 0 or i == total_rows - 1:
+            if processed_count % BATCH_SIZE == 0:
                 pd.DataFrame(result_data).to_excel(OUTPUT_EXCEL, index=False, header=False)
-                pbar.set_postfix({"已保存": f"{processed_count}行"})  # 进度条显示保存状态
-
-            # 控制API调用频率
-            time.sleep(SLEEP_SECONDS)
+                pbar.set_postfix({**metrics.postfix(), "已保存": f"{processed_count}行"})  # 进度条显示保存状态
 
         # 最终保存
         pd.DataFrame(result_data).to_excel(OUTPUT_EXCEL, index=False, header=False)
         print(f"\n全部处理完成！结果已保存至：{OUTPUT_EXCEL}")
         print(f"输出格式：2列（combine_notes: 帖子内容, matched_topic: 匹配的主题）")
+        print(metrics.summary())
 
     except Exception as e:
         # 遇到致命错误时，立即保存已处理的结果
@@ -147,4 +336,7 @@ def process_excel():
 
 
 if __name__ == "__main__":
-    process_excel()
+    if TOPIC_MODE == "local":
+        process_excel_local()
+    else:
+        process_excel()
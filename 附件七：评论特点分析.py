@@ -1,44 +1,252 @@
+import importlib
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pprint import pprint
-plt.rcParams['font.sans-serif'] = ['SimHei']
-plt.rcParams['axes.unicode_minus'] = False
+PLOT_RC = {'font.sans-serif': ['SimHei'], 'axes.unicode_minus': False}
+plotting = importlib.import_module("附件十一：降采样绘图")  # 绘图时才导入 matplotlib
+tracing = importlib.import_module("附件十五：性能追踪")
 
 file_path = "D:\信管专业\社会计算\社会计算小组作业\评论update.xlsx"
-excel_file = pd.ExcelFile(file_path)
-df = excel_file.parse('有标记的')
-df =df[df['user_origin'] != 0]
-
-pivot_table = df.pivot_table(index='user_origin', columns='sentiment', values='评论ID', aggfunc='count').fillna(0)
-percentage_table = pivot_table.div(pivot_table.sum(axis=1), axis=0) * 100
-percentage_table = percentage_table.loc[:, (percentage_table > 0.1).any()]
-print(percentage_table.round(2))
-
-bar_width = 0.2
-index = np.arange(len(percentage_table.columns))
-for i, country in enumerate(percentage_table.index):
-    plt.bar(index + i * bar_width, percentage_table.loc[country], bar_width, label=country)
-
-plt.title('不同国家用户的sentiment分布百分比情况')
-plt.xlabel('sentiment')
-plt.xticks(rotation=45)
-plt.ylabel('百分比（%）')
-plt.xticks(index + bar_width * (len(percentage_table.index) - 1) / 2, percentage_table.columns)
-plt.legend()
-
-
-for i, country in enumerate(percentage_table.index):
-    for j, value in enumerate(percentage_table.loc[country]):
-        plt.text(index[j] + i * bar_width, value, f'{value:.2f}%', ha='center', va='bottom', fontsize=8)
-
-# plt.show()
-
-
-pd.set_option('display.max_columns', None)
-pd.set_option('display.max_rows', None)
-pd.set_option('display.width', None)
-df['arousal'] = pd.to_numeric(df['arousal'], errors='coerce')
-grouped_data = df.groupby('user_origin')[['valence','arousal', 'dominance']].describe()
-print('愉悦度和支配度的唤醒度统计信息：')
-pprint(grouped_data)
+# 归档数据（Parquet 或 CSV，可为多个分片），为空时使用上面的 Excel 全量读取
+archive_paths = []
+CHUNK_SIZE = 100000  # CSV 每块读取行数
+VAD_COLUMNS = ['valence', 'arousal', 'dominance']
+
+
+class QuantileSketch:
+    """可合并的分位数草图：按精度分箱计数，箱数超过上限时自动降低精度"""
+
+    def __init__(self, precision=2, max_bins=2048):
+        self.precision = precision
+        self.max_bins = max_bins
+        self.bins = Counter()
+
+    def update(self, values):
+        values = np.round(np.asarray(values, dtype=float), self.precision)
+        uniq, counts = np.unique(values[~np.isnan(values)], return_counts=True)
+        self.bins.update(dict(zip(uniq.tolist(), counts.tolist())))
+        self._compress()
+
+    def merge(self, other):
+        if other.precision < self.precision:
+            self.precision = other.precision
+            self._rebin()
+        elif other.precision > self.precision:
+            other = other.copy_with_precision(self.precision)
+        self.bins.update(other.bins)
+        self._compress()
+        return self
+
+    def copy_with_precision(self, precision):
+        sketch = QuantileSketch(precision, self.max_bins)
+        sketch.bins = self.bins.copy()
+        sketch._rebin()
+        return sketch
+
+    def _rebin(self):
+        rebinned = Counter()
+        for value, count in self.bins.items():
+            rebinned[round(value, self.precision)] += count
+        self.bins = rebinned
+
+    def _compress(self):
+        while len(self.bins) > self.max_bins:
+            self.precision -= 1
+            self._rebin()
+
+    def quantile(self, q):
+        """与 pandas 默认的线性插值方式一致"""
+        if not self.bins:
+            return np.nan
+        values = np.array(sorted(self.bins))
+        counts = np.array([self.bins[v] for v in values])
+        cum = np.cumsum(counts)
+        pos = q * (cum[-1] - 1)  # 在完整排序序列中的位置
+        lower = values[np.searchsorted(cum, np.floor(pos) + 1)]
+        upper = values[np.searchsorted(cum, np.ceil(pos) + 1)]
+        return lower + (upper - lower) * (pos - np.floor(pos))
+
+
+class OriginSentimentAccumulator:
+    """
+    流式统计 user_origin × sentiment 的列联表以及各来源的 VAD 描述统计
+    - 计数精确
+    - 均值和方差使用 (count, mean, M2) 形式，可按 Chan 公式合并
+    - 分位数使用 QuantileSketch 近似
+    多个进程各自累加后可用 merge 合并
+    """
+
+    def __init__(self):
+        self.counts = Counter()  # (user_origin, sentiment) -> 评论数
+        self.moments = defaultdict(lambda: [0, 0.0, 0.0, np.inf, -np.inf])  # (origin, 维度) -> [n, mean, M2, min, max]
+        self.sketches = {}  # (origin, 维度) -> QuantileSketch
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['moments'] = dict(self.moments)
+        return state
+
+    def __setstate__(self, state):
+        moments = state.pop('moments')
+        self.__dict__.update(state)
+        self.moments = defaultdict(lambda: [0, 0.0, 0.0, np.inf, -np.inf], moments)
+
+    @staticmethod
+    def _combine(a, b):
+        n_a, mean_a, m2_a, min_a, max_a = a
+        n_b, mean_b, m2_b, min_b, max_b = b
+        n = n_a + n_b
+        if n == 0:
+            return a
+        delta = mean_b - mean_a
+        mean = mean_a + delta * n_b / n
+        m2 = m2_a + m2_b + delta ** 2 * n_a * n_b / n
+        return [n, mean, m2, min(min_a, min_b), max(max_a, max_b)]
+
+    def update(self, chunk):
+        chunk = chunk[~chunk['user_origin'].isin([0, '0'])]  # 解析失败的行
+        chunk = chunk.dropna(subset=['user_origin'])
+        # 列联表（与 pivot_table 的 count 一致，只统计评论ID非空的行）
+        counted = chunk.dropna(subset=['评论ID', 'sentiment'])
+        self.counts.update(counted.groupby(['user_origin', 'sentiment']).size().to_dict())
+
+        for col in VAD_COLUMNS:
+            values = pd.to_numeric(chunk[col], errors='coerce')
+            stats = pd.DataFrame({'origin': chunk['user_origin'], 'v': values}).dropna()
+            for origin, group in stats.groupby('origin')['v']:
+                arr = group.to_numpy(dtype=float)
+                part = [len(arr), arr.mean(), ((arr - arr.mean()) ** 2).sum(), arr.min(), arr.max()]
+                key = (origin, col)
+                self.moments[key] = self._combine(self.moments[key], part)
+                self.sketches.setdefault(key, QuantileSketch()).update(arr)
+        return self
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        for key, part in other.moments.items():
+            self.moments[key] = self._combine(self.moments[key], part)
+        for key, sketch in other.sketches.items():
+            if key in self.sketches:
+                self.sketches[key].merge(sketch)
+            else:
+                self.sketches[key] = sketch
+        return self
+
+    def percentage_table(self):
+        """等价于 pivot_table 后按行求百分比，并过滤占比均不超过0.1%的情感"""
+        pivot_table = pd.Series(self.counts, dtype=float).unstack(fill_value=0)
+        pivot_table.index.name, pivot_table.columns.name = 'user_origin', 'sentiment'
+        percentage_table = pivot_table.div(pivot_table.sum(axis=1), axis=0) * 100
+        return percentage_table.loc[:, (percentage_table > 0.1).any()]
+
+    def describe(self):
+        """等价于 groupby('user_origin')[VAD].describe()"""
+        rows = defaultdict(dict)
+        for (origin, col), (n, mean, m2, vmin, vmax) in sorted(self.moments.items()):
+            sketch = self.sketches[(origin, col)]
+            stats = {
+                'count': float(n),
+                'mean': mean,
+                'std': np.sqrt(m2 / (n - 1)) if n > 1 else np.nan,
+                'min': vmin,
+                '25%': sketch.quantile(0.25),
+                '50%': sketch.quantile(0.5),
+                '75%': sketch.quantile(0.75),
+                'max': vmax,
+            }
+            for stat, value in stats.items():
+                rows[origin][(col, stat)] = value
+        result = pd.DataFrame.from_dict(rows, orient='index')
+        result.index.name = 'user_origin'
+        return result.reindex(columns=pd.MultiIndex.from_product(
+            [VAD_COLUMNS, ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']]))
+
+
+def iter_chunks(path, chunk_size=CHUNK_SIZE):
+    """按 Parquet 行组或 CSV 分块读取，只读取需要的列"""
+    columns = ['评论ID', 'user_origin', 'sentiment'] + VAD_COLUMNS
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        for i in range(parquet_file.num_row_groups):
+            yield parquet_file.read_row_group(i, columns=columns).to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size)
+
+
+def accumulate_file(path):
+    accumulator = OriginSentimentAccumulator()
+    for chunk in iter_chunks(path):
+        accumulator.update(chunk)
+    return accumulator
+
+
+@tracing.traced()
+def accumulate_archive(paths, n_workers=None):
+    """每个分片交给一个进程累加，最后合并"""
+    accumulator = OriginSentimentAccumulator()
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        for partial in executor.map(accumulate_file, paths):
+            accumulator.merge(partial)
+    return accumulator
+
+
+@tracing.traced()
+def plot_percentage_table(percentage_table):
+    plt = plotting.pyplot(PLOT_RC)
+    bar_width = 0.2
+    index = np.arange(len(percentage_table.columns))
+    for i, country in enumerate(percentage_table.index):
+        plt.bar(index + i * bar_width, percentage_table.loc[country], bar_width, label=country)
+
+    plt.title('不同国家用户的sentiment分布百分比情况')
+    plt.xlabel('sentiment')
+    plt.xticks(rotation=45)
+    plt.ylabel('百分比（%）')
+    plt.xticks(index + bar_width * (len(percentage_table.index) - 1) / 2, percentage_table.columns)
+    plt.legend()
+
+
+    for i, country in enumerate(percentage_table.index):
+        for j, value in enumerate(percentage_table.loc[country]):
+            plt.text(index[j] + i * bar_width, value, f'{value:.2f}%', ha='center', va='bottom', fontsize=8)
+
+    # plt.show()
+
+
+@tracing.traced()
+def compute_origin_tables(file_path, archive_paths=()):
+    """返回 (情感百分比表, VAD 描述统计)，有归档分片时使用流式累加"""
+    if archive_paths:
+        accumulator = accumulate_archive(archive_paths)
+        percentage_table = accumulator.percentage_table()
+        grouped_data = accumulator.describe()
+    else:
+        excel_file = pd.ExcelFile(file_path)
+        df = excel_file.parse('有标记的')
+        df =df[df['user_origin'] != 0]
+
+        pivot_table = df.pivot_table(index='user_origin', columns='sentiment', values='评论ID', aggfunc='count').fillna(0)
+        percentage_table = pivot_table.div(pivot_table.sum(axis=1), axis=0) * 100
+        percentage_table = percentage_table.loc[:, (percentage_table > 0.1).any()]
+        df['arousal'] = pd.to_numeric(df['arousal'], errors='coerce')
+        grouped_data = df.groupby('user_origin')[['valence','arousal', 'dominance']].describe()
+    return percentage_table, grouped_data
+
+
+def main():
+    percentage_table, grouped_data = compute_origin_tables(file_path, archive_paths)
+    print(percentage_table.round(2))
+    plot_percentage_table(percentage_table)
+
+    pd.set_option('display.max_columns', None)
+    pd.set_option('display.max_rows', None)
+    pd.set_option('display.width', None)
+    print('愉悦度和支配度的唤醒度统计信息：')
+    pprint(grouped_data)
+
+
+if __name__ == "__main__":
+    main()
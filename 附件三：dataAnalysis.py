@@ -1,17 +1,64 @@
 import os
 import re
+import importlib
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
-import matplotlib.dates as mdates
 from collections import defaultdict
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 
-plt.rcParams["font.family"] = ["SimHei", "WenQuanYi Micro Hei", "Heiti TC"]
-plt.rcParams["axes.unicode_minus"] = False  
+PLOT_RC = {"font.family": ["SimHei", "WenQuanYi Micro Hei", "Heiti TC"], "axes.unicode_minus": False}
+plotting = importlib.import_module("附件十一：降采样绘图")  # 绘图时才导入 matplotlib / seaborn
+tracing = importlib.import_module("附件十五：性能追踪")  # 设置环境变量 XHS_TRACE 后记录各阶段耗时
+sampling = importlib.import_module("附件二十五：分层抽样")
+comment_join = importlib.import_module("附件二十七：评论索引")
 
+# 用户类型识别使用的地区列表（附件十七的SQL视图也引用这里）
+FOREIGN_LOCATIONS = [
+    "美国", "澳大利亚", "比利时", "意大利", "加拿大", "英国", "法国", "德国", "新加坡", "日本", "韩国", "俄罗斯", "西班牙", "荷兰",
+    "瑞典", "挪威", "丹麦", "芬兰"
+]
+CHINESE_LOCATIONS = [
+    "北京", "上海", "天津", "重庆", "河北", "山西", "辽宁", "吉林", "黑龙江",
+    "江苏", "浙江", "安徽", "福建", "江西", "山东", "河南", "湖北", "湖南",
+    "广东", "海南", "四川", "贵州", "云南", "陕西", "甘肃", "青海", "台湾",
+    "内蒙古", "广西", "西藏", "宁夏", "新疆", "香港", "澳门", "中国"
+]
 
+# 互助内容类型关键词
+HELP_CATEGORIES = {
+    "实用知识": ["教程", "方法", "步骤", "怎么", "如何", "攻略", "技巧", 
+              "teach", "how to", "guide", "method", "step"],
+    "情感支持": ["欢迎", "加油", "支持", "鼓励", "开心", "理解", 
+              "welcome", "support", "encourage", "happy", "glad"],
+    "娱乐互动": ["哈哈", "搞笑", "可爱", "有趣", "笑死", 
+              "funny", "cute", "haha", "lol", "interesting"]
+}
+
+# 各分析用到的列：分析时只取这些列（不再整表深拷贝），并行模式下也只向子进程共享这些列
+ANALYSIS_COLUMNS = {
+    "analyze_bilingual_advantage": {"posts": ["笔记详情", "评论数", "点赞数", "收藏数", "用户类型",
+                                             "评论条数", "外国评论占比", "评论valence均值"]},
+    "analyze_content_preference": {"posts": ["发布时间", "笔记类型", "用户类型"]},
+    "analyze_emotion_impact": {"posts": ["发布时间", "笔记详情", "用户类型"], "comments": ["评论内容", "评论时间"]},
+    "analyze_help_content": {"comments": ["评论内容", "点赞数"]},
+}
+PARALLEL_ANALYSIS = False  # 为 True 时四项分析在子进程中并行运行，数据经共享内存（Arrow IPC 文件 + 内存映射）传给子进程
+ANALYSIS_WORKERS = 4
+SHARE_DIR = "/dev/shm"  # 共享文件所在目录（Linux 的内存文件系统）；不存在时（如 Windows）用系统临时目录
+# 近似模式：情感冲击分析在关键词识别前按 日期×用户类型 分层抽样，情感占比换算回总体并画出置信区间，供快速探索；
+# 最终报告请用精确模式
+APPROX_MODE = False
+APPROX_SAMPLE_SIZE = 20000  # 每个数据来源（帖子 / 评论）的样本量
+
+
+def select_columns(df, columns):
+    """按列名投影（忽略不存在的列）；浅拷贝只是为了能直接加列而不触发 SettingWithCopyWarning，不复制数据"""
+    return df[[col for col in columns if col in df.columns]].copy(deep=False)
+
+
+@tracing.traced()
 def clean_column(series):
     def extract_number(text):
         if pd.isna(text):
@@ -43,10 +90,12 @@ def clean_column(series):
     return series.apply(extract_number)
 
 # 数据加载与预处理
-def load_data(data_dir="xhs_data"):
+@tracing.traced()
+def load_data(data_dir="xhs_data", dedup=True):
     
-    # 读取所有Excel文件
-    all_files = [f for f in os.listdir(data_dir) if f.endswith(('.xlsx', '.xls'))]
+    # 读取所有Excel文件和增量入库的Parquet分片（附件二十八）（按修改时间排序，去重时后加载的视为最新）
+    all_files = [f for f in os.listdir(data_dir) if f.endswith(('.xlsx', '.xls', '.parquet'))]
+    all_files.sort(key=lambda f: os.path.getmtime(os.path.join(data_dir, f)))
     if not all_files:
         raise ValueError(f"在 '{data_dir}' 中未找到Excel文件")
     
@@ -58,7 +107,9 @@ def load_data(data_dir="xhs_data"):
     for file in all_files:
         file_path = os.path.join(data_dir, file)
         try:
-            df = pd.read_excel(file_path)
+            with tracing.trace_span(f"read_excel:{file}") as span:
+                df = pd.read_parquet(file_path) if file.endswith('.parquet') else pd.read_excel(file_path)
+                span.rows = len(df)
             if "帖子" in file or "笔记" in file:
                 if data["posts"] is None:
                     data["posts"] = df
@@ -73,32 +124,31 @@ def load_data(data_dir="xhs_data"):
         except Exception as e:
             print(f"加载 {file} 失败: {str(e)}")
 
+    # 重叠的爬取文件去重
+    if dedup:
+        dedup_module = importlib.import_module("附件九：去重")
+        data["posts"], data["posts_dedup_report"] = dedup_module.deduplicate(data["posts"], name="帖子")
+        data["comments"], data["comments_dedup_report"] = dedup_module.deduplicate(data["comments"], name="评论")
+
+    return preprocess_data(data)
+
+# 数据预处理（类型转换、计数列清洗、用户类型识别）
+@tracing.traced()
+def preprocess_data(data):
+
     def classify_user_type(ip_location):
         if not isinstance(ip_location, str):
             return "未知"
         
         ip_location = ip_location.strip()
         
-        # 定义外国地区列表
-        foreign_locations = [
-            "美国", "澳大利亚", "比利时", "意大利", "加拿大", "英国", "法国", "德国", "新加坡", "日本", "韩国", "俄罗斯", "西班牙", "荷兰",
-            "瑞典", "挪威", "丹麦", "芬兰"
-        ]
-        
         # 判断是否为外国用户
-        for location in foreign_locations:
+        for location in FOREIGN_LOCATIONS:
             if location in ip_location:
                 return "外国用户"
         
         # 如果包含中国省市名称，判断为中国用户
-        chinese_locations = [
-            "北京", "上海", "天津", "重庆", "河北", "山西", "辽宁", "吉林", "黑龙江",
-            "江苏", "浙江", "安徽", "福建", "江西", "山东", "河南", "湖北", "湖南",
-            "广东", "海南", "四川", "贵州", "云南", "陕西", "甘肃", "青海", "台湾",
-            "内蒙古", "广西", "西藏", "宁夏", "新疆", "香港", "澳门", "中国"
-        ]
-        
-        for location in chinese_locations:
+        for location in CHINESE_LOCATIONS:
             if location in ip_location:
                 return "中国用户"
         return "未知"
@@ -145,15 +195,21 @@ def load_data(data_dir="xhs_data"):
         
         data["comments"] = comments_df
     
+    # 按笔记ID把评论聚合量（评论条数、外国评论占比、VAD均值、最高赞评论）挂到帖子上
+    data["posts"], data["comment_index"] = comment_join.join_comments(data["posts"], data["comments"])
+    
     print(f"\n数据加载完成 - 帖子数: {len(data['posts']) if data['posts'] is not None else 0}, "
           f"评论数: {len(data['comments']) if data['comments'] is not None else 0}")
     return data
 
 # 双语内容互动优势分析
+@tracing.traced()
 def analyze_bilingual_advantage(data):
     print("\n开始分析双语内容的互动优势")
+    import seaborn as sns
+    plt = plotting.pyplot(PLOT_RC)
     
-    posts_df = data["posts"].copy()
+    posts_df = select_columns(data["posts"], ANALYSIS_COLUMNS["analyze_bilingual_advantage"]["posts"])
     
     required_cols = ["笔记详情", "评论数", "点赞数", "用户类型"]
     if not all(col in posts_df.columns for col in required_cols):
@@ -192,12 +248,20 @@ def analyze_bilingual_advantage(data):
     valid_df["评论互动率"] = valid_df["评论数"] / valid_df["浏览量估算"]
     valid_df["点赞互动率"] = valid_df["点赞数"] / valid_df["浏览量估算"]
     
-    result = valid_df.groupby(["用户类型", "语言类型"]).agg({
+    aggregations = {
         "评论互动率": ["mean", "count"],
         "点赞互动率": ["mean"]
-    }).round(4)
-    
-    result.columns = ["平均评论互动率", "样本数", "平均点赞互动率"]
+    }
+    names = ["平均评论互动率", "样本数", "平均点赞互动率"]
+    # 连接评论后才有的笔记级评论指标
+    for col, name in [("评论条数", "平均实际评论条数"), ("外国评论占比", "平均外国评论占比"),
+                      ("评论valence均值", "平均评论valence")]:
+        if col in valid_df.columns:
+            aggregations[col] = ["mean"]
+            names.append(name)
+    result = valid_df.groupby(["用户类型", "语言类型"]).agg(aggregations).round(4)
+    
+    result.columns = names
     result = result.reset_index()
     
     # 可视化
@@ -228,13 +292,16 @@ def analyze_bilingual_advantage(data):
 
 
 # 内容形式的中外偏好差异分析
+@tracing.traced()
 def analyze_content_preference(data):
     print("\n开始分析内容形式的中外偏好差异")
+    import seaborn as sns
+    plt = plotting.pyplot(PLOT_RC)
     if data["posts"] is None:
         print("没有帖子数据，无法进行分析")
         return
     
-    posts_df = data["posts"].copy()
+    posts_df = select_columns(data["posts"], ANALYSIS_COLUMNS["analyze_content_preference"]["posts"])
 
     required_cols = ["发布时间", "笔记类型", "用户类型"]
     if not all(col in posts_df.columns for col in required_cols):
@@ -301,13 +368,15 @@ def analyze_content_preference(data):
     return monthly_data
 
 # 关键事件对情感的冲击分析
-def analyze_emotion_impact(data):
+@tracing.traced()
+def analyze_emotion_impact(data, approx=APPROX_MODE, sample_size=APPROX_SAMPLE_SIZE):
     print("\n开始分析关键事件对情感的冲击")
+    plt = plotting.pyplot(PLOT_RC)
     if data["posts"] is None:
         print("没有帖子数据，无法进行分析")
         return
     
-    posts_df = data["posts"].copy()
+    posts_df = select_columns(data["posts"], ANALYSIS_COLUMNS["analyze_emotion_impact"]["posts"])
     
     required_cols = ["发布时间", "笔记详情", "用户类型"]
     if not all(col in posts_df.columns for col in required_cols):
@@ -316,6 +385,10 @@ def analyze_emotion_impact(data):
     
     valid_df = posts_df.dropna(subset=["发布时间", "笔记详情"]).copy()
     valid_df = valid_df[valid_df["发布时间"].dt.year == 2025].copy()
+    sample_columns = ["用户类型", sampling.POP_COLUMN, sampling.SIZE_COLUMN] if approx else []
+    if approx:
+        valid_df["发布日期"] = valid_df["发布时间"].dt.date
+        valid_df = sampling.draw_sample(valid_df, ["发布日期", "用户类型"], sample_size)
     # 定义情感关键词
     emotion_keywords = {
         "焦虑恐惧": [
@@ -380,20 +453,24 @@ def analyze_emotion_impact(data):
     all_emotion_data = []
     
     # 添加帖子数据
-    posts_emotion = valid_df[["发布时间", "情感类型"]].copy()
+    posts_emotion = select_columns(valid_df, ["发布时间", "情感类型", *sample_columns])
     posts_emotion["数据来源"] = "帖子"
     all_emotion_data.append(posts_emotion)
 
     # 评论数据情感分析
     if data["comments"] is not None:
-        comments_df = data["comments"].copy()
+        comments_df = select_columns(data["comments"], ANALYSIS_COLUMNS["analyze_emotion_impact"]["comments"])
         if "评论内容" in comments_df.columns and "评论时间" in comments_df.columns:
             comments_valid = comments_df.dropna(subset=["评论内容", "评论时间"]).copy()
             comments_valid = comments_valid[comments_valid["评论时间"].dt.year == 2025].copy()
+            if approx:
+                comments_valid["发布日期"] = comments_valid["评论时间"].dt.date
+                comments_valid = sampling.draw_sample(comments_valid, ["发布日期"], sample_size)
+                comments_valid["用户类型"] = "全部"  # 评论不区分用户类型，按日期分层
             
             comments_valid["情感类型"] = comments_valid["评论内容"].apply(detect_emotion_enhanced)
             
-            comments_emotion = comments_valid[["评论时间", "情感类型"]].copy()
+            comments_emotion = comments_valid[["评论时间", "情感类型", *sample_columns]]
             comments_emotion = comments_emotion.rename(columns={"评论时间": "发布时间"})
             comments_emotion["数据来源"] = "评论"
             all_emotion_data.append(comments_emotion)
@@ -416,13 +493,20 @@ def analyze_emotion_impact(data):
         "2025-06-19": "特朗普再次延期90天",
     }
     
-    # 按用户类型、日期和情感类型分组统计
-    daily_emotion = combined_df.groupby(["发布日期", "情感类型"]).size().reset_index(name="数量")
-    
-    # 计算每日总条数
-    daily_total = combined_df.groupby("发布日期").size().reset_index(name="总数量")
-    daily_emotion = pd.merge(daily_emotion, daily_total, on="发布日期")
-    daily_emotion["情感占比"] = daily_emotion["数量"] / daily_emotion["总数量"]
+    if approx:
+        # 每日总条数由各层总体行数精确得到，各情感的数量和占比为总体估计
+        daily_emotion = sampling.estimate_shares(
+            combined_df, ["数据来源", "发布日期", "用户类型"], ["发布日期"], "情感类型"
+        ).rename(columns={"总体数": "总数量", "占比": "情感占比",
+                          "占比_下限": "情感占比_下限", "占比_上限": "情感占比_上限"})
+    else:
+        # 按用户类型、日期和情感类型分组统计
+        daily_emotion = combined_df.groupby(["发布日期", "情感类型"]).size().reset_index(name="数量")
+        
+        # 计算每日总条数
+        daily_total = combined_df.groupby("发布日期").size().reset_index(name="总数量")
+        daily_emotion = pd.merge(daily_emotion, daily_total, on="发布日期")
+        daily_emotion["情感占比"] = daily_emotion["数量"] / daily_emotion["总数量"]
     
     # 过滤出有效情感数据
     emotion_df = daily_emotion[~daily_emotion["情感类型"].isin(["未识别", "中性"])]
@@ -430,15 +514,17 @@ def analyze_emotion_impact(data):
     # 过滤出有情感标签的数据
     emotion_df = daily_emotion[daily_emotion["情感类型"] != "未识别"]
     
+    smooth_columns = [col for col in ["情感占比", "情感占比_下限", "情感占比_上限"] if col in emotion_df.columns]
     emotion_df_smooth = emotion_df.copy()
     for emotion in emotion_df["情感类型"].unique():
         emotion_data = emotion_df[emotion_df["情感类型"] == emotion].sort_values("发布日期")
-        if len(emotion_data) >= 3:
-            emotion_df_smooth.loc[emotion_df_smooth["情感类型"] == emotion, "情感占比平滑"] = \
-                emotion_data["情感占比"].rolling(window=3, center=True, min_periods=1).mean()
-        else:
-            emotion_df_smooth.loc[emotion_df_smooth["情感类型"] == emotion, "情感占比平滑"] = \
-                emotion_data["情感占比"]
+        for col in smooth_columns:
+            if len(emotion_data) >= 3:
+                emotion_df_smooth.loc[emotion_df_smooth["情感类型"] == emotion, col + "平滑"] = \
+                    emotion_data[col].rolling(window=3, center=True, min_periods=1).mean()
+            else:
+                emotion_df_smooth.loc[emotion_df_smooth["情感类型"] == emotion, col + "平滑"] = \
+                    emotion_data[col]
     
     # 可视化
     plt.figure(figsize=(16, 10))
@@ -449,11 +535,17 @@ def analyze_emotion_impact(data):
         emotion_data = emotion_df_smooth[emotion_df_smooth["情感类型"] == emotion].sort_values("发布日期")
         if not emotion_data.empty:
             plt.plot(emotion_data["发布日期"], emotion_data["情感占比平滑"], 
-                    'o-', label=f'{emotion} (n={emotion_data["数量"].sum()})', 
+                    'o-', label=f'{emotion} (n={emotion_data["数量"].sum():.0f})', 
                     color=colors.get(emotion, '#999999'), 
                     linewidth=2.5, markersize=5, alpha=0.8)
-    
-    plt.title("TikTok事件全体用户情感变化趋势", fontsize=16, fontweight='bold', pad=20)
+            if approx:
+                plt.fill_between(emotion_data["发布日期"], emotion_data["情感占比_下限平滑"],
+                                 emotion_data["情感占比_上限平滑"], color=colors.get(emotion, '#999999'), alpha=0.15)
+    
+    title = "TikTok事件全体用户情感变化趋势"
+    if approx:
+        title += f"（近似：分层样本，阴影为{sampling.CI_LEVEL:.0%}置信区间）"
+    plt.title(title, fontsize=16, fontweight='bold', pad=20)
     plt.ylabel("情感占比", fontsize=12)
     plt.xlabel("日期", fontsize=12)
    
@@ -486,13 +578,15 @@ def analyze_emotion_impact(data):
     return emotion_df
 
 # 互助内容的类型与价值分析
+@tracing.traced()
 def analyze_help_content(data):
     print("\n开始分析互助内容的类型与价值")
+    plt = plotting.pyplot(PLOT_RC)
     if data["comments"] is None:
         print("没有评论数据，无法进行分析")
         return
     
-    comments_df = data["comments"].copy()
+    comments_df = select_columns(data["comments"], ANALYSIS_COLUMNS["analyze_help_content"]["comments"])
     
     required_cols = ["评论内容", "点赞数"]
     if not all(col in comments_df.columns for col in required_cols):
@@ -501,16 +595,6 @@ def analyze_help_content(data):
     
     valid_df = comments_df.dropna(subset=["评论内容", "点赞数"]).copy()
     
-    # 定义互助内容类型
-    help_categories = {
-        "实用知识": ["教程", "方法", "步骤", "怎么", "如何", "攻略", "技巧", 
-                  "teach", "how to", "guide", "method", "step"],
-        "情感支持": ["欢迎", "加油", "支持", "鼓励", "开心", "理解", 
-                  "welcome", "support", "encourage", "happy", "glad"],
-        "娱乐互动": ["哈哈", "搞笑", "可爱", "有趣", "笑死", 
-                  "funny", "cute", "haha", "lol", "interesting"]
-    }
-    
     # 内容类型分类函数
     def categorize_help_content(text):
         if not isinstance(text, str):
@@ -519,7 +603,7 @@ def analyze_help_content(data):
         text_lower = text.lower()
         categories = []
         
-        for category, keywords in help_categories.items():
+        for category, keywords in HELP_CATEGORIES.items():
             for keyword in keywords:
                 if keyword in text_lower:
                     categories.append(category)
@@ -530,7 +614,7 @@ def analyze_help_content(data):
     # 分类互助内容
     valid_df["互助类型"] = valid_df["评论内容"].apply(categorize_help_content)
     
-    help_df = valid_df[valid_df["互助类型"] != "其他"].copy()
+    help_df = valid_df[valid_df["互助类型"] != "其他"]
     
     # 统计各类互助内容的数量和平均点赞数
     help_stats = help_df.groupby("互助类型").agg({
@@ -555,7 +639,7 @@ def analyze_help_content(data):
     plt.ylabel("占比")
     plt.xticks(rotation=0)
     for i, v in enumerate(help_stats["占比"]):
-        plt.text(i, v + 0.01, f"{v:.2%}\n(n={help_stats['数量'][i]})", 
+        plt.text(i, v + 0.01, f"{v:.2%}\n(n={help_stats['数量'].iloc[i]})", 
                  ha='center', va='bottom', fontsize=10)
     
     # 各类互助内容的平均点赞数
@@ -573,8 +657,89 @@ def analyze_help_content(data):
     
     return help_stats
 
+ANALYSES = [analyze_bilingual_advantage, analyze_content_preference, analyze_emotion_impact, analyze_help_content]
+
+
+#--------------------------------------------------------------------------
+# 并行分析：各表写成 Arrow IPC 文件放在共享内存文件系统（/dev/shm）中，子进程内存映射读取，不经管道序列化整表
+
+def share_table(df, columns, path):
+    """
+    把 df 中 columns 列写成 Arrow IPC 文件，返回子进程读取用的引用。
+    混合类型的 object 列（如同时有数字和文本）无法转成 Arrow，原样随引用序列化，保证分析结果不变
+    """
+    import pyarrow as pa
+    arrays, names, extra = [], [], {}
+    for col in columns:
+        if col not in df.columns:
+            continue
+        try:
+            arrays.append(pa.array(df[col], from_pandas=True))
+            names.append(col)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            extra[col] = df[col].to_numpy()
+    table = pa.Table.from_arrays(arrays, names=names)
+    with pa.ipc.new_file(path, table.schema) as writer:
+        writer.write_table(table)
+    return {"path": path, "extra": extra, "index": df.index}
+
+
+def attach_table(ref, columns):
+    """子进程中内存映射 IPC 文件，只把需要的列转成 DataFrame（Arrow 支持的列不复制，直接引用映射的内存）"""
+    import pyarrow as pa
+    table = pa.ipc.open_file(pa.memory_map(ref["path"])).read_all()
+    df = table.select([col for col in columns if col in table.column_names]).to_pandas()
+    for col, values in ref["extra"].items():
+        if col in columns:
+            df[col] = values
+    df.index = ref["index"]
+    return df[[col for col in columns if col in df.columns]]
+
+
+def _init_worker():
+    # 子进程只保存图片：换成非交互后端，plt.show 不会弹窗阻塞
+    import warnings
+    import matplotlib
+    matplotlib.use("Agg")
+    warnings.filterwarnings("ignore", message=".*non-interactive.*")
+
+
+def _run_analysis(name, refs, kwargs):
+    func = next(f for f in ANALYSES if f.__name__ == name)
+    data = {"posts": None, "comments": None}
+    for table, columns in ANALYSIS_COLUMNS[name].items():
+        if refs.get(table) is not None:
+            data[table] = attach_table(refs[table], columns)
+    return func(data, **kwargs)
+
+
+def run_analyses_parallel(data, workers=ANALYSIS_WORKERS, options=None):
+    """各分析在独立进程中运行，总耗时约等于最慢的一项；options 为 {分析名: 关键字参数}；返回 {分析名: 结果}"""
+    options = options or {}
+    share_dir = SHARE_DIR if SHARE_DIR and os.path.isdir(SHARE_DIR) else None
+    with tempfile.TemporaryDirectory(prefix="xhs_analysis_", dir=share_dir, ignore_cleanup_errors=True) as tmp:
+        refs = {}
+        for table in ("posts", "comments"):
+            if data.get(table) is None:
+                continue
+            # 共享各分析所需列的并集
+            columns = list(dict.fromkeys(col for spec in ANALYSIS_COLUMNS.values() for col in spec.get(table, [])))
+            refs[table] = share_table(data[table], columns, os.path.join(tmp, f"{table}.arrow"))
+
+        results = {}
+        with ProcessPoolExecutor(max_workers=min(workers, len(ANALYSES)), initializer=_init_worker) as executor:
+            futures = {func.__name__: executor.submit(_run_analysis, func.__name__, refs, options.get(func.__name__, {}))
+                       for func in ANALYSES}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print(f"{name} 失败: {str(e)}")
+        return results
+
+
 # 主函数
-def main():
+def main(parallel=PARALLEL_ANALYSIS, approx=APPROX_MODE, sample_size=APPROX_SAMPLE_SIZE):
     print("=== 小红书'TikTok难民'事件数据分析 ===")
     
     try:
@@ -584,10 +749,13 @@ def main():
         return
     
     # 执行各个角度的分析
-    analyze_bilingual_advantage(data)
-    analyze_content_preference(data)
-    analyze_emotion_impact(data)
-    analyze_help_content(data)
+    options = {"analyze_emotion_impact": {"approx": approx, "sample_size": sample_size}}
+    if parallel:
+        run_analyses_parallel(data, options=options)
+        print("\n并行模式下图表只保存为图片文件，不弹出窗口")
+    else:
+        for analyze in ANALYSES:
+            analyze(data, **options.get(analyze.__name__, {}))
     
     print("\n所有分析完成")
 
@@ -0,0 +1,157 @@
+import zlib
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+
+# 去重参数
+NUM_PERM = 64  # MinHash 签名长度
+NUM_BANDS = 16  # LSH 分段数（每段 NUM_PERM // NUM_BANDS 行）
+SHINGLE_SIZE = 3  # 字符 shingle 长度
+SIMILARITY_THRESHOLD = 0.8  # 估计 Jaccard 相似度不低于该值视为近重复
+MIN_TEXT_LENGTH = 20  # 短于该长度的文本（如"哈哈哈"）只做ID去重，不同用户的相同短评论不算重复
+KEEP_POLICY = "latest"  # "latest"：保留最后加载/时间最新的一条；"first"：保留最早的一条；"most_liked"：保留点赞数最多的一条
+
+ID_COLUMNS = ["评论ID", "笔记ID", "笔记id", "笔记链接"]  # 精确去重使用的ID列（取第一个存在的）
+TEXT_COLUMNS = ["评论内容", "笔记详情", "combine_notes"]  # 近重复检测使用的文本列
+# 近重复只在同一条笔记 / 同一个用户的范围内匹配（重复爬取同一条笔记），ID不同的两行永远不合并
+NOTE_COLUMNS = ["笔记ID", "笔记id", "笔记链接"]
+USER_COLUMNS = ["用户ID", "用户id", "用户名", "昵称"]
+
+_PRIME = (1 << 61) - 1
+_rng = np.random.default_rng(1)
+_PERM_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+
+
+def _keep_order(df, policy, order_col=None):
+    """按保留策略返回排序键，排序键最大的一条会被保留"""
+    if policy == "most_liked" and "点赞数" in df.columns:
+        likes = pd.to_numeric(df["点赞数"], errors="coerce").fillna(-1).to_numpy()
+        # 点赞数相同时保留较新的一条
+        return np.lexsort((np.arange(len(df)), likes)).argsort()
+    if order_col is not None and order_col in df.columns:
+        order = pd.to_datetime(df[order_col], errors="coerce").rank(method="first", na_option="top").to_numpy()
+    else:
+        order = np.arange(len(df), dtype=float)  # 默认按加载顺序，越靠后越新
+    return -order if policy == "first" else order
+
+
+def drop_exact_duplicates(df, id_col, policy=KEEP_POLICY, order_col=None):
+    """按ID哈希去重，返回 (去重后数据, 被删除行数)"""
+    if id_col is None or id_col not in df.columns:
+        return df, 0
+    order = _keep_order(df, policy, order_col)
+    ranked = df.assign(_keep_order=order).sort_values("_keep_order")
+    has_id = ranked[id_col].notna()
+    dup = has_id & ranked.duplicated(subset=[id_col], keep="last")
+    kept = ranked[~dup].drop(columns="_keep_order").sort_index()
+    return kept, int(dup.sum())
+
+
+def minhash_signatures(texts, shingle_size=SHINGLE_SIZE):
+    """计算每条文本的 MinHash 签名（文本过短时签名为全0行，并在 mask 中标记为 False）"""
+    signatures = np.zeros((len(texts), NUM_PERM), dtype=np.uint64)
+    mask = np.zeros(len(texts), dtype=bool)
+    for i, text in enumerate(texts):
+        if not isinstance(text, str):
+            continue
+        text = " ".join(text.lower().split())
+        if len(text) < max(shingle_size, MIN_TEXT_LENGTH):
+            continue
+        shingles = {text[j:j + shingle_size] for j in range(len(text) - shingle_size + 1)}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # (a*h + b) mod p：h 不超过32位，a 取高29位，乘积不会溢出 uint64
+        permuted = (hashes[:, None] * (_PERM_A >> np.uint64(32)) + _PERM_B) % np.uint64(_PRIME)
+        signatures[i] = permuted.min(axis=0)
+        mask[i] = True
+    return signatures, mask
+
+
+def _find(parent, x):
+    while parent[x] != x:
+        parent[x] = parent[parent[x]]
+        x = parent[x]
+    return x
+
+
+def near_duplicate_clusters(signatures, mask, threshold=SIMILARITY_THRESHOLD, num_bands=NUM_BANDS,
+                            scopes=None, ids=None):
+    """
+    LSH 分段：同一分段桶内的文本与桶内第一条比较签名相似度，达到阈值则并入同一簇
+    每条文本每个分段只比较一次，整体复杂度近似线性
+    scopes 为每行的匹配范围（如 笔记ID+用户），只有范围相同的行才会进入同一个桶；
+    ids 为每行的ID（缺失为 None），一个簇最多包含一个ID，ID不同的行不会合并
+    返回 {簇根: [行号, ...]}，只包含大小不少于2的簇
+    """
+    rows_per_band = signatures.shape[1] // num_bands
+    parent = np.arange(len(signatures))
+    cluster_id = {} if ids is None else {i: v for i, v in enumerate(ids) if v is not None}
+    valid = np.where(mask)[0]
+    for band in range(num_bands):
+        block = signatures[valid, band * rows_per_band:(band + 1) * rows_per_band]
+        buckets = {}
+        for idx, key in zip(valid, map(bytes, block)):
+            if scopes is not None:
+                key = (scopes[idx], key)
+            head = buckets.setdefault(key, idx)
+            if head == idx:
+                continue
+            if (signatures[head] == signatures[idx]).mean() >= threshold:
+                root_a, root_b = _find(parent, head), _find(parent, idx)
+                id_a, id_b = cluster_id.get(root_a), cluster_id.get(root_b)
+                if root_a != root_b and (id_a is None or id_b is None or id_a == id_b):
+                    parent[root_b] = root_a
+                    if id_a is None and id_b is not None:
+                        cluster_id[root_a] = id_b
+    clusters = defaultdict(list)
+    for idx in valid:
+        clusters[_find(parent, idx)].append(idx)
+    return {root: members for root, members in clusters.items() if len(members) > 1}
+
+
+def deduplicate(df, id_col=None, text_col=None, policy=KEEP_POLICY, order_col=None, name="数据"):
+    """
+    两阶段去重：先按ID精确去重，再按文本 MinHash-LSH 去除近重复
+    返回 (去重后数据, 被删除簇的报告)
+    """
+    if df is None or df.empty:
+        return df, pd.DataFrame()
+    if id_col is None:
+        id_col = next((c for c in ID_COLUMNS if c in df.columns), None)
+    if text_col is None:
+        text_col = next((c for c in TEXT_COLUMNS if c in df.columns), None)
+
+    df, exact_removed = drop_exact_duplicates(df, id_col, policy, order_col)
+    report = []
+    if text_col is not None:
+        df = df.reset_index(drop=True)
+        signatures, mask = minhash_signatures(df[text_col].tolist())
+        # 匹配范围：笔记列 + 用户列（不含ID列本身）；一个簇最多一个ID，带不同ID的行只由精确去重处理
+        scope_cols = [col for col in (next((c for c in NOTE_COLUMNS if c in df.columns and c != id_col), None),
+                                      next((c for c in USER_COLUMNS if c in df.columns), None)) if col]
+        scopes = list(df[scope_cols].astype(str).itertuples(index=False, name=None)) if scope_cols else None
+        ids = [None if pd.isna(v) else v for v in df[id_col]] if id_col else None
+        clusters = near_duplicate_clusters(signatures, mask, scopes=scopes, ids=ids)
+        order = _keep_order(df, policy, order_col)
+        drop_rows = []
+        for members in clusters.values():
+            keep = max(members, key=lambda i: order[i])
+            removed = [i for i in members if i != keep]
+            drop_rows.extend(removed)
+            if id_col and pd.isna(df.at[keep, id_col]):
+                # 保留行没有ID时沿用簇内唯一的ID
+                known = [ids[i] for i in members if ids[i] is not None]
+                if known:
+                    df.at[keep, id_col] = known[0]
+            report.append({
+                "保留行": keep,
+                "删除行数": len(removed),
+                "保留文本": str(df.at[keep, text_col])[:50],
+                "删除ID": [df.at[i, id_col] for i in removed] if id_col else removed,
+            })
+        df = df.drop(index=drop_rows).reset_index(drop=True)
+
+    report = pd.DataFrame(report, columns=["保留行", "删除行数", "保留文本", "删除ID"])
+    near_removed = int(report["删除行数"].sum()) if not report.empty else 0
+    print(f"{name}去重：按ID删除 {exact_removed} 行，近重复删除 {near_removed} 行（{len(report)} 个簇）")
+    return df, report
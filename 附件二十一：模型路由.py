@@ -0,0 +1,43 @@
+import time
+
+# 模型梯度：由便宜、快的小模型到大模型，每条先交给第一级，不满足条件时逐级升级
+MODEL_LADDER = ["Qwen/Qwen2.5-7B-Instruct", "deepseek-ai/DeepSeek-V3"]  # 只保留一个模型即不分级；附件一、附件二共用这一份配置
+CHEAP_VOTES = 2  # 非最后一级的投票次数，结果不一致时升级；为1时只看校验结果
+
+
+class ModelRouter:
+    """
+    request(model) 发送一次请求并返回原始回复；parse(reply) 解析回复；
+    is_valid(parsed) 判断解析结果是否可用；agree(a, b) 判断两次投票是否一致。
+    非最后一级：任何一次投票校验失败或投票结果不一致就升级到下一级；最后一级的结果直接返回。
+    """
+
+    def __init__(self, parse, is_valid, agree=None, ladder=None, votes=CHEAP_VOTES):
+        self.parse = parse
+        self.is_valid = is_valid
+        self.agree = agree or (lambda a, b: a == b)
+        self.ladder = list(ladder or MODEL_LADDER)
+        self.votes = votes
+        if not self.ladder:
+            raise ValueError("模型梯度不能为空")
+
+    def route(self, request, metrics=None):
+        """返回 (原始回复, 解析结果, 使用的模型, 所在级别)"""
+        for tier, model in enumerate(self.ladder):
+            last = tier == len(self.ladder) - 1
+            results = []
+            for _ in range(1 if last else self.votes):
+                start = time.time()
+                reply = request(model)
+                parsed = self.parse(reply)
+                if metrics:
+                    metrics.observe_tier(tier, model, time.time() - start)
+                if not last and not self.is_valid(parsed):
+                    break
+                results.append((reply, parsed))
+            else:
+                if last or all(self.agree(results[0][1], p) for _, p in results[1:]):
+                    if metrics:
+                        metrics.record_routed(tier)
+                    return results[0][0], results[0][1], model, tier
+            # 校验失败或投票不一致，升级到下一级
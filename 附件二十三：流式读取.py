@@ -0,0 +1,141 @@
+import os
+import csv
+import json
+from itertools import islice
+
+# 流式读取标注输入：逐行产出所需列，不整表载入，续传时直接从偏移量开始
+EXCEL_SUFFIXES = (".xlsx", ".xlsm")
+CSV_SUFFIXES = (".csv",)
+PARQUET_SUFFIXES = (".parquet", ".pq")
+CSV_ENCODING = "utf-8-sig"  # 兼容 Excel 另存的带 BOM 的 CSV
+
+
+def _format(path):
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix in EXCEL_SUFFIXES:
+        return "excel"
+    if suffix in CSV_SUFFIXES:
+        return "csv"
+    if suffix in PARQUET_SUFFIXES:
+        return "parquet"
+    raise ValueError(f"不支持的输入格式：{suffix}（支持 xlsx / csv / parquet）")
+
+
+def _open_sheet(path):
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    return workbook, workbook.active
+
+
+def read_header(path):
+    """只读表头，返回列名列表"""
+    fmt = _format(path)
+    if fmt == "excel":
+        workbook, sheet = _open_sheet(path)
+        try:
+            header = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        finally:
+            workbook.close()
+        return [str(c) if c is not None else "" for c in header]
+    if fmt == "csv":
+        with open(path, newline="", encoding=CSV_ENCODING) as f:
+            return next(csv.reader(f), [])
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(path).schema_arrow.names
+
+
+def count_rows(path):
+    """数据行数（不含表头），用于进度条；Excel 文件缺少尺寸信息时返回 None"""
+    fmt = _format(path)
+    if fmt == "excel":
+        workbook, sheet = _open_sheet(path)
+        try:
+            max_row = sheet.max_row
+        finally:
+            workbook.close()
+        return max(max_row - 1, 0) if max_row else None
+    if fmt == "csv":
+        with open(path, newline="", encoding=CSV_ENCODING) as f:
+            return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(path).metadata.num_rows
+
+
+def _iter_excel(path, columns, start, end):
+    workbook, sheet = _open_sheet(path)
+    try:
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(c) if c is not None else "" for c in next(rows, ())]
+        index = [header.index(c) if c in header else None for c in columns]
+        # 只读模式下跳过的行只做XML扫描，不创建单元格对象
+        for row in islice(rows, start, end):
+            yield tuple(row[j] if j is not None and j < len(row) else None for j in index)
+    finally:
+        workbook.close()
+
+
+def _iter_csv(path, columns, start, end):
+    with open(path, newline="", encoding=CSV_ENCODING) as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        index = [header.index(c) if c in header else None for c in columns]
+        for row in islice(reader, start, end):
+            yield tuple(row[j] or None if j is not None and j < len(row) else None for j in index)
+
+
+def _iter_parquet(path, columns, start, end):
+    import pyarrow.parquet as pq
+    parquet = pq.ParquetFile(path)
+    present = [c for c in columns if c in parquet.schema_arrow.names]
+    offset = 0
+    for group in range(parquet.metadata.num_row_groups):
+        n = parquet.metadata.row_group(group).num_rows
+        if offset + n <= start:  # 整个行组都在续传偏移之前，不读取
+            offset += n
+            continue
+        if end is not None and offset >= end:
+            break
+        data = parquet.read_row_group(group, columns=present).to_pydict()
+        lo = max(start - offset, 0)
+        hi = n if end is None else min(end - offset, n)
+        for k in range(lo, hi):
+            yield tuple(data[c][k] if c in data else None for c in columns)
+        offset += n
+
+
+def iter_rows(path, columns, start=0, end=None):
+    """
+    逐行产出 columns 对应的值（元组），行号区间为 [start, end)，不含表头；
+    文件中不存在的列产出 None，是否必需由调用方通过 read_header 检查
+    """
+    readers = {"excel": _iter_excel, "csv": _iter_csv, "parquet": _iter_parquet}
+    return readers[_format(path)](path, list(columns), start or 0, end)
+
+
+def iter_jsonl(path, offset=0):
+    """
+    从字节偏移 offset 开始逐行产出 (记录字典, 该行之后的字节偏移)，断点用字节偏移而不是行号，续读时直接 seek；
+    只读以换行结尾的完整行，正在追加的最后半行留到下次；无法解析或不是对象的行跳过
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                return
+            offset += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                yield record, offset
+
+
+def iter_chunks(rows, size):
+    """把行迭代器按 size 条切块，便于批量查询续传状态"""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,181 @@
+import re
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+RPM_PER_KEY = 60  # 每个密钥每分钟最多发出的请求数（客户端限速）
+MAX_IN_FLIGHT_PER_KEY = 4  # 每个密钥同时在途的请求数
+COOLDOWN_SECONDS = 30  # 429 且响应中没有 Retry-After 时的冷却时间
+AUTH_COOLDOWN_SECONDS = 600  # 401/403（密钥失效或欠费）的冷却时间
+
+
+def parse_duration(value):
+    """解析 Retry-After / x-ratelimit-reset-* 的时长："12"、"1.5s"、"6m0s"、"20ms" -> 秒"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", value)
+    return sum(float(number) * units[unit] for number, unit in parts) if parts else None
+
+
+def parse_count(value):
+    """解析 x-ratelimit-remaining-* 的剩余次数："59"、"59.0" -> 59；无法解析（含 nan、inf）时返回 None"""
+    if value is None:
+        return None
+    try:
+        return int(float(str(value).strip()))
+    except (ValueError, OverflowError):
+        return None
+
+
+def mask(token):
+    return f"{token[:6]}…{token[-4:]}" if len(token) > 12 else "***"
+
+
+class KeyState:
+    def __init__(self, token):
+        self.token = token
+        self.label = mask(token)
+        self.in_flight = 0
+        self.recent = deque()  # 最近60秒内的请求时间
+        self.cooldown_until = 0.0
+        self.remaining = None  # 服务商返回的剩余请求数
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.auth_failures = 0
+        self.tokens = 0
+        self.latency_sum = 0.0
+
+
+class CredentialPool:
+    """
+    多个API密钥组成的池：每次请求选择在途请求最少、未冷却、未超出每分钟限额的密钥；
+    读取响应中的限流头，429 按 Retry-After 冷却，401/403 长时间冷却；所有密钥都不可用时等待。
+    """
+
+    def __init__(self, tokens, rpm=RPM_PER_KEY, max_in_flight=MAX_IN_FLIGHT_PER_KEY):
+        tokens = [t for t in dict.fromkeys(tokens) if t]
+        if not tokens:
+            raise ValueError("至少需要一个API密钥")
+        self.keys = [KeyState(t) for t in tokens]
+        self.rpm = rpm
+        self.max_in_flight = max_in_flight
+        self.concurrency = len(self.keys) * max_in_flight  # 建议的并发线程数
+        self._cond = threading.Condition()
+
+    def _next_free(self, key, now):
+        """key 距离可用还需等待的秒数，0 表示现在可用，None 表示要等在途请求结束"""
+        while key.recent and key.recent[0] <= now - 60:
+            key.recent.popleft()
+        waits = [key.cooldown_until - now]
+        if len(key.recent) >= self.rpm:
+            waits.append(key.recent[0] + 60 - now)
+        if key.in_flight >= self.max_in_flight:
+            return None
+        return max(max(waits), 0.0)
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                now = time.time()
+                waits = {id(key): self._next_free(key, now) for key in self.keys}
+                ready = [key for key in self.keys if waits[id(key)] == 0]
+                if ready:
+                    key = min(ready, key=lambda k: (k.in_flight, len(k.recent)))
+                    key.in_flight += 1
+                    key.recent.append(now)
+                    return key
+                timed = [w for w in waits.values() if w is not None]
+                self._cond.wait(timeout=min(timed) if timed else 1.0)
+
+    def release(self, key, response=None, error=None, latency=0.0, usage=None):
+        with self._cond:
+            now = time.time()
+            key.in_flight -= 1
+            key.requests += 1
+            key.latency_sum += latency
+            if error is not None:
+                key.errors += 1
+            if response is not None:
+                headers = response.headers
+                remaining = parse_count(headers.get("x-ratelimit-remaining-requests"))  # 格式异常的值直接忽略
+                if remaining is not None:
+                    key.remaining = remaining
+                    if key.remaining <= 0:
+                        reset = parse_duration(headers.get("x-ratelimit-reset-requests")) or COOLDOWN_SECONDS
+                        key.cooldown_until = max(key.cooldown_until, now + reset)
+                if response.status_code == 429:
+                    key.rate_limited += 1
+                    wait = parse_duration(headers.get("retry-after")) or COOLDOWN_SECONDS
+                    key.cooldown_until = max(key.cooldown_until, now + wait)
+                elif response.status_code in (401, 403):
+                    key.auth_failures += 1
+                    key.cooldown_until = max(key.cooldown_until, now + AUTH_COOLDOWN_SECONDS)
+                elif response.status_code >= 400:
+                    key.errors += 1
+            if usage:
+                key.tokens += usage.get("total_tokens") or (usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0))
+            self._cond.notify_all()
+
+    def post(self, url, headers=None, **kwargs):
+        """用池中的密钥发送 POST 请求，返回 requests 的 Response（不检查状态码）"""
+        key = self.acquire()
+        headers = {**(headers or {}), "Authorization": f"Bearer {key.token}"}
+        start = time.time()
+        response, error, usage = None, None, None
+        try:
+            response = requests.request("POST", url, headers=headers, **kwargs)
+            if response.ok:
+                try:
+                    usage = response.json().get("usage")
+                except ValueError:
+                    pass
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # 无论成功与否都要归还密钥，否则在途计数泄漏会卡住后续请求
+            self.release(key, response=response, error=error, latency=time.time() - start, usage=usage)
+
+    def usage(self):
+        """各密钥的使用情况"""
+        now = time.time()
+        with self._cond:
+            return [{
+                "key": key.label,
+                "requests": key.requests,
+                "errors": key.errors,
+                "rate_limited": key.rate_limited,
+                "auth_failures": key.auth_failures,
+                "tokens": key.tokens,
+                "latency_mean": round(key.latency_sum / key.requests, 3) if key.requests else None,
+                "remaining": key.remaining,
+                "cooldown_seconds": round(max(key.cooldown_until - now, 0), 1),
+            } for key in self.keys]
+
+    def summary(self):
+        return "\n".join(
+            f"密钥 {u['key']}：请求 {u['requests']} 次，tokens {u['tokens']}，429 {u['rate_limited']} 次，"
+            f"401/403 {u['auth_failures']} 次，其他错误 {u['errors']} 次" for u in self.usage())
+
+
+def ordered_map(func, items, n_workers):
+    """多线程执行 func 并按输入顺序返回结果；在途任务不超过 2*n_workers，中断时不会积压大量任务"""
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        futures = deque()
+        for item in items:
+            futures.append(executor.submit(func, item))
+            if len(futures) >= 2 * n_workers:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
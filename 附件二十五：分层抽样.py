@@ -0,0 +1,166 @@
+import os
+import json
+import warnings
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+
+# 交互探索用的近似模式：按分层（如 笔记topic × 日期 × user_origin）抽样，均值和占比按分层估计换算回总体并给出置信区间；
+# 每层的总体行数随样本保存，由若干完整的层组成的分组（话题、话题×日期）的总行数是精确的
+SAMPLE_SIZE = 20000  # 样本量上限，先满足每层最小样本数，剩余名额按各层行数比例分配
+MIN_PER_STRATUM = 2  # 每层至少抽取的行数（层内不足时全取），保证每层都有样本、能估计方差；层数过多时自动下调
+MIN_SHARE_WARNING = 0.5  # 最小样本数合计超过样本量的这个比例时给出警告（比例分配已基本失效）
+CI_LEVEL = 0.95  # 置信水平
+SEED = 42  # 随机种子，保证样本可复现
+POP_COLUMN = "_层总体数"  # 样本中每行所在层的总体行数 N_h
+SIZE_COLUMN = "_层样本数"  # 样本中每行所在层的样本行数 n_h
+LOW_SUFFIX, HIGH_SUFFIX = "_下限", "_上限"  # 置信区间列名后缀
+METADATA_KEY = b"xhs_sample"  # Parquet 元数据中记录抽样参数的键
+
+
+def is_sample(df):
+    return POP_COLUMN in df.columns
+
+
+def allocate(population, size=SAMPLE_SIZE, min_per_stratum=MIN_PER_STRATUM):
+    """
+    各层样本量：每层先取 min(N_h, 最小样本数)，剩余名额按各层剩余行数比例分配（最大余数法取整），合计不超过 size。
+    最小样本数合计已超过 size 时（层数过多），每层最小样本数降为 size // 层数，但至少1行以保证每层都有样本
+    （只有层数本身超过 size 时样本量才会超过 size）
+    """
+    population = np.asarray(population, dtype=np.int64)
+    minimum = min_per_stratum
+    if np.minimum(population, minimum).sum() > size:
+        minimum = max(1, size // len(population))
+        warnings.warn(f"{len(population)} 层 × 每层 {min_per_stratum} 行超过样本量 {size}，每层最小样本数降为 {minimum}"
+                      + ("（只抽1行的层无法估计方差，置信区间会偏窄）" if minimum == 1 else ""), stacklevel=3)
+    quota = np.minimum(population, minimum)
+    if quota.sum() > MIN_SHARE_WARNING * size:
+        warnings.warn(f"每层最小样本数合计 {quota.sum()} 行，占样本量 {size} 的 {quota.sum() / size:.0%}，"
+                      "小层被过度抽样，建议减少分层列或增大样本量", stacklevel=3)
+    capacity = population - quota
+    extra = min(max(size - quota.sum(), 0), capacity.sum())
+    if extra:
+        exact = capacity * (extra / capacity.sum())
+        share = np.floor(exact).astype(np.int64)
+        rest = np.argsort(share - exact, kind="stable")[:extra - share.sum()]  # 小数部分最大的层各补1行
+        share[rest] += 1
+        quota = quota + share
+    return quota
+
+
+def draw_sample(df, strata, size=SAMPLE_SIZE, min_per_stratum=MIN_PER_STRATUM, seed=SEED):
+    """按 strata 分层的无放回随机抽样（层样本量见 allocate）；样本带各层总体行数和样本行数两列，缺失值单独成层"""
+    codes = df.groupby([df[col] for col in strata], dropna=False).ngroup().to_numpy()
+    population = np.bincount(codes)
+    quota = allocate(population, size, min_per_stratum)
+    # 层内按随机数排名，取前 quota 个，相当于层内简单随机抽样
+    rank = pd.Series(np.random.default_rng(seed).random(len(df)), index=df.index)
+    keep = (rank.groupby(codes).rank(method="first").to_numpy() <= quota[codes])
+    sample = df[keep].copy()
+    sample[POP_COLUMN] = population[codes[keep]]
+    sample[SIZE_COLUMN] = quota[codes[keep]]
+    return sample
+
+
+def _z(level):
+    return NormalDist().inv_cdf(0.5 + level / 2)
+
+
+def estimate_means(sample, strata, domain, values, level=CI_LEVEL):
+    """
+    按 domain 分组估计各 values 列的总体均值：∑W_h·ȳ_h，方差 ∑W_h²·(1-n_h/N_h)·s_h²/n_h。
+    domain 须是 strata 的子集（每组由若干完整的层组成）；返回 domain 列、总体数和各列的估计值及置信区间
+    """
+    strata, domain = list(strata), list(domain)
+    if not set(domain) <= set(strata):
+        raise ValueError(f"分组列 {domain} 必须是分层列 {strata} 的子集")
+    groups = sample.groupby(strata, dropna=False)
+    sizes = groups[[POP_COLUMN, SIZE_COLUMN]].first().astype(float)
+    means = groups[values].mean()
+    variances = groups[values].var(ddof=1).fillna(0)  # 只抽到1行的层（即层内只有1行）方差为0
+    population = sizes[POP_COLUMN]
+    fpc = (1 - sizes[SIZE_COLUMN] / population) / sizes[SIZE_COLUMN]
+
+    by_domain = dict(level=domain)  # 与 groupby 一致，分组键缺失的行不单独成组（但仍计入所在层）
+    total = population.groupby(**by_domain).sum()
+    estimate = means.mul(population, axis=0).groupby(**by_domain).sum().div(total, axis=0)
+    variance = variances.mul(population ** 2 * fpc, axis=0).groupby(**by_domain).sum().div(total ** 2, axis=0)
+    margin = _z(level) * np.sqrt(variance)
+
+    result = pd.DataFrame({"总体数": total.astype(int)})
+    for col in values:
+        result[col] = estimate[col]
+        result[col + LOW_SUFFIX] = estimate[col] - margin[col]
+        result[col + HIGH_SUFFIX] = estimate[col] + margin[col]
+    return result.reset_index()
+
+
+def estimate_shares(sample, strata, domain, category, level=CI_LEVEL):
+    """
+    按 domain 分组估计 category 各取值的占比（指示变量的分层均值）及置信区间，以及换算回总体的数量；
+    返回长表：domain 列、category、总体数、数量、占比、占比_下限、占比_上限（只保留样本中出现过的组合）
+    """
+    indicators = pd.get_dummies(sample[category], dtype=float)
+    labels = list(indicators.columns)
+    frame = pd.concat([sample[list(strata) + [POP_COLUMN, SIZE_COLUMN]], indicators.add_prefix("\x1f")], axis=1)
+    wide = estimate_means(frame, strata, domain, ["\x1f" + str(label) for label in labels], level)
+
+    parts = []
+    for label in labels:
+        col = "\x1f" + str(label)
+        part = wide[list(domain) + ["总体数"]].copy()
+        part[category] = label
+        part["占比"] = wide[col]
+        part["占比" + LOW_SUFFIX] = wide[col + LOW_SUFFIX].clip(lower=0)
+        part["占比" + HIGH_SUFFIX] = wide[col + HIGH_SUFFIX].clip(upper=1)
+        parts.append(part[part["占比"] > 0])
+    result = pd.concat(parts, ignore_index=True)
+    result["数量"] = result["占比"] * result["总体数"]
+    return result[list(domain) + [category, "总体数", "数量", "占比", "占比" + LOW_SUFFIX, "占比" + HIGH_SUFFIX]]
+
+
+#--------------------------------------------------------------------------
+# 样本持久化：Parquet 文件，元数据中记录源文件和抽样参数，源文件更新或参数变化时重新抽样
+
+def save_sample(sample, path, params):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    sample = sample.copy()
+    for col in sample.columns[sample.dtypes == object]:
+        try:
+            pa.array(sample[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            sample[col] = sample[col].astype("string")  # 混合类型列存为字符串
+    table = pa.Table.from_pandas(sample, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                           METADATA_KEY: json.dumps(params, ensure_ascii=False).encode("utf-8")})
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read_sample_params(path):
+    import pyarrow.parquet as pq
+    metadata = pq.read_schema(path).metadata or {}
+    return json.loads(metadata[METADATA_KEY]) if METADATA_KEY in metadata else None
+
+
+def cached_sample(source, load, strata, path, size=SAMPLE_SIZE, columns=None, seed=SEED):
+    """
+    读取持久化的分层样本；样本比源文件旧或抽样参数变化时，调用 load() 读取全量数据重新抽样并保存。
+    columns 为样本中保留的列（分层列总会保留），为空时保留全部列
+    """
+    params = {"source": os.path.abspath(source), "strata": list(strata), "size": size, "seed": seed,
+              "min_per_stratum": MIN_PER_STRATUM, "columns": list(columns) if columns else None}
+    if (os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(source)
+            and read_sample_params(path) == params):
+        return pd.read_parquet(path)
+    df = load()
+    if columns:
+        df = df[list(dict.fromkeys([*strata, *columns]))]
+    sample = draw_sample(df, strata, size, seed=seed)
+    save_sample(sample, path, params)
+    print(f"已抽取分层样本 {len(sample)} 行（总体 {len(df)} 行，{sample.groupby(list(strata), dropna=False).ngroups} 层）-> {path}")
+    return sample
@@ -0,0 +1,390 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import argparse
+import importlib
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+reader = importlib.import_module("附件二十三：流式读取")
+store = importlib.import_module("附件十八：标注结果库")
+
+# 增量入库服务：监视爬虫的输出目录，新文件（或已有文件追加的内容）逐批解析，按笔记 / 评论ID 对照持久化的已见集合去重，
+# 新行写成 Parquet 分片追加到 xhs_data（附件十七直接查询，附件三 load_data 也会读取），新评论进入 LLM 标注队列。
+# 每批的已见ID、入队和文件断点在同一个 SQLite 事务中提交；分片按 (文件, 版本, 起始断点) 命名，中断后重做同一批只会覆盖同名分片，
+# 因此不会重复处理，也不会丢行
+DROP_DIR = "xhs_drop"  # 爬虫输出目录
+STORE_DIR = "xhs_data"  # 列式存储目录（Parquet 分片）
+STATE_DB = "ingest_state.db"  # 已见集合、文件断点、标注队列
+POLL_SECONDS = 10  # 扫描间隔
+SETTLE_SECONDS = 30  # CSV / XLSX 在这么久没有修改后才读取，避免读到写了一半的文件；JSONL 只读完整的行，随时可读
+BATCH_ROWS = 5000  # 每批行数，也是每个 Parquet 分片的最大行数
+MAX_BATCHES_PER_FILE = 20  # 每轮扫描中每个文件最多处理的批数，大文件不会让其他文件一直等待
+MAX_PENDING_LABELS = 20000  # 背压：标注线程运行时，队列积压超过该值就暂停摄入评论（帖子照常），等标注跟上
+LABEL_BATCH = 80  # 标注线程每次从队列取出的条数
+LABEL_RETRIES = 2
+
+SUFFIXES = (".jsonl", ".ndjson", ".csv", ".xlsx")
+# 各数据集的去重ID列（取第一个存在的），没有ID的行用文本哈希；分片文件名中的关键字与附件三 load_data、附件十七 SOURCES 的匹配规则一致
+ID_COLUMNS = {"posts": ["笔记ID", "笔记id", "笔记链接"], "comments": ["评论ID"]}
+TEXT_COLUMNS = {"posts": ["笔记详情", "combine_notes"], "comments": ["评论内容"]}
+PART_LABELS = {"posts": "帖子", "comments": "评论"}
+
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen (
+    dataset TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (dataset, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    offset INTEGER NOT NULL,  -- JSONL 为字节偏移，CSV / XLSX 为已读行数
+    generation INTEGER NOT NULL,  -- 文件被整体改写后加1，从头重读
+    complete INTEGER NOT NULL,
+    rows_in INTEGER NOT NULL DEFAULT 0,
+    rows_new INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS label_queue (
+    key TEXT PRIMARY KEY,
+    comment_id TEXT,
+    topic TEXT,
+    comment TEXT,
+    enqueued_at TEXT NOT NULL
+);
+"""
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class IngestState:
+    """入库状态库（SQLite，WAL 模式）；每个线程使用自己的实例"""
+
+    def __init__(self, path=STATE_DB):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.con = sqlite3.connect(path, timeout=30)
+        self.con.execute("PRAGMA journal_mode=WAL")  # 标注线程读写队列时不阻塞入库
+        self.con.executescript(STATE_SCHEMA)
+
+    def close(self):
+        self.con.close()
+
+    def checkpoint(self, path):
+        row = self.con.execute("SELECT size, mtime, offset, generation, complete FROM files WHERE path = ?",
+                               (path,)).fetchone()
+        return None if row is None else dict(zip(["size", "mtime", "offset", "generation", "complete"], row))
+
+    def unseen(self, dataset, keys):
+        keys = list(keys)
+        seen = set()
+        for i in range(0, len(keys), 500):  # SQLite 单条语句的参数个数有上限
+            chunk = keys[i:i + 500]
+            rows = self.con.execute(
+                f"SELECT key FROM seen WHERE dataset = ? AND key IN ({', '.join('?' * len(chunk))})",
+                (dataset, *chunk)).fetchall()
+            seen.update(row[0] for row in rows)
+        return [key for key in keys if key not in seen]
+
+    def commit_batch(self, dataset, keys, queue, path, size, mtime, offset, generation, complete, rows_in):
+        """已见ID、标注队列、文件断点在一个事务中提交"""
+        now = _now()
+        with self.con:
+            self.con.executemany("INSERT OR IGNORE INTO seen (dataset, key) VALUES (?, ?)",
+                                 [(dataset, key) for key in keys])
+            self.con.executemany(
+                "INSERT OR IGNORE INTO label_queue (key, comment_id, topic, comment, enqueued_at) VALUES (?, ?, ?, ?, ?)",
+                [(*item, now) for item in queue])
+            self.con.execute(
+                """INSERT INTO files (path, size, mtime, offset, generation, complete, rows_in, rows_new, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (path) DO UPDATE SET
+                       size = excluded.size, mtime = excluded.mtime, offset = excluded.offset,
+                       generation = excluded.generation, complete = excluded.complete,
+                       rows_in = files.rows_in + excluded.rows_in, rows_new = files.rows_new + excluded.rows_new,
+                       updated_at = excluded.updated_at""",
+                (path, size, mtime, offset, generation, int(complete), rows_in, len(keys), now))
+
+    def pending_labels(self):
+        return self.con.execute("SELECT count(*) FROM label_queue").fetchone()[0]
+
+    def take_labels(self, limit):
+        """按入队顺序取出（不删除）；标注结果写入结果库后再调用 finish_labels"""
+        return self.con.execute("SELECT rowid, key, comment_id, topic, comment FROM label_queue ORDER BY rowid LIMIT ?",
+                                (limit,)).fetchall()
+
+    def finish_labels(self, keys):
+        with self.con:
+            self.con.executemany("DELETE FROM label_queue WHERE key = ?", [(key,) for key in keys])
+
+    def summary(self):
+        seen = dict(self.con.execute("SELECT dataset, count(*) FROM seen GROUP BY dataset").fetchall())
+        files = self.con.execute("SELECT count(*), sum(complete) FROM files").fetchone()
+        return {"帖子": seen.get("posts", 0), "评论": seen.get("comments", 0), "文件": files[0],
+                "已读完": files[1] or 0, "标注队列": self.pending_labels()}
+
+#--------------------------------------------------------------------------
+# 解析与去重
+
+def _kind(path):
+    return "jsonl" if path.lower().endswith((".jsonl", ".ndjson")) else "table"
+
+
+def dataset_of(path, columns):
+    """文件名规则同附件三 load_data；爬虫的 JSONL 文件名不含关键字时按列判断"""
+    name = os.path.basename(path)
+    if "帖子" in name or "笔记" in name:
+        return "posts"
+    if "评论" in name or "result" in name:
+        return "comments"
+    return "comments" if "评论内容" in columns or "评论ID" in columns else "posts"
+
+
+def read_batches(path, offset, batch_rows=BATCH_ROWS):
+    """从断点开始逐批产出 (DataFrame, 本批之后的断点)"""
+    if _kind(path) == "jsonl":
+        for chunk in reader.iter_chunks(reader.iter_jsonl(path, offset), batch_rows):
+            df = pd.DataFrame([record for record, _ in chunk])
+            # 嵌套字段存为 JSON 文本
+            for col in df.columns[df.dtypes == object]:
+                df[col] = df[col].map(lambda v: json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v)
+            yield df, chunk[-1][1]
+    else:
+        header = reader.read_header(path)
+        for chunk in reader.iter_chunks(reader.iter_rows(path, header, offset), batch_rows):
+            offset += len(chunk)
+            yield pd.DataFrame(chunk, columns=header), offset
+
+
+def _id_text(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Excel 中有空值的整数ID列会读成浮点
+    return str(value).strip()
+
+
+def row_keys(df, dataset):
+    """去重键：有ID时为 id:<ID>，否则为文本（没有文本列时为整行）的哈希"""
+    id_col = next((c for c in ID_COLUMNS[dataset] if c in df.columns), None)
+    text_col = next((c for c in TEXT_COLUMNS[dataset] if c in df.columns), None)
+    texts = df[text_col].astype(str) if text_col else df.astype(str).agg("\x1f".join, axis=1)
+    ids = df[id_col] if id_col else [None] * len(df)
+    keys = []
+    for value, text in zip(ids, texts):
+        if value is not None and not pd.isna(value) and _id_text(value):
+            keys.append(f"id:{_id_text(value)}")
+        else:
+            keys.append("sha1:" + hashlib.sha1(text.encode("utf-8")).hexdigest())
+    return keys
+
+
+def part_path(store_dir, dataset, source, generation, offset):
+    """分片按来源文件、版本和起始断点命名，重做同一批时覆盖而不是重复追加"""
+    digest = hashlib.sha1(os.path.abspath(source).encode("utf-8")).hexdigest()[:10]
+    return os.path.join(store_dir, f"{PART_LABELS[dataset]}-ingest-{digest}-g{generation}-{offset:012d}.parquet")
+
+
+def write_part(df, path):
+    """混合类型的 object 列统一存为字符串（同附件十七 to_parquet_cache），先写临时文件再改名"""
+    df = df.copy()
+    df.columns = df.columns.astype(str)
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].astype("string")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def label_items(df):
+    """新评论的标注队列项 (结果库键, 评论ID, 笔记topic, 评论内容)，键与附件二写入结果库时一致"""
+    if "评论内容" not in df.columns:
+        return []
+    items = []
+    comment_ids = df["评论ID"] if "评论ID" in df.columns else [None] * len(df)
+    topics = df["笔记topic"] if "笔记topic" in df.columns else [None] * len(df)
+    for comment_id, topic, comment in zip(comment_ids, topics, df["评论内容"]):
+        if pd.isna(comment) or not str(comment).strip():
+            continue
+        topic = str(topic) if pd.notna(topic) else ""
+        comment_id = None if comment_id is None or pd.isna(comment_id) else _id_text(comment_id)
+        items.append((store.label_key(comment_id, topic, str(comment)), comment_id, topic, str(comment)))
+    return items
+
+#--------------------------------------------------------------------------
+# 扫描与入库
+
+def plan_file(state, path, now, settle_seconds=SETTLE_SECONDS):
+    """返回 (起始断点, 版本, size, mtime)；无需处理时返回 None"""
+    stat = os.stat(path)
+    checkpoint = state.checkpoint(path)
+    unchanged = checkpoint is not None and (checkpoint["size"], checkpoint["mtime"]) == (stat.st_size, stat.st_mtime)
+    if unchanged and checkpoint["complete"]:
+        return None
+    if _kind(path) != "jsonl" and now - stat.st_mtime < settle_seconds:
+        return None  # 可能还在写入
+    if checkpoint is None:
+        return 0, 0, stat.st_size, stat.st_mtime
+    appendable = path.lower().endswith((".jsonl", ".ndjson", ".csv"))
+    if unchanged or (appendable and stat.st_size >= checkpoint["size"]):
+        return checkpoint["offset"], checkpoint["generation"], stat.st_size, stat.st_mtime  # 续读 / 读追加部分
+    # 文件被整体改写：从头重读，已见集合保证旧行不会重复入库
+    return 0, checkpoint["generation"] + 1, stat.st_size, stat.st_mtime
+
+
+def ingest_file(state, path, store_dir=STORE_DIR, batch_rows=BATCH_ROWS, max_batches=MAX_BATCHES_PER_FILE,
+                backpressure=lambda: False, now=None):
+    """处理一个文件（最多 max_batches 批），返回 {数据集: 新增行数, "duplicates": 重复行数}"""
+    plan = plan_file(state, path, time.time() if now is None else now)
+    stats = {"posts": 0, "comments": 0, "duplicates": 0}
+    if plan is None:
+        return stats
+    offset, generation, size, mtime = plan
+    complete = True
+    for n, (df, next_offset) in enumerate(read_batches(path, offset, batch_rows)):
+        dataset = dataset_of(path, df.columns)
+        if n >= max_batches or (dataset == "comments" and backpressure()):
+            complete = False
+            break
+        df = df.assign(_key=row_keys(df, dataset)).drop_duplicates("_key")
+        new_keys = state.unseen(dataset, df["_key"])
+        fresh = df[df["_key"].isin(set(new_keys))].drop(columns="_key")
+        if len(fresh):
+            write_part(fresh, part_path(store_dir, dataset, path, generation, offset))
+        queue = label_items(fresh) if dataset == "comments" else []
+        state.commit_batch(dataset, new_keys, queue, path, size, mtime, next_offset, generation, False, len(df))
+        stats[dataset] += len(fresh)
+        stats["duplicates"] += len(df) - len(fresh)
+        offset = next_offset
+    if complete:
+        state.commit_batch("posts", [], [], path, size, mtime, offset, generation, True, 0)
+    return stats
+
+
+def scan(drop_dir=DROP_DIR):
+    """目录下待处理的文件，按修改时间排序（与附件三一致，后写入的视为更新）"""
+    paths = [os.path.abspath(os.path.join(drop_dir, name)) for name in os.listdir(drop_dir)
+             if name.lower().endswith(SUFFIXES) and not name.startswith(("~$", "."))]
+    return sorted(paths, key=os.path.getmtime)
+
+
+def ingest_once(state, drop_dir=DROP_DIR, store_dir=STORE_DIR, backpressure=lambda: False, now=None):
+    """扫描一轮，返回合计的新增 / 重复行数"""
+    total = {"posts": 0, "comments": 0, "duplicates": 0}
+    for path in scan(drop_dir):
+        try:
+            stats = ingest_file(state, path, store_dir, backpressure=backpressure, now=now)
+        except Exception as e:
+            print(f"入库 {os.path.basename(path)} 失败（下轮重试）: {str(e)}")
+            continue
+        for key, value in stats.items():
+            total[key] += value
+    return total
+
+#--------------------------------------------------------------------------
+# 标注线程：从队列取评论，经附件二的模型阶梯和密钥池标注，写入结果库后出队
+
+def label_worker(state_path, db_path, stop, poll_seconds=POLL_SECONDS, batch=LABEL_BATCH):
+    llm = importlib.import_module("附件二：LLM")
+    credentials = importlib.import_module("附件二十二：密钥池")
+    state = IngestState(state_path)
+    con = store.connect(db_path or store.DB_PATH)
+    try:
+        while not stop.is_set():
+            items = state.take_labels(batch)
+            if not items:
+                stop.wait(poll_seconds)
+                continue
+            done = store.done_keys(con, [key for _, key, *_ in items])  # 结果库中已有成功结果的不再请求
+            todo = [item for item in items if item[1] not in done]
+            try:
+                results = credentials.ordered_map(
+                    lambda item: llm.label_with_retry(item[3], item[4], item[0] - 1, LABEL_RETRIES),
+                    todo, llm.get_pool().concurrency)
+                records = [store.make_record(key, topic, comment, fields, status, error, comment_id=comment_id,
+                                             model=model, prompt_version=llm.PROMPT_VERSION)
+                           for (_, key, comment_id, topic, comment), (fields, status, error, model) in zip(todo, results)]
+            except Exception as e:
+                print(f"标注失败（稍后重试）: {str(e)}")
+                stop.wait(poll_seconds)
+                continue
+            # 失败的行也写入结果库，由附件二的修复流程处理，不在队列中反复重试
+            store.upsert(con, records)
+            state.finish_labels([key for _, key, *_ in items])
+    finally:
+        con.close()
+        state.close()
+
+
+def run(drop_dir=DROP_DIR, store_dir=STORE_DIR, state_path=STATE_DB, poll_seconds=POLL_SECONDS,
+        label=False, db_path=None, once=False, max_pending=MAX_PENDING_LABELS):
+    """常驻运行：每 poll_seconds 扫描一次；label 为 True 时同时启动标注线程，并对评论摄入施加背压"""
+    os.makedirs(drop_dir, exist_ok=True)
+    state = IngestState(state_path)
+    stop = threading.Event()
+    worker = None
+    if label:
+        worker = threading.Thread(target=label_worker, args=(state_path, db_path, stop, poll_seconds), daemon=True)
+        worker.start()
+    paused = False
+
+    def backpressure():
+        nonlocal paused
+        if not label:
+            return False  # 没有消费者时只入队，不阻塞摄入
+        pending = state.pending_labels()
+        if pending >= max_pending and not paused:
+            print(f"标注队列积压 {pending} 条，暂停摄入评论")
+        elif pending < max_pending and paused:
+            print("标注队列已回落，恢复摄入评论")
+        paused = pending >= max_pending
+        return paused
+
+    print(f"监视 {os.path.abspath(drop_dir)}，入库到 {os.path.abspath(store_dir)}，Ctrl+C 退出")
+    try:
+        while True:
+            stats = ingest_once(state, drop_dir, store_dir, backpressure)
+            if stats["posts"] or stats["comments"] or stats["duplicates"]:
+                print(f"[{_now()}] 新增帖子 {stats['posts']}，新增评论 {stats['comments']}，"
+                      f"重复 {stats['duplicates']}；{state.summary()}")
+            if once:
+                break
+            time.sleep(poll_seconds)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        if worker is not None:
+            worker.join()
+        print(f"已停止：{state.summary()}")
+        state.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="监视爬虫输出目录，增量去重入库并排队标注")
+    parser.add_argument("--drop", default=DROP_DIR, help="爬虫输出目录（JSONL / CSV / XLSX）")
+    parser.add_argument("--store", default=STORE_DIR, help="Parquet 分片输出目录")
+    parser.add_argument("--state", default=STATE_DB, help="入库状态库")
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS, help="扫描间隔（秒）")
+    parser.add_argument("--label", action="store_true", help="同时运行标注线程（需在附件二中配置API密钥）")
+    parser.add_argument("--db", help="标注结果库，默认使用附件十八的 DB_PATH")
+    parser.add_argument("--once", action="store_true", help="只扫描一轮")
+    parser.add_argument("--status", action="store_true", help="只显示入库状态")
+    args = parser.parse_args(argv)
+    if args.status:
+        state = IngestState(args.state)
+        print(state.summary())
+        state.close()
+        return
+    run(args.drop, args.store, args.state, args.poll, args.label, args.db, args.once)
+
+
+if __name__ == "__main__":
+    main()
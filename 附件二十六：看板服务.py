@@ -0,0 +1,266 @@
+import io
+import os
+import json
+import time
+import argparse
+import functools
+import importlib
+import threading
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+# 本地分析看板：启动时把预先算好的聚合表（话题日声量/情感、话题象限、各话题词频、用户来源×情感）读入内存，
+# 切换话题只是查字典；图表按需渲染，渲染结果放在 LRU 缓存中。只依赖标准库 http.server，不连接任何外部服务
+topics = importlib.import_module("附件五：话题筛选")
+words = importlib.import_module("附件六：分词")
+origins = importlib.import_module("附件七：评论特点分析")
+tracing = importlib.import_module("附件十五：性能追踪")
+
+file_path = topics.file_path
+AGGREGATE_DIR = "dashboard_data"  # 聚合表目录（源文件更新后自动重新计算）
+HOST = "127.0.0.1"  # 只监听本机
+PORT = 8765
+IMAGE_CACHE_SIZE = 128  # 缓存的图片张数
+IMAGE_DPI = 100
+TOP_WORDS = 100  # 每个话题保存的高频词个数
+META_FILE = "meta.json"
+
+#--------------------------------------------------------------------------
+# 预计算：读取一次全量数据，算出看板需要的全部聚合表
+
+def _aggregates_fresh(source, out_dir):
+    meta_path = os.path.join(out_dir, META_FILE)
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    return meta.get("source") == os.path.abspath(source) and meta.get("mtime") == os.path.getmtime(source)
+
+
+@tracing.traced()
+def build_aggregates(source=file_path, out_dir=AGGREGATE_DIR, top_words=TOP_WORDS):
+    """计算并保存看板使用的聚合表；返回输出目录"""
+    os.makedirs(out_dir, exist_ok=True)
+    df = topics.load_topic_data(source)
+    topic_daily = topics.compute_topic_daily(df)
+    topic_overall, high_volume_threshold = topics.classify_topics(topics.compute_topic_overall(df))
+    percentage_table, _ = origins.compute_origin_tables(source, origins.archive_paths)
+    frequencies = {topic: dict(list(freq.items())[:top_words])
+                   for topic, freq in words.build_frequency_tables(df).items()}
+
+    topic_daily.to_parquet(os.path.join(out_dir, "topic_daily.parquet"), index=False)
+    topic_overall.to_parquet(os.path.join(out_dir, "topic_overall.parquet"), index=False)
+    percentage_table.rename(columns=str).to_parquet(os.path.join(out_dir, "origin_sentiment.parquet"))
+    with open(os.path.join(out_dir, "word_frequencies.json"), "w", encoding="utf-8") as f:
+        json.dump(frequencies, f, ensure_ascii=False)
+    # meta 最后写入，中途失败时下次启动会重新计算
+    with open(os.path.join(out_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({"source": os.path.abspath(source), "mtime": os.path.getmtime(source),
+                   "high_volume_threshold": float(high_volume_threshold)}, f, ensure_ascii=False)
+    print(f"看板聚合表已保存到 {out_dir}（{len(topic_overall)} 个话题，{len(topic_daily)} 个话题日）")
+    return out_dir
+
+
+def ensure_aggregates(source=file_path, out_dir=AGGREGATE_DIR, rebuild=False):
+    if rebuild or not _aggregates_fresh(source, out_dir):
+        build_aggregates(source, out_dir)
+    return out_dir
+
+#--------------------------------------------------------------------------
+# 内存中的看板数据：JSON 响应在启动时序列化好，图片首次请求时渲染并缓存
+
+def _json(value):
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+def _records(df):
+    df = df.copy()
+    if "日期" in df.columns:
+        df["日期"] = df["日期"].astype(str)
+    return json.loads(df.to_json(orient="records", force_ascii=False))
+
+
+class Dashboard:
+    def __init__(self, out_dir=AGGREGATE_DIR, image_cache_size=IMAGE_CACHE_SIZE, dpi=IMAGE_DPI):
+        with open(os.path.join(out_dir, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.topic_daily = pd.read_parquet(os.path.join(out_dir, "topic_daily.parquet"))
+        self.topic_overall = pd.read_parquet(os.path.join(out_dir, "topic_overall.parquet"))
+        self.percentage_table = pd.read_parquet(os.path.join(out_dir, "origin_sentiment.parquet"))
+        with open(os.path.join(out_dir, "word_frequencies.json"), encoding="utf-8") as f:
+            self.frequencies = json.load(f)
+        self.threshold = self.meta["high_volume_threshold"]
+        self.topics = self.topic_overall.sort_values("总声量", ascending=False)["笔记topic"].astype(str).tolist()
+        self.daily_by_topic = {str(topic): group for topic, group in self.topic_daily.groupby("笔记topic")}
+
+        self.payloads = {
+            ("topics", None): _json(self.topics),
+            ("quadrant", None): _json({"high_volume_threshold": self.threshold,
+                                       "topics": _records(self.topic_overall)}),
+            ("origin", None): _json({origin: row.to_dict() for origin, row in self.percentage_table.iterrows()}),
+        }
+        for topic in self.topics:
+            daily = self.daily_by_topic.get(topic, self.topic_daily.iloc[:0])
+            self.payloads[("trend", topic)] = _json(_records(daily))
+
+        self.dpi = dpi
+        self._render_lock = threading.Lock()  # pyplot 的全局状态不是线程安全的
+        self.image = functools.lru_cache(maxsize=image_cache_size)(self._render_image)
+
+    def words(self, topic, top=TOP_WORDS):
+        freq = self.frequencies.get(topic)
+        return None if freq is None else _json(dict(list(freq.items())[:top]))
+
+    def _render_image(self, view, topic=None):
+        """用各脚本原有的绘图函数绘制，保存为 PNG 字节"""
+        import matplotlib
+        matplotlib.use("Agg")
+        plotters = {
+            "trend": lambda: topics.volume_sentiment_analyse(topic, self.topic_daily),
+            "quadrant": lambda: topics.plot_topic_quadrant(self.topic_overall, self.threshold),
+            "words": lambda: words.plot_word_cloud(topic, self.frequencies[topic]),
+            "origin": lambda: origins.plot_percentage_table(self.percentage_table),
+        }
+        plt = topics.downsampling.pyplot()
+        with self._render_lock:
+            plt.close("all")
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)  # Agg 下 plt.show() 的提示
+                plotters[view]()
+            buffer = io.BytesIO()
+            plt.gcf().savefig(buffer, format="png", dpi=self.dpi, bbox_inches="tight")
+            plt.close("all")
+        return buffer.getvalue()
+
+    def stats(self):
+        info = self.image.cache_info()
+        return _json({"topics": len(self.topics), "image_cache": {"hits": info.hits, "misses": info.misses,
+                                                                  "size": info.currsize, "max_size": info.maxsize}})
+
+#--------------------------------------------------------------------------
+# HTTP 服务
+
+INDEX_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>话题看板</title>
+<style>body{font-family:sans-serif;margin:20px} img{max-width:100%;display:block;margin:10px 0} .row{display:flex;gap:20px}</style>
+</head><body>
+<h1>小红书'TikTok难民'事件话题看板</h1>
+<p>话题：<select id="topic"></select> <span id="info"></span></p>
+<div class="row"><img id="trend"><img id="words"></div>
+<div class="row"><img src="/chart/quadrant.png"><img src="/chart/origin.png"></div>
+<script>
+const select = document.getElementById("topic");
+function show(topic) {
+  const q = "?topic=" + encodeURIComponent(topic), start = performance.now();
+  document.getElementById("trend").src = "/chart/trend.png" + q;
+  document.getElementById("words").src = "/chart/words.png" + q;
+  fetch("/api/trend" + q).then(r => r.json()).then(rows => {
+    const volume = rows.reduce((s, r) => s + r["声量"], 0);
+    document.getElementById("info").textContent =
+      `${rows.length} 天，总声量 ${volume}（数据 ${(performance.now() - start).toFixed(0)} ms）`;
+  });
+}
+fetch("/api/topics").then(r => r.json()).then(topics => {
+  for (const t of topics) select.add(new Option(t, t));
+  select.onchange = () => show(select.value);
+  if (topics.length) show(topics[0]);
+});
+</script>
+</body></html>
+"""
+
+CHARTS = {"/chart/trend.png": "trend", "/chart/quadrant.png": "quadrant",
+          "/chart/words.png": "words", "/chart/origin.png": "origin"}
+TOPIC_VIEWS = {"trend", "words"}  # 需要 topic 参数的视图
+
+
+class DashboardHandler(BaseHTTPRequestHandler):
+    dashboard = None  # 由 serve 设置
+
+    def _send(self, status, body, content_type="application/json; charset=utf-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send(status, _json({"error": message}))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        topic = params.get("topic")
+        dashboard = self.dashboard
+        if url.path in CHARTS:
+            view = CHARTS[url.path]
+            if (view == "trend" and topic not in dashboard.daily_by_topic) or \
+                    (view == "words" and topic not in dashboard.frequencies):
+                return self._error(404, f"未知话题: {topic}")
+            try:
+                image = dashboard.image(view, topic if view in TOPIC_VIEWS else None)
+            except Exception as e:
+                return self._error(500, f"绘图失败: {str(e)}")
+            return self._send(200, image, "image/png")
+        if url.path == "/":
+            return self._send(200, INDEX_PAGE.encode("utf-8"), "text/html; charset=utf-8")
+        if url.path == "/api/stats":
+            return self._send(200, dashboard.stats())
+        if url.path == "/api/words":
+            try:
+                top = int(params.get("top", TOP_WORDS))
+            except ValueError:
+                return self._error(400, "top 必须是整数")
+            body = dashboard.words(topic, top)
+            return self._send(200, body) if body is not None else self._error(404, f"未知话题: {topic}")
+        view = url.path.removeprefix("/api/")
+        body = dashboard.payloads.get((view, topic if view in TOPIC_VIEWS else None))
+        if body is None:
+            return self._error(404, f"未知话题: {topic}" if view in TOPIC_VIEWS else f"未知路径: {url.path}")
+        return self._send(200, body)
+
+    def log_message(self, format, *args):
+        pass  # 不在终端逐条打印请求
+
+
+def make_server(dashboard, host=HOST, port=PORT):
+    handler = type("Handler", (DashboardHandler,), {"dashboard": dashboard})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(source=file_path, out_dir=AGGREGATE_DIR, host=HOST, port=PORT, rebuild=False):
+    ensure_aggregates(source, out_dir, rebuild)
+    start = time.perf_counter()
+    dashboard = Dashboard(out_dir)
+    server = make_server(dashboard, host, port)
+    print(f"已加载 {len(dashboard.topics)} 个话题（{time.perf_counter() - start:.2f}s），"
+          f"看板地址 http://{host}:{server.server_port}/ ，Ctrl+C 退出")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地话题看板（预计算聚合表 + 内存查询 + 图片缓存）")
+    parser.add_argument("--file", default=file_path, help="有标记的评论 Excel")
+    parser.add_argument("--dir", default=AGGREGATE_DIR, help="聚合表目录")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--rebuild", action="store_true", help="忽略已有聚合表，重新计算")
+    parser.add_argument("--build-only", action="store_true", help="只计算聚合表，不启动服务")
+    args = parser.parse_args(argv)
+    if args.build_only:
+        build_aggregates(args.file, args.dir)
+        return
+    serve(args.file, args.dir, args.host, args.port, args.rebuild)
+
+
+if __name__ == "__main__":
+    main()
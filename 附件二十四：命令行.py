@@ -0,0 +1,178 @@
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import subprocess
+
+# 统一命令行入口：子命令运行时才导入对应脚本，matplotlib / seaborn / scipy / jieba 只由用到它们的命令导入，
+# 查看帮助或只算表时不付出这些导入开销；各脚本导入时不读任何文件
+HEAVY_MODULES = ["matplotlib", "seaborn", "scipy", "jieba", "wordcloud"]
+IMPORT_BUDGET_SECONDS = 1.5  # 只算表的命令冷启动（新解释器 + 导入）的时间上限，见 selfcheck
+
+COMMANDS = {
+    # 命令: (脚本模块, 说明)
+    "topics": ("附件五：话题筛选", "话题声量与情感分类表（--plot 画象限图）"),
+    "volume": ("附件八：话题声量分析", "各话题每日声量表（--plot 画折线图）"),
+    "origin": ("附件七：评论特点分析", "不同来源用户的情感分布与VAD统计（--plot 画柱状图）"),
+    "words": ("附件六：分词", "各话题高频词（--clouds 批量生成词云）"),
+    "resonance": ("附件四：跨文化情感共鸣分析", "跨文化情感共鸣强度表（--plot 画柱状图）"),
+    "analysis": ("附件三：dataAnalysis", "帖子与评论的四项分析及图表"),
+    "sql": ("附件十七：SQL查询", "DuckDB SQL 查询，其余参数同附件十七"),
+    "store": ("附件十八：标注结果库", "标注结果库，其余参数同附件十八"),
+    "pipeline": ("附件十二：流水线", "分析流水线，其余参数同附件十二"),
+    "dashboard": ("附件二十六：看板服务", "本地话题看板服务，其余参数同附件二十六"),
+    "ingest": ("附件二十八：增量入库", "监视爬虫输出目录增量入库，其余参数同附件二十八"),
+}
+# 不画图时不应导入重型依赖的命令（selfcheck 检查）
+TABLE_COMMANDS = ["topics", "volume", "origin", "sql", "store", "pipeline"]
+FORWARD_COMMANDS = ["sql", "store", "pipeline", "dashboard", "ingest"]  # 参数原样转交给脚本自己的命令行
+
+
+def load(command):
+    return importlib.import_module(COMMANDS[command][0])
+
+
+def show(table):
+    import pandas as pd
+    with pd.option_context("display.max_rows", 200, "display.max_columns", None, "display.width", None):
+        print(table)
+
+
+#--------------------------------------------------------------------------
+# 各子命令
+
+def cmd_topics(args):
+    module = load("topics")
+    path = args.file or module.file_path
+    if args.approx:
+        df = module.load_topic_sample(path, size=args.sample_size or module.SAMPLE_SIZE)
+    else:
+        df = module.load_topic_data(path)
+    topic_overall, high_volume_threshold = module.classify_topics(module.compute_topic_overall(df))
+    module.print_recommendations(topic_overall)
+    if args.plot:
+        module.plot_topic_quadrant(topic_overall, high_volume_threshold)
+
+
+def cmd_volume(args):
+    module = load("volume")
+    topic_volume_over_time = module.compute_topic_volume(module.load_volume_data(args.file or module.file_path))
+    show(topic_volume_over_time)
+    if args.plot:
+        module.plot_topic_volume(topic_volume_over_time)
+        module.plot_daily_total_volume(topic_volume_over_time)
+
+
+def cmd_origin(args):
+    module = load("origin")
+    percentage_table, grouped_data = module.compute_origin_tables(args.file or module.file_path,
+                                                                  args.archive or module.archive_paths)
+    show(percentage_table.round(2))
+    print('愉悦度和支配度的唤醒度统计信息：')
+    show(grouped_data)
+    if args.plot:
+        module.plot_percentage_table(percentage_table)
+        module.plotting.pyplot().show()
+
+
+def cmd_words(args):
+    module = load("words")
+    df = module.load_comments(args.file or module.file_path)
+    if args.clouds:
+        module.batch_word_clouds(df, by=tuple(args.by))
+        return
+    for name, word_freq in module.build_frequency_tables(df, by=tuple(args.by)).items():
+        top = sorted(word_freq.items(), key=lambda item: -item[1])[:args.top]
+        print(f"{name}: " + "，".join(f"{word}({count})" for word, count in top))
+
+
+def cmd_resonance(args):
+    module = load("resonance")
+    if os.path.exists(module.result_db):
+        df_combined = module.load_results_from_store(module.result_db)
+    else:
+        df_combined = module.load_results(module.data_dir, module.file_names)
+    resonance_df = module.compute_resonance(module.clean_results(df_combined))
+    show(resonance_df.sort_values("sentiment_overlap_rate", ascending=False))
+    if args.plot:
+        module.plot_resonance(resonance_df)
+
+
+def cmd_analysis(args):
+    module = load("analysis")
+    module.main(parallel=args.parallel, approx=args.approx,
+                sample_size=args.sample_size or module.APPROX_SAMPLE_SIZE)
+
+
+#--------------------------------------------------------------------------
+# 冷启动自检：在新的解释器中导入命令行和各只算表命令的脚本，检查耗时和是否混入了重型依赖
+
+def _probe(command=None):
+    """返回 (冷启动耗时, 已导入的重型依赖)；command 为空时只构建命令行（相当于 --help）"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    name = os.path.splitext(os.path.basename(__file__))[0]
+    code = (f"import sys, json, importlib; sys.path.insert(0, {here!r}); "
+            f"cli = importlib.import_module({name!r}); cli.build_parser().format_help(); "
+            + (f"cli.load({command!r}); " if command else "")
+            + "print(json.dumps([m for m in cli.HEAVY_MODULES if m in sys.modules]))")
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return time.perf_counter() - start, json.loads(output.strip().splitlines()[-1])
+
+
+def cmd_selfcheck(args):
+    ok = True
+    for command in [None, *TABLE_COMMANDS]:
+        seconds, heavy = _probe(command)
+        passed = seconds <= args.budget and not heavy
+        ok &= passed
+        print(f"{command or '--help':<10} {seconds:6.2f}s  {'通过' if passed else '未通过'}"
+              + (f"  导入了 {', '.join(heavy)}" if heavy else ""))
+    print(f"冷启动预算 {args.budget}s：{'全部通过' if ok else '存在超预算或导入了重型依赖的命令'}")
+    return 0 if ok else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="小红书'TikTok难民'事件分析命令行")
+    sub = parser.add_subparsers(dest="command", required=True)
+    handlers = {"topics": cmd_topics, "volume": cmd_volume, "origin": cmd_origin, "words": cmd_words,
+                "resonance": cmd_resonance, "analysis": cmd_analysis}
+    for command, handler in handlers.items():
+        p = sub.add_parser(command, help=COMMANDS[command][1])
+        p.set_defaults(func=handler)
+        if command in ("topics", "volume", "origin", "words"):
+            p.add_argument("--file", help="输入 Excel，默认使用脚本中配置的路径")
+        if command in ("topics", "volume", "origin", "resonance"):
+            p.add_argument("--plot", action="store_true", help="同时绘图")
+        if command == "origin":
+            p.add_argument("--archive", nargs="+", help="归档分片（Parquet / CSV），流式累加")
+        if command == "words":
+            p.add_argument("--by", nargs="+", default=["笔记topic"], help="分组列，例如 笔记topic user_origin")
+            p.add_argument("--top", type=int, default=20, help="每组显示的高频词个数")
+            p.add_argument("--clouds", action="store_true", help="批量生成词云图片")
+        if command == "analysis":
+            p.add_argument("--parallel", action="store_true", help="在子进程中并行运行各项分析（数据经共享内存传递）")
+        if command in ("topics", "analysis"):
+            p.add_argument("--approx", action="store_true", help="近似模式：分层抽样估计，附置信区间，用于快速探索")
+            p.add_argument("--sample-size", type=int, help="近似模式的样本量，默认使用脚本中的配置")
+    for command in FORWARD_COMMANDS:
+        sub.add_parser(command, help=COMMANDS[command][1], add_help=False)  # 仅用于帮助列表，见 main
+    p = sub.add_parser("selfcheck", help="检查只算表命令的冷启动耗时和依赖")
+    p.add_argument("--budget", type=float, default=IMPORT_BUDGET_SECONDS)
+    p.set_defaults(func=cmd_selfcheck)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in FORWARD_COMMANDS:
+        # 参数原样转交，避免 argparse 把脚本自己的选项当成本命令行的选项
+        return load(argv[0]).main(argv[1:])
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+import hashlib
+import importlib
+
+clip = importlib.import_module("附件十九：文本裁剪")
+
+
+def render_system(instructions, examples=()):
+    """把固定说明和 few-shot 示例拼成系统消息；不含任何逐条变化的内容，每次请求逐字节相同"""
+    parts = [instructions.strip()]
+    if examples:
+        parts.append("示例：")
+        parts += [f"{render_user(fields)}\n输出：{answer}" for fields, answer in examples]
+    return "\n\n".join(parts)
+
+
+def render_user(fields):
+    """用户消息只包含逐条变化的字段，顺序固定"""
+    return "\n".join(f"{name}: {value}" for name, value in fields.items())
+
+
+class PromptBuilder:
+    """
+    固定的系统消息在前、变化的内容在后，服务商的前缀缓存（prefix caching）可以命中整个系统消息。
+    fingerprint 为系统消息的哈希，写入运行监控，用于确认整个运行期间前缀没有变化。
+    """
+
+    def __init__(self, instructions, examples=()):
+        self.system = render_system(instructions, examples)
+        self.fingerprint = hashlib.sha1(self.system.encode("utf-8")).hexdigest()[:12]
+        self.system_tokens = clip.estimate_tokens(self.system)
+
+    def messages(self, **fields):
+        return [{"role": "system", "content": self.system},
+                {"role": "user", "content": render_user(fields)}]
@@ -1,17 +1,24 @@
 import requests
 import re
+import os
+import importlib
 import pandas as pd
 import time
 from tqdm import tqdm
 
 # 硅基流动 API 配置
 URL = "https://api.siliconflow.cn/v1/chat/completions"
-TOKEN = "……"  # 请替换为您的实际API密钥
+TOKENS = ["……"]  # 请替换为您的实际API密钥，可填多个，请求会分散到各密钥上（附件二十二）
+RPM_PER_KEY = 30  # 每个密钥每分钟的请求数上限
 # 配置路径
 INPUT_EXCEL = "D:/111PythonLearning/data/comments.xlsx"  # 输入文件路径
-OUTPUT_EXCEL = "D:/111PythonLearning/data/deal/result6.xlsx"  # 输出文件路径
+OUTPUT_EXCEL = "D:/111PythonLearning/data/deal/result6.xlsx"  # 输出文件路径（由结果库导出）
+# 模型梯度使用附件二十一的 MODEL_LADDER：先用小模型，字段缺失/无效或两次投票不一致时升级
+CHEAP_VOTES = 2  # 小模型的投票次数
+PROMPT_VERSION = "v2"  # 修改 PROMPT 后递增，结果库中可区分不同版本的标签（v2：固定系统消息 + few-shot）
 # 精心设计的Prompt模板
-PROMPT = """
+# 固定说明和示例放在系统消息中（逐字节不变，可命中服务商的前缀缓存），用户消息只含笔记topic和评论内容
+PROMPT_INSTRUCTIONS = """
 你是一个社交媒体数据分析专家，正在分析TikTok被禁期间外国网友涌入小红书平台的用户评论。请根据以下要求分析评论：
 分析维度：
 1. sentiment：[快乐, 悲伤, 厌恶, 恐惧, 愤怒, 惊讶, 赞美, 感动, 疑惑, 对比]
@@ -23,39 +30,89 @@ PROMPT = """
    - Valence：情感积极程度（0=非常负面，5=非常积极）
    - Arousal：情感强烈程度（0=平静，5=兴奋）
    - Dominance：控制感程度（0=无助，5=掌控）
-当前分析对象：
-笔记topic: {topic}
-评论内容: {comment}
 
 输出示例："sentiment":"感动","user_origin":"外国用户","valence":4,"arousal":3,"dominance":2
 """
+PROMPT_EXAMPLES = [
+    ({"笔记topic": "cattax", "评论内容": "哈哈哈这猫税交得好，欢迎来小红书！"},
+     '"sentiment":"快乐","user_origin":"中国用户","valence":5,"arousal":4,"dominance":4'),
+    ({"笔记topic": "learn", "评论内容": "I don't understand the comments here but everyone is so kind"},
+     '"sentiment":"感动","user_origin":"外国用户","valence":4,"arousal":2,"dominance":2'),
+    ({"笔记topic": "物价对比", "评论内容": "看完美国的医疗账单有点害怕"},
+     '"sentiment":"恐惧","user_origin":"中国用户","valence":1,"arousal":3,"dominance":1'),
+]
+# 修复追问：只针对缺失或无效的字段，所有字段规则都放在固定的系统消息中，用户消息只列出需要补充的字段
+REPAIR_INSTRUCTIONS = """
+上一次分析中部分字段缺失或取值无效，请只补充用户消息中"需补充字段"列出的字段，不要输出其他字段。
+各字段规则：
+sentiment：只能是[快乐, 悲伤, 厌恶, 恐惧, 愤怒, 惊讶, 赞美, 感动, 疑惑, 对比, 中性]中的一个
+user_origin：只能是[中国用户, 外国用户, 未知]中的一个
+valence：情感积极程度，0-5整数（0=非常负面，5=非常积极）
+arousal：情感强烈程度，0-5整数（0=平静，5=兴奋）
+dominance：控制感程度，0-5整数（0=无助，5=掌控）
+
+输出格式同："sentiment":"感动","valence":4
+"""
+prompts = importlib.import_module("附件二十：提示词构建")
+LABEL_PROMPT = prompts.PromptBuilder(PROMPT_INSTRUCTIONS, PROMPT_EXAMPLES)
+REPAIR_PROMPT = prompts.PromptBuilder(REPAIR_INSTRUCTIONS)
+REPAIR_AFTER_RUN = True  # 主循环结束后对本次的失败行做一轮低优先级修复
+COMMENT_TOKEN_BUDGET = 300  # 评论内容的 token 预算（本地估算），超出时保留首尾，见附件十九
 RETRY_TIMES = 3  # 失败重试次数
-SLEEP_SECONDS = 2  # 每次请求间隔
+SLEEP_SECONDS = 2  # 重试间隔基数（请求节奏由密钥池控制）
+ROW_START = 8000  # 控制条数：本次处理的起始行
+ROW_END = 9336  # 控制条数：本次处理的结束行（None 表示到末尾）
+RESUME_LOOKUP_ROWS = 500  # 流式读取时每读这么多行查询一次结果库，判断哪些行已完成
+
+# 运行监控（延迟、token 用量、失败原因、吞吐量），定期写出状态文件
+STATUS_FILE = None  # 为空时写在输出文件旁：<输出文件>.status.json（或 .prom）
+STATUS_FORMAT = "json"  # "json" 或 "prometheus"
+monitor = importlib.import_module("附件十六：标注监控")
+store = importlib.import_module("附件十八：标注结果库")
+RESULT_DB = store.DB_PATH  # 标注结果库路径在附件十八中统一配置
+clip = importlib.import_module("附件十九：文本裁剪")
+routing = importlib.import_module("附件二十一：模型路由")
+credentials = importlib.import_module("附件二十二：密钥池")
+reader = importlib.import_module("附件二十三：流式读取")
+metrics = None  # 运行时由 process_excel 创建
+_pool = None  # 首次调用API时按 TOKENS 创建
+_response_cache = {}  # (笔记topic, 评论内容) -> (解析结果, 模型)，重复评论只调用一次API
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = credentials.CredentialPool(TOKENS, rpm=RPM_PER_KEY)
+    return _pool
 
-def call_api(topic, comment,timeout=2):
-    prompt = PROMPT.format(topic=topic,comment=comment)
+def call_api(topic, comment,timeout=2, messages=None, max_tokens=200, model=None):
     payload = {
-        "model": "deepseek-ai/DeepSeek-V3",
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": 200,
+        "model": model or routing.MODEL_LADDER[-1],
+        "messages": messages or LABEL_PROMPT.messages(笔记topic=topic, 评论内容=comment),
+        "max_tokens": max_tokens,
         "temperature": 0.3,
         "top_p": 0.8
     }
     HEADERS = {
-        "Authorization": f"Bearer {TOKEN}",
-        "Content-Type": "application/json"
+        "Content-Type": "application/json"  # Authorization 由密钥池填入
     }
+    start = time.time()
     try:
-        response = requests.request("POST", URL, json=payload, headers=HEADERS,timeout=timeout)
+        response = get_pool().post(URL, json=payload, headers=HEADERS,timeout=timeout)
         response.raise_for_status()
-        response_text = response.json()['choices'][0]['message']['content']
+        data = response.json()
+        if metrics:
+            metrics.observe_request(time.time() - start, data.get('usage'), payload['model'])
+        response_text = data['choices'][0]['message']['content']
         return response_text
-    except:
-        return "API调用失败"  # 失败时返回固定标识
+    except Exception as e:
+        if metrics:
+            metrics.record_failure(monitor.classify_error(e))
+        if isinstance(e, requests.exceptions.Timeout):
+            raise  # 超时交给 label_with_retry / ask_missing_fields 处理（重试或记为超时）
+        return "API调用失败"  # 其他失败返回固定标识
 
-def parse_response(generated_text):
-    if generated_text == "API调用失败":
-        return (0, 0, 0, 0, 0)
+def parse_fields(generated_text):
+    """按字段解析返回内容，找不到的字段为 None"""
     # 优化正则表达式，适配JSON格式
     patterns = {
         # 匹配带引号的字符串值，允许值中包含空格和中文
@@ -66,101 +123,220 @@ def parse_response(generated_text):
         "arousal": r'"arousal"\s*:\s*(\d+)',
         "dominance": r'"dominance"\s*:\s*(\d+)'
     }
-    result = []
-    for key in ["sentiment", "user_origin", "valence", "arousal", "dominance"]:
+    fields = {}
+    for key in store.LABEL_FIELDS:
         match = re.search(patterns[key], generated_text)
-        if match:
+        if match is None:
+            fields[key] = None
+        elif key in ["valence", "arousal", "dominance"]:
             # 对于数字类型进行转换
-            if key in ["valence", "arousal", "dominance"]:
-                result.append(int(match.group(1)))
-            else:
-                result.append(match.group(1))
+            fields[key] = int(match.group(1))
         else:
-            result.append(0)  # 找不到则记为0
-    return tuple(result)
+            fields[key] = match.group(1)
+    return fields
+
+def parse_response(generated_text):
+    if generated_text == "API调用失败":
+        return (0, 0, 0, 0, 0)
+    fields = parse_fields(generated_text)
+    if any(value is None for value in fields.values()) and metrics:
+        metrics.record_failure("parse_failure")
+    return tuple(0 if value is None else value for value in fields.values())  # 找不到则记为0
+
+def same_label(a, b):
+    """两次投票的情感类别和用户来源相同即视为一致（VAD 打分允许有差异）"""
+    return a["sentiment"] == b["sentiment"] and a["user_origin"] == b["user_origin"]
+
+def label_comment(topic, comment):
+    """标注一条评论（经过模型梯度），返回 (字段字典, 状态, 错误信息, 给出结果的模型)"""
+    if (topic, comment) in _response_cache:
+        # 重复评论直接复用已解析的结果
+        if metrics:
+            metrics.record_cache_hit()
+        fields, model = _response_cache[(topic, comment)]
+        return fields, store.STATUS_OK, None, model
+    fitted = fit_comment(comment)
+    router = routing.ModelRouter(parse_fields, lambda fields: not store.invalid_fields(fields), same_label,
+                                 votes=CHEAP_VOTES)
+    api_result, fields, model, _ = router.route(
+        lambda model: call_api(topic, fitted, timeout=10, model=model), metrics)  # 10秒超时
+    if api_result == "API调用失败":
+        return {}, store.STATUS_API_FAILED, api_result, model
+    bad = store.invalid_fields(fields)
+    if bad:
+        # 不在主循环里重试整行，无效字段置空后留给 repair_labels 追问
+        if metrics:
+            metrics.record_failure("parse_failure")
+        return {**fields, **dict.fromkeys(bad)}, store.STATUS_PARSE_FAILED, None, model
+    _response_cache[(topic, comment)] = (fields, model)
+    return fields, store.STATUS_OK, None, model
 
-def process_excel(INPUT_EXCEL, OUTPUT_EXCEL, batch_size=20, max_retries=2):
-    # 1. 读取输入数据
+def fit_comment(comment):
+    """清理并裁剪过长的评论，节省的 token 计入运行监控"""
+    fitted, tokens_before, tokens_after = clip.fit_text(comment, COMMENT_TOKEN_BUDGET)
+    if metrics:
+        metrics.record_truncation(tokens_before, tokens_after)
+    return fitted
+
+def build_repair_messages(topic, comment, fields):
+    return REPAIR_PROMPT.messages(需补充字段=", ".join(fields), 笔记topic=topic, 评论内容=fit_comment(comment))
+
+def ask_missing_fields(row):
+    """对结果库中的一行追问缺失或无效的字段，返回 (已有字段, 需补充的字段, 回复)"""
+    labels = {f: (None if pd.isna(row[f]) else row[f]) for f in store.LABEL_FIELDS}
+    bad = store.invalid_fields(labels)
+    try:
+        answer = call_api(row["topic"], row["comment"], timeout=10,
+                          messages=build_repair_messages(row["topic"], row["comment"], bad), max_tokens=60)
+    except requests.exceptions.Timeout:
+        answer = "API调用失败"
+    return labels, bad, answer
+
+def repair_labels(db_path=RESULT_DB, keys=None, max_attempts=store.MAX_REPAIR_ATTEMPTS, limit=None):
+    """
+    低优先级修复：对结果库中未成功的行只追问缺失或无效的字段，合法的字段保留。
+    整行失败（API调用失败、超时）的行所有字段都会追问。返回修复成功的行数。
+    """
+    con = store.connect(db_path)
+    queue = store.repair_queue(con, keys, max_attempts, limit)
+    if queue.empty:
+        con.close()
+        return 0
+    repaired = 0
+    rows = queue.to_dict("records")
+    try:
+        answers = credentials.ordered_map(ask_missing_fields, rows, get_pool().concurrency)
+        pbar = tqdm(rows, desc="修复进度")
+        for row, (labels, bad, answer) in zip(pbar, answers):
+            if answer != "API调用失败":
+                fields = parse_fields(answer)
+                labels.update({f: fields[f] for f in bad if fields[f] is not None})
+            still_bad = store.invalid_fields(labels)
+            labels.update(dict.fromkeys(still_bad))
+            if not still_bad:
+                status, error = store.STATUS_OK, None
+                repaired += 1
+            elif len(still_bad) < len(store.LABEL_FIELDS):
+                status, error = store.STATUS_PARSE_FAILED, None  # 部分字段已有合法值，等待下一轮追问
+            else:
+                status, error = row["status"], None if pd.isna(row["error"]) else row["error"]
+            store.record_repair(con, row["key"], labels, status, error)
+            pbar.set_postfix({"已修复": repaired})
+    finally:
+        con.close()
+    print(f"修复完成：{repaired}/{len(queue)} 行补全")
+    return repaired
+
+def label_with_retry(topic, comment, i, max_retries):
+    """标注一行，超时重试；在线程池中运行，返回 (字段字典, 状态, 错误信息, 模型)"""
+    retries = 0
+    while True:
+        try:
+            return label_comment(topic, comment)
+        except requests.exceptions.Timeout:
+            # 超时错误（重点处理，避免卡住）
+            retries += 1
+            if retries > max_retries:
+                tqdm.write(f"第{i+1}行超时重试耗尽，标记为失败")
+                return {}, store.STATUS_TIMEOUT, "超时失败", None
+            tqdm.write(f"第{i+1}行超时，重试 {retries}/{max_retries}")
+            time.sleep(3 * retries)  # 重试间隔递增
+        except Exception as e:
+            # 其他错误直接记录
+            tqdm.write(f"第{i+1}行错误：{str(e)}")
+            return {}, store.STATUS_ERROR, f"处理错误：{e}", None
+
+def process_excel(INPUT_EXCEL, OUTPUT_EXCEL, batch_size=20, max_retries=2, start=ROW_START, end=ROW_END,
+                  db_path=RESULT_DB, repair=REPAIR_AFTER_RUN):
+    """标注并导出；全部完成时返回 True，输入检查失败或运行中断时打印原因并返回 False"""
+    # 1. 检查输入：只读表头和行数，数据行在处理时流式读取（xlsx / csv / parquet，见附件二十三）
     try:
-        df= pd.read_excel(INPUT_EXCEL)
-        df_input = df.iloc[8000:9336]  #控制条数
         required_cols = ['笔记topic', '评论内容']
-        if not set(required_cols).issubset(df_input.columns):
+        if not set(required_cols).issubset(reader.read_header(INPUT_EXCEL)):
             print(f"错误：必须包含列：{required_cols}")
-            return
-        total_rows = len(df_input)
-        print(f"共 {total_rows} 条数据，开始处理...")
+            return False
+        n_rows = reader.count_rows(INPUT_EXCEL)
+        total_rows = None
+        if n_rows is not None:
+            start, end, _ = slice(start, end).indices(n_rows)  #控制条数（支持负数下标）
+            total_rows = max(end - start, 0)
+        start = start or 0
+        print(f"共 {total_rows if total_rows is not None else '未知'} 条数据，开始处理...")
     except Exception as e:
         print(f"读取输入失败：{e}")
-        return
+        return False
 
-    # 2. 初始化结果存储（内存暂存+续传支持）
-    result_data = []
-    processed_count = 0
-    try:
-        df_existing = pd.read_excel(OUTPUT_EXCEL)
-        result_data = df_existing.values.tolist()
-        processed_count = len(df_existing)
-        print(f"从第 {processed_count+1} 行继续处理")
-    except:
-        result_data.append(['笔记topic', '评论内容', 'sentiment', 'user_origin', 'valence', 'arousal', 'dominance'])
-
-    # 3. 核心处理循环（带超时和实时反馈）
+    # 2. 结果写入标注结果库，按评论ID（或内容哈希）续传：已成功的行不再请求
+    con = store.connect(db_path)
+    keys = []  # 本次范围内全部行的键，用于修复和导出
+
+    def input_rows():
+        """边读边按结果库标记已完成的行；由 ordered_map 在主线程中消费，SQLite 连接不跨线程"""
+        rows = reader.iter_rows(INPUT_EXCEL, ['评论ID', '笔记topic', '评论内容'], start, end)
+        for chunk in reader.iter_chunks(rows, RESUME_LOOKUP_ROWS):
+            items = []
+            for comment_id, topic, comment in chunk:
+                topic = str(topic) if pd.notna(topic) else ""
+                comment = str(comment) if pd.notna(comment) else ""
+                key = store.label_key(comment_id, topic, comment)
+                items.append((start + len(keys), key, comment_id, topic, comment))
+                keys.append(key)
+            done = store.done_keys(con, [item[1] for item in items])
+            for item in items:
+                yield item, item[1] in done
+
+    def label_row(row):
+        (i, key, comment_id, topic, comment), done = row
+        return row, None if done else label_with_retry(topic, comment, i, max_retries)
+
+    # 3. 核心处理循环（多线程，请求分散到密钥池的各个密钥上，结果按原顺序写入；带超时和实时反馈）
+    global metrics
+    status_path = STATUS_FILE or os.path.splitext(OUTPUT_EXCEL)[0] + (
+        ".status.prom" if STATUS_FORMAT == "prometheus" else ".status.json")
+    metrics = monitor.LabelingMetrics("sentiment", total_rows, status_path, STATUS_FORMAT)
+    metrics.register_prompt(LABEL_PROMPT)
+    metrics.register_prompt(REPAIR_PROMPT)
+    metrics.register_pool(get_pool())
+    pending = []
+    processed_count = skipped_count = 0
     try:
-        for i in tqdm(range(processed_count, total_rows), desc="处理进度", initial=processed_count):
-            row = df_input.iloc[i]
-            topic = str(row['笔记topic']) if pd.notna(row['笔记topic']) else ""
-            comment = str(row['评论内容']) if pd.notna(row['评论内容']) else ""
-            retries = 0
-            success = False
-
-            while retries <= max_retries and not success:
-                try:
-                    # 调用API（带超时）
-                    api_result = call_api(topic, comment, timeout=10)  # 10秒超时
-
-                    # 解析结果
-                    if "API错误" in api_result:
-                        # API调用失败，直接记录
-                        result_data.append([topic, comment, api_result, "", "", "", ""])
-                    else:
-                        sentiment, user_origin, valence, arousal, dominance = parse_response(api_result)
-                        result_data.append([topic, comment, sentiment, user_origin, valence, arousal, dominance])
-
-                    success = True
-                    processed_count += 1
-
-                    # 批量保存（减小文件操作频率）
-                    if processed_count % batch_size == 0 or i == total_rows - 1:
-                        pd.DataFrame(result_data).to_excel(OUTPUT_EXCEL, index=False, header=False)
-                        tqdm.write(f"已保存至 {OUTPUT_EXCEL}（共 {processed_count} 行）")
-
-                except requests.exceptions.Timeout:
-                    # 超时错误（重点处理，避免卡住）
-                    retries += 1
-                    if retries <= max_retries:
-                        tqdm.write(f"第{i+1}行超时，重试 {retries}/{max_retries}")
-                        time.sleep(3 * retries)  # 重试间隔递增
-                    else:
-                        tqdm.write(f"第{i+1}行超时重试耗尽，标记为失败")
-                        result_data.append([topic, comment, "超时失败", "", "", "", ""])
-                        processed_count += 1
-                        success = True
-                except Exception as e:
-                    # 其他错误直接记录
-                    tqdm.write(f"第{i+1}行错误：{str(e)}")
-                    result_data.append([topic, comment, f"处理错误：{e}", "", "", "", ""])
-                    processed_count += 1
-                    success = True
-
-        # 最终保存
-        pd.DataFrame(result_data).to_excel(OUTPUT_EXCEL, index=False, header=False)
-        print(f"\n全部完成！处理 {processed_count} 行，结果：{OUTPUT_EXCEL}")
+        results = credentials.ordered_map(label_row, input_rows(), get_pool().concurrency)
+        pbar = tqdm(results, desc="处理进度", total=total_rows)
+        for ((i, key, comment_id, topic, comment), done), result in pbar:
+            if done:
+                skipped_count += 1
+                metrics.record_skipped()
+                continue
+            fields, status, error, model = result
+            pending.append(store.make_record(key, topic, comment, fields, status, error,
+                                             comment_id=comment_id, model=model, prompt_version=PROMPT_VERSION))
+            processed_count += 1
+            metrics.record_row()
+            pbar.set_postfix(metrics.postfix())
+
+            # 批量写入（减小提交频率）
+            if len(pending) >= batch_size:
+                store.upsert(con, pending)
+                pending = []
+
+        # 最终写入；主循环结束后再修复失败行，不占用主循环的吞吐
+        store.upsert(con, pending)
+        if skipped_count:
+            print(f"\n结果库中已有 {skipped_count} 行成功结果，已跳过")
+        if repair:
+            repair_labels(db_path, keys=keys)
+        store.export_excel(con, keys, OUTPUT_EXCEL)
+        print(f"\n全部完成！处理 {processed_count} 行，结果库：{db_path}，导出：{OUTPUT_EXCEL}")
+        print(metrics.summary())
+        return True
 
     except Exception as e:
         # 致命错误时立即保存
-        pd.DataFrame(result_data).to_excel(OUTPUT_EXCEL, index=False, header=False)
-        print(f"\n程序中断：{e}，已保存 {processed_count} 行结果")
+        store.upsert(con, pending)
+        print(f"\n程序中断：{e}，已保存 {processed_count} 行结果至 {db_path}")
+        return False
+    finally:
+        con.close()
 
 if __name__ == "__main__":
     process_excel(
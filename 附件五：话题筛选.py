@@ -1,19 +1,33 @@
 from datetime import date
+import importlib
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 
 file_path = "D:\信管专业\社会计算\社会计算小组作业\评论update.xlsx"
-excel_file = pd.ExcelFile(file_path)
-df = excel_file.parse('有标记的')
+downsampling = importlib.import_module("附件十一：降采样绘图")
+tracing = importlib.import_module("附件十五：性能追踪")
+sampling = importlib.import_module("附件二十五：分层抽样")
+
+# 近似模式：从持久化的分层样本计算，秒级出图供探索；参与人数、生命周期由样本覆盖的层精确得到，
+# 声量按与精确模式相同的口径（评论ID非空的行数）由样本估计，评论ID齐全时即为各层总体行数之和；
+# 情感均值为总体估计并附置信区间。最终报告请关闭近似模式，用全量数据精确计算
+APPROX_MODE = False
+SAMPLE_SIZE = 20000  # 样本量，越小越快、置信区间越宽
+SAMPLE_PATH = "话题分层样本.parquet"
+STRATA = ['笔记topic', '日期', 'user_origin']
+VOLUME_FLAG = '_有评论ID'  # 近似模式下估计声量用的指示列
+
+POSITIVE_SENTIMENTS = ['快乐', '赞美', '感动']
+NEGATIVE_SENTIMENTS = ['悲伤', '厌恶', '恐惧', '愤怒']
+MIXED_SENTIMENTS = ['惊讶', '疑惑', '对比']
 
 # 情感映射
 def map_sentiment(row):
-    if row['sentiment'] in ['快乐', '赞美', '感动']:
+    if row['sentiment'] in POSITIVE_SENTIMENTS:
         valence = 5
-    elif row['sentiment'] in ['悲伤', '厌恶', '恐惧', '愤怒']:
+    elif row['sentiment'] in NEGATIVE_SENTIMENTS:
         valence = 0
-    elif row['sentiment'] in ['惊讶', '疑惑', '对比']:
+    elif row['sentiment'] in MIXED_SENTIMENTS:
         valence = 2
     else:
         valence = 2.5
@@ -27,17 +41,40 @@ def map_user_origin(origin):
     else:
         return '未知'
 
-df['Valence'] = df.apply(map_sentiment, axis=1)
-df['user_origin'] = df['user_origin'].apply(map_user_origin)
-df['评论时间'] = pd.to_datetime(df['评论时间'])
-df['日期'] = df['评论时间'].dt.date
-df['日期'] = pd.to_datetime(df['日期'], errors='coerce').dropna().dt.date
-
-
-topic_daily = df.groupby(['笔记topic', '日期']).agg(
-    声量=('评论ID', 'count'),
-    情感均值=('Valence', 'mean')
-).reset_index()
+@tracing.traced()
+def load_topic_data(file_path):
+    """读取有标记的评论，映射情感值和用户来源，并提取日期"""
+    excel_file = pd.ExcelFile(file_path)
+    df = excel_file.parse('有标记的')
+    df['Valence'] = df.apply(map_sentiment, axis=1)
+    df['user_origin'] = df['user_origin'].apply(map_user_origin)
+    df['评论时间'] = pd.to_datetime(df['评论时间'])
+    df['日期'] = df['评论时间'].dt.date
+    df['日期'] = pd.to_datetime(df['日期'], errors='coerce').dropna().dt.date
+    return df
+
+def load_topic_sample(file_path, sample_path=SAMPLE_PATH, size=SAMPLE_SIZE):
+    """读取（必要时抽取并保存）按 话题×日期×用户来源 分层的样本，源文件更新后自动重新抽样"""
+    return sampling.cached_sample(file_path, lambda: load_topic_data(file_path), STRATA, sample_path, size,
+                                  columns=['Valence', '评论ID'])
+
+def estimate_topic(df, domain):
+    """近似模式：按 domain 估计情感均值，声量 = 评论ID非空占比的估计 × 总体数，与精确模式的 count(评论ID) 同口径"""
+    df = df.assign(**{VOLUME_FLAG: df['评论ID'].notna().astype(float)})
+    estimate = sampling.estimate_means(df, STRATA, domain, ['Valence', VOLUME_FLAG])
+    estimate['声量'] = (estimate[VOLUME_FLAG] * estimate['总体数']).round().astype(int)
+    return estimate[domain + ['声量', 'Valence', 'Valence_下限', 'Valence_上限']]
+
+@tracing.traced()
+def compute_topic_daily(df):
+    if sampling.is_sample(df):
+        return estimate_topic(df, ['笔记topic', '日期']).rename(columns={
+            'Valence': '情感均值', 'Valence_下限': '情感均值_下限', 'Valence_上限': '情感均值_上限'})
+    topic_daily = df.groupby(['笔记topic', '日期']).agg(
+        声量=('评论ID', 'count'),
+        情感均值=('Valence', 'mean')
+    ).reset_index()
+    return topic_daily
 
 # 话题生命周期计算
 def safe_life_cycle(x):
@@ -48,109 +85,152 @@ def safe_life_cycle(x):
         return 0
 
 # 计算整体话题指标
-topic_overall = df.groupby('笔记topic').agg(
-    总声量=('评论ID', 'count'),
-    平均情感=('Valence', 'mean'),
-    参与人数=('user_origin', 'nunique'),
-    话题生命周期=('日期', safe_life_cycle)
-).reset_index()
-
-# 设置阈值线，可根据自己需求在此处更改阈值
-plt.figure(figsize=(12, 8))
-high_volume_threshold = topic_overall['总声量'].quantile(0.70)
-positive_threshold = 2.5
-plt.axvline(x=positive_threshold, color='gray', linestyle='--', alpha=0.7)
-plt.axhline(y=high_volume_threshold, color='gray', linestyle='--', alpha=0.7)
-
-# 按声量和情感倾向的阈值对话题分类
-conditions = [
-    (topic_overall['总声量'] >= high_volume_threshold) & (topic_overall['平均情感'] >= positive_threshold),
-    (topic_overall['总声量'] < high_volume_threshold) & (topic_overall['平均情感'] >= positive_threshold),
-    (topic_overall['总声量'] >= high_volume_threshold) & (topic_overall['平均情感'] < positive_threshold),
-    (topic_overall['总声量'] < high_volume_threshold) & (topic_overall['平均情感'] < positive_threshold)
-]
-choices = ['优质话题(推荐)', '高潜力话题(关注)', '敏感话题(减少讨论)', '小众话题(降低关注)']
-topic_overall['分类'] = np.select(conditions, choices, default='未分类')
-
-colors = {'优质话题(推荐)': 'green', '高潜力话题(关注)': 'blue',
-          '敏感话题(减少讨论)': 'red', '小众话题(降低关注)': 'gray'}
-for category, group in topic_overall.groupby('分类'):
-    plt.scatter(
-        group['平均情感'],
-        group['总声量'],
-        s=group['参与人数'] * 10,
-        alpha=0.6,
-        c=colors[category],
-        label=category
-    )
-
-for i, row in topic_overall.iterrows():
-    plt.annotate(row['笔记topic'], (row['平均情感'], row['总声量']),
-                 xytext=(5, 5), textcoords='offset points')
-
-plt.rcParams['figure.dpi'] = 100
-plt.rcParams['font.sans-serif'] = ['SimHei']
-plt.rcParams['axes.unicode_minus'] = False
-plt.xlabel('平均情感倾向')
-plt.ylabel('话题声量')
-plt.title('话题声量 - 情感分布图')
-plt.legend()
-plt.grid(True, alpha=0.3)
-plt.tight_layout()
-plt.show()
-
-recommendations = topic_overall.sort_values(by=['总声量', '平均情感'],ascending=[False, False])
-print("话题推荐策略：")
-print(recommendations[['笔记topic', '分类', '总声量', '平均情感']])
-
-try:
-    quadrants = {
-        '优质话题(推荐)': recommendations[recommendations['分类'] == '优质话题(推荐)'].iloc[0],
-        '高潜力话题(关注)': recommendations[recommendations['分类'] == '高潜力话题(关注)'].iloc[0],
-        '敏感话题(减少讨论)': recommendations[recommendations['分类'] == '敏感话题(减少讨论)'].iloc[0],
-        '小众话题(降低关注)': recommendations[recommendations['分类'] == '小众话题(降低关注)'].iloc[0]
-    }
-except IndexError:
-    print("部分分类中没有话题，无法输出各象限代表话题")
-else:
-    print("\n各象限代表话题：")
-    for quad, data in quadrants.items():
-        print(f"{quad}: {data['笔记topic']} (声量={data['总声量']}, 情感={data['平均情感']:.2f})")
+@tracing.traced()
+def compute_topic_overall(df):
+    if sampling.is_sample(df):
+        # 每层至少有一行样本，按层去重即可精确得到参与人数和生命周期
+        strata = df.drop_duplicates(STRATA).groupby('笔记topic').agg(
+            参与人数=('user_origin', 'nunique'),
+            话题生命周期=('日期', safe_life_cycle)
+        )
+        estimate = estimate_topic(df, ['笔记topic']).rename(columns={
+            '声量': '总声量', 'Valence': '平均情感', 'Valence_下限': '平均情感_下限', 'Valence_上限': '平均情感_上限'})
+        return estimate.merge(strata.reset_index(), on='笔记topic')
+    topic_overall = df.groupby('笔记topic').agg(
+        总声量=('评论ID', 'count'),
+        平均情感=('Valence', 'mean'),
+        参与人数=('user_origin', 'nunique'),
+        话题生命周期=('日期', safe_life_cycle)
+    ).reset_index()
+    return topic_overall
+
+# 按声量和情感倾向的阈值对话题分类，可根据自己需求在此处更改阈值
+def classify_topics(topic_overall, volume_quantile=0.70, positive_threshold=2.5):
+    topic_overall = topic_overall.copy()
+    high_volume_threshold = topic_overall['总声量'].quantile(volume_quantile)
+    conditions = [
+        (topic_overall['总声量'] >= high_volume_threshold) & (topic_overall['平均情感'] >= positive_threshold),
+        (topic_overall['总声量'] < high_volume_threshold) & (topic_overall['平均情感'] >= positive_threshold),
+        (topic_overall['总声量'] >= high_volume_threshold) & (topic_overall['平均情感'] < positive_threshold),
+        (topic_overall['总声量'] < high_volume_threshold) & (topic_overall['平均情感'] < positive_threshold)
+    ]
+    choices = ['优质话题(推荐)', '高潜力话题(关注)', '敏感话题(减少讨论)', '小众话题(降低关注)']
+    topic_overall['分类'] = np.select(conditions, choices, default='未分类')
+    return topic_overall, high_volume_threshold
+
+@tracing.traced()
+def plot_topic_quadrant(topic_overall, high_volume_threshold, positive_threshold=2.5):
+    plt = downsampling.pyplot()
+    # 设置阈值线
+    plt.figure(figsize=(12, 8))
+    plt.axvline(x=positive_threshold, color='gray', linestyle='--', alpha=0.7)
+    plt.axhline(y=high_volume_threshold, color='gray', linestyle='--', alpha=0.7)
+
+    colors = {'优质话题(推荐)': 'green', '高潜力话题(关注)': 'blue',
+              '敏感话题(减少讨论)': 'red', '小众话题(降低关注)': 'gray'}
+    for category, group in topic_overall.groupby('分类'):
+        plt.scatter(
+            group['平均情感'],
+            group['总声量'],
+            s=group['参与人数'] * 10,
+            alpha=0.6,
+            c=colors[category],
+            label=category
+        )
+    approx = '平均情感_下限' in topic_overall.columns
+    if approx:
+        plt.errorbar(topic_overall['平均情感'], topic_overall['总声量'],
+                     xerr=[topic_overall['平均情感'] - topic_overall['平均情感_下限'],
+                           topic_overall['平均情感_上限'] - topic_overall['平均情感']],
+                     fmt='none', ecolor='gray', alpha=0.6, capsize=3)
+
+    for i, row in topic_overall.iterrows():
+        plt.annotate(row['笔记topic'], (row['平均情感'], row['总声量']),
+                     xytext=(5, 5), textcoords='offset points')
+
+    plt.rcParams['figure.dpi'] = 100
+    plt.rcParams['font.sans-serif'] = ['SimHei']
+    plt.rcParams['axes.unicode_minus'] = False
+    plt.xlabel('平均情感倾向')
+    plt.ylabel('话题声量')
+    plt.title('话题声量 - 情感分布图' + (f'（近似：分层样本，{sampling.CI_LEVEL:.0%}置信区间）' if approx else ''))
+    plt.legend()
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.show()
+
+def print_recommendations(topic_overall):
+    recommendations = topic_overall.sort_values(by=['总声量', '平均情感'],ascending=[False, False])
+    print("话题推荐策略：")
+    columns = ['笔记topic', '分类', '总声量', '平均情感']
+    if '平均情感_下限' in recommendations.columns:
+        columns += ['平均情感_下限', '平均情感_上限']
+    print(recommendations[columns])
+
+    try:
+        quadrants = {
+            '优质话题(推荐)': recommendations[recommendations['分类'] == '优质话题(推荐)'].iloc[0],
+            '高潜力话题(关注)': recommendations[recommendations['分类'] == '高潜力话题(关注)'].iloc[0],
+            '敏感话题(减少讨论)': recommendations[recommendations['分类'] == '敏感话题(减少讨论)'].iloc[0],
+            '小众话题(降低关注)': recommendations[recommendations['分类'] == '小众话题(降低关注)'].iloc[0]
+        }
+    except IndexError:
+        print("部分分类中没有话题，无法输出各象限代表话题")
+    else:
+        print("\n各象限代表话题：")
+        for quad, data in quadrants.items():
+            print(f"{quad}: {data['笔记topic']} (声量={data['总声量']}, 情感={data['平均情感']:.2f})")
+    return recommendations
 
 #------------------------------------------------------------------------------------------此线下方为对话题日声量和日情感的分析
-def volume_sentiment_analyse(topic):
+@tracing.traced()
+def volume_sentiment_analyse(topic, topic_daily):
+    plt = downsampling.pyplot()
     sample_topic = topic
     topic_data = topic_daily[topic_daily['笔记topic'] == sample_topic]
     fig, ax1 = plt.subplots(figsize=(12, 6))
 
-    # 声量图
-    ax1.bar(topic_data['日期'], topic_data['声量'], color='skyblue', alpha=0.7)
+    # 声量图（数据点多于图宽时降采样，保留峰值）
+    downsampling.bar_series(ax1, topic_data['日期'], topic_data['声量'], color='skyblue', alpha=0.7)
     ax1.set_xlabel('日期')
     ax1.set_ylabel('日声量', color='skyblue')
     ax1.tick_params(axis='y', labelcolor='skyblue')
     #折线图
     ax2 = ax1.twinx()
-    ax2.plot(topic_data['日期'], topic_data['情感均值'], color='coral', marker='o')
+    downsampling.plot_series(ax2, topic_data['日期'], topic_data['情感均值'], color='coral')
+    approx = '情感均值_下限' in topic_data.columns
+    if approx:
+        ax2.fill_between(topic_data['日期'], topic_data['情感均值_下限'], topic_data['情感均值_上限'],
+                         color='coral', alpha=0.2, label=f'{sampling.CI_LEVEL:.0%}置信区间')
     ax2.set_ylabel('情感倾向', color='coral')
     ax2.tick_params(axis='y', labelcolor='coral')
     ax2.axhline(y=0, color='gray', linestyle='--')
     ax2.axhline(y=2.5, color='r', linestyle='--', label='情感阈值线')
 
-    for x, y in zip(topic_data['日期'], topic_data['情感均值']):
-        color = 'b' if y < 2.5 else 'coral'
-        ax2.plot(x, y, marker='o', color=color)
+    # 低于阈值的点标为蓝色，一次性绘制
+    downsampling.scatter_by_threshold(ax2, topic_data['日期'], topic_data['情感均值'], 2.5, 'b', 'coral', marker='o', zorder=3)
 
-    plt.title(f'"{sample_topic}" 话题演化趋势')
+    plt.title(f'"{sample_topic}" 话题演化趋势' + ('（近似）' if approx else ''))
     plt.grid(True, alpha=0.3)
     plt.tight_layout()
     plt.show()
 
-# volume_sentiment_analyse("Music")
-# volume_sentiment_analyse("cattax")
-# volume_sentiment_analyse("remain")
-# volume_sentiment_analyse("friend")
-# volume_sentiment_analyse("daily")
-# volume_sentiment_analyse("物价对比")
-# volume_sentiment_analyse("取名")
-# volume_sentiment_analyse("learn")
-# volume_sentiment_analyse("communicate")
\ No newline at end of file
+def main(approx=APPROX_MODE):
+    df = load_topic_sample(file_path) if approx else load_topic_data(file_path)
+    topic_daily = compute_topic_daily(df)
+    topic_overall, high_volume_threshold = classify_topics(compute_topic_overall(df))
+    plot_topic_quadrant(topic_overall, high_volume_threshold)
+    print_recommendations(topic_overall)
+
+    # volume_sentiment_analyse("Music", topic_daily)
+    # volume_sentiment_analyse("cattax", topic_daily)
+    # volume_sentiment_analyse("remain", topic_daily)
+    # volume_sentiment_analyse("friend", topic_daily)
+    # volume_sentiment_analyse("daily", topic_daily)
+    # volume_sentiment_analyse("物价对比", topic_daily)
+    # volume_sentiment_analyse("取名", topic_daily)
+    # volume_sentiment_analyse("learn", topic_daily)
+    # volume_sentiment_analyse("communicate", topic_daily)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,37 +1,62 @@
+import os
+import re
+import json
+import hashlib
+import functools
+import importlib
 import pandas as pd
-import jieba
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 
-plt.rcParams['font.sans-serif'] = ['SimHei']
-plt.rcParams['axes.unicode_minus'] = False
+# jieba（加载词典需数秒）、wordcloud 和 matplotlib 都在用到时才导入
+PLOT_RC = {'font.sans-serif': ['SimHei'], 'axes.unicode_minus': False}
+plotting = importlib.import_module("附件十一：降采样绘图")
+tracing = importlib.import_module("附件十五：性能追踪")
 file_path = "D:\信管专业\社会计算\社会计算小组作业\评论update.xlsx"
-excel_file = pd.ExcelFile(file_path)
-df = excel_file.parse('有标记的')
 
-def word_cloud(Topic):
-    music_df = df[df['笔记topic'] == Topic]
-    text = ' '.join(music_df['评论内容'].astype(str))
+# 批量词云配置
+CLOUD_DIR = "wordclouds"  # 词云图片输出目录
+CLOUD_PARAMS = {
+    "width": 800,
+    "height": 400,
+    "background_color": 'white',
+    "font_path": 'simhei.ttf',
+    "max_words": 100
+}
+N_WORKERS = None  # 进程数，None 表示使用全部CPU核
+
+stopwords = set(["啊啊啊","这个","哈哈哈哈","哈哈","哈哈哈","哈","是不是","就是",'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '个', '上', '也', '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看', '好', '自己', '这', '那',
+                 'really','also','hello','very','or','so','but','and', 'the', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'can', 'this', 'that', 'it', 'its', 'he', 'she', 'they', 'them', 'their', 'we', 'our', 'you', 'your', 'i', 'me', 'my', 'mine', 'to', 'of', 'in', 'on', 'at', 'for', 'with', 'about', 'as', 'into', 'like', 'through', 'after', 'over', 'between', 'out', 'against', 'during', 'without', 'before', 'under', 'around', 'among'])
+
+@tracing.traced()
+def load_comments(file_path):
+    excel_file = pd.ExcelFile(file_path)
+    return excel_file.parse('有标记的')
+
+@tracing.traced()
+def word_frequencies(texts):
+    """分词、去停用词，返回词频排名前10%的词频字典"""
+    import jieba
+    text = ' '.join(texts.astype(str))
     text = text.lower()
     words = jieba.lcut(text)
-    stopwords = set(["啊啊啊","这个","哈哈哈哈","哈哈","哈哈哈","哈","是不是","就是",'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '个', '上', '也', '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看', '好', '自己', '这', '那',
-                     'really','also','hello','very','or','so','but','and', 'the', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'can', 'this', 'that', 'it', 'its', 'he', 'she', 'they', 'them', 'their', 'we', 'our', 'you', 'your', 'i', 'me', 'my', 'mine', 'to', 'of', 'in', 'on', 'at', 'for', 'with', 'about', 'as', 'into', 'like', 'through', 'after', 'over', 'between', 'out', 'against', 'during', 'without', 'before', 'under', 'around', 'among'])
     filtered_words = [word for word in words if word not in stopwords and len(word) > 1]
 
-    from collections import Counter
     word_counts = Counter(filtered_words)
     total_words = len(word_counts)
     top_n = max(1, total_words // 10) #前百分比参数
     top_words = word_counts.most_common(top_n)
-    word_freq = dict(top_words)
+    return dict(top_words)
 
-    wc = WordCloud(
-        width=800,
-        height=400,
-        background_color='white',
-        font_path='simhei.ttf',
-        max_words=100
-    ).generate_from_frequencies(word_freq)
+def word_cloud(Topic, df):
+    music_df = df[df['笔记topic'] == Topic]
+    plot_word_cloud(Topic, word_frequencies(music_df['评论内容']))
+
+def plot_word_cloud(Topic, word_freq):
+    """由词频字典绘制词云（看板服务直接使用预先算好的词频）"""
+    from wordcloud import WordCloud
+    plt = plotting.pyplot(PLOT_RC)
+    wc = WordCloud(**CLOUD_PARAMS).generate_from_frequencies(word_freq)
 
     plt.figure(figsize=(10, 5))
     plt.imshow(wc, interpolation='bilinear')
@@ -39,15 +64,99 @@ def word_cloud(Topic):
     plt.title(f"\"{Topic}\"话题词云 (词频排名前10%)")
     plt.show()
 
-print('数据基本信息：')
-df.info()
-print(df['笔记topic'].unique())
-# word_cloud("Music")
-# word_cloud("cattax")
-word_cloud("remain")
-# word_cloud("friend")
-# word_cloud("daily")
-# word_cloud("物价对比")
-# word_cloud("取名")
-# word_cloud("learn")
-# word_cloud("communicate")
\ No newline at end of file
+#------------------------------------------------------------------------------------------此线下方为批量生成词云
+@tracing.traced()
+def build_frequency_tables(df, by=('笔记topic',)):
+    """按话题（或话题×用户来源）分组计算词频，返回 {名称: 词频字典}"""
+    tables = {}
+    for key, group in df.groupby(list(by)):
+        key = key if isinstance(key, tuple) else (key,)
+        word_freq = word_frequencies(group['评论内容'])
+        if word_freq:
+            tables["_".join(str(k) for k in key)] = word_freq
+    return tables
+
+def cloud_key(word_freq, params):
+    """缓存键：词频字典与渲染参数的哈希"""
+    payload = json.dumps([sorted(word_freq.items()), sorted(params.items())], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+_worker_cloud = None
+
+class _CachedImageFont:
+    """代替 wordcloud 模块里的 PIL.ImageFont：truetype 按 (字体路径, 字号) 缓存，其余属性原样转发"""
+
+    def __init__(self, module):
+        self._module = module
+        self.truetype = functools.lru_cache(maxsize=None)(module.truetype)
+
+    def __getattr__(self, name):
+        return getattr(self._module, name)
+
+def _init_worker(params):
+    """
+    每个子进程只创建一次 WordCloud；WordCloud 布局时每试一个字号都会重新打开字体文件，
+    这里让子进程内的字体对象按字号缓存，后续词云直接复用
+    """
+    global _worker_cloud
+    from PIL import ImageFont
+    import wordcloud.wordcloud as wordcloud_module
+    wordcloud_module.ImageFont = _CachedImageFont(ImageFont)
+    wordcloud_module.ImageFont.truetype(params['font_path'], 12)  # 字体不可用时尽早报错
+    _worker_cloud = wordcloud_module.WordCloud(**params)
+
+def _render_cloud(task):
+    word_freq, path = task
+    _worker_cloud.generate_from_frequencies(word_freq).to_file(path)
+    return path
+
+@tracing.traced()
+def batch_word_clouds(df, by=('笔记topic',), out_dir=CLOUD_DIR, params=CLOUD_PARAMS, n_workers=N_WORKERS):
+    """
+    批量生成词云：词频与参数未变化的词云直接复用已有图片
+    返回 {名称: 图片文件名}
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    tables = build_frequency_tables(df, by)
+    manifest, tasks = {}, []
+    for name, word_freq in tables.items():
+        key = cloud_key(word_freq, params)
+        safe_name = re.sub(r'[\\/:*?"<>|]', "_", name)
+        file_name = f"{safe_name}_{key[:12]}.png"
+        manifest[name] = {"key": key, "files": [file_name]}
+        path = os.path.join(out_dir, file_name)
+        if not os.path.exists(path):
+            tasks.append((word_freq, path))
+    print(f"共 {len(tables)} 张词云，{len(tables) - len(tasks)} 张未变化已跳过，{len(tasks)} 张需要绘制")
+
+    if tasks:
+        from PIL import ImageFont
+        ImageFont.truetype(params['font_path'], 12)  # 字体不可用时在主进程直接报错
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(params,)) as executor:
+            list(executor.map(_render_cloud, tasks))
+
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    # 复用报告渲染的索引页
+    importlib.import_module("附件十：报告渲染").write_index(out_dir, manifest, list(manifest))
+    return {name: item["files"][0] for name, item in manifest.items()}
+
+def main():
+    df = load_comments(file_path)
+    print('数据基本信息：')
+    df.info()
+    print(df['笔记topic'].unique())
+    # word_cloud("Music", df)
+    # word_cloud("cattax", df)
+    word_cloud("remain", df)
+    # word_cloud("friend", df)
+    # word_cloud("daily", df)
+    # word_cloud("物价对比", df)
+    # word_cloud("取名", df)
+    # word_cloud("learn", df)
+    # word_cloud("communicate", df)
+    # batch_word_clouds(df)  # 全部话题
+    # batch_word_clouds(df, by=('笔记topic', 'user_origin'))  # 话题 × 用户来源
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,116 @@
+import importlib
+import numpy as np
+import pandas as pd
+
+# 每个像素保留的点数上限，绘制点数由图宽决定而不是数据行数
+POINTS_PER_PIXEL = 1
+
+
+def pyplot(rc=None):
+    """
+    延迟导入 matplotlib.pyplot（只在真正绘图时导入，只算表的命令不付出导入开销），
+    rc 为要设置的 rcParams；开启性能追踪时同时记录绘图阶段
+    """
+    import matplotlib.pyplot as plt
+    if rc:
+        plt.rcParams.update(rc)
+    importlib.import_module("附件十五：性能追踪").instrument_matplotlib()
+    return plt
+
+
+def _to_numeric(x):
+    """日期转为 matplotlib 数值，数值原样返回"""
+    import matplotlib.dates as mdates
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.number):
+        return x.astype(float)
+    return mdates.date2num(pd.to_datetime(x))
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets 降采样，返回保留点的下标"""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    idx = np.empty(n_out, dtype=int)
+    idx[0], idx[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)  # 中间 n_out-2 个桶的边界
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i == n_out - 3:
+            avg_x, avg_y = x[-1], y[-1]
+        else:
+            avg_x, avg_y = x[end:edges[i + 2]].mean(), y[end:edges[i + 2]].mean()
+        # 与上一个选中点、下一个桶均值构成的三角形面积最大的点
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        idx[i + 1] = a
+    return idx
+
+
+def minmax_downsample(y, n_buckets):
+    """每个桶只保留最小值和最大值，返回保留点的下标（按原顺序）"""
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    edges = np.linspace(0, n, n_buckets + 1).astype(int)
+    bucket_ids = np.repeat(np.arange(n_buckets), np.diff(edges))
+    order = np.lexsort((y, bucket_ids))  # 桶内按 y 排序
+    first = order[edges[:-1]]
+    last = order[edges[1:] - 1]
+    return np.unique(np.concatenate([first, last]))
+
+
+def target_points(ax):
+    """根据坐标轴的像素宽度确定绘制点数"""
+    return max(3, int(ax.bbox.width * POINTS_PER_PIXEL))
+
+
+def downsample(x, y, ax, method="lttb"):
+    """去掉缺失值后按坐标轴宽度降采样，返回保留点的下标"""
+    x_num, y = _to_numeric(x), np.asarray(y, dtype=float)
+    valid = np.where(~np.isnan(y) & ~np.isnan(x_num))[0]
+    n_out = target_points(ax)
+    if method == "minmax":
+        keep = minmax_downsample(y[valid], n_out // 2)
+    else:
+        keep = lttb(x_num[valid], y[valid], n_out)
+    return valid[keep]
+
+
+def plot_series(ax, x, y, method="lttb", **kwargs):
+    """降采样后绘制折线"""
+    x, y = np.asarray(x), np.asarray(y)
+    keep = downsample(x, y, ax, method)
+    return ax.plot(x[keep], y[keep], **kwargs)
+
+
+def bar_series(ax, x, y, **kwargs):
+    """降采样后绘制柱状图（保留每个桶的极值，避免丢失峰值）"""
+    x, y = np.asarray(x), np.asarray(y)
+    keep = downsample(x, y, ax, method="minmax")
+    return ax.bar(x[keep], y[keep], **kwargs)
+
+
+def scatter_by_threshold(ax, x, y, threshold, below_color, above_color, **kwargs):
+    """一次 scatter 调用绘制所有标记点，低于阈值和不低于阈值的点使用不同颜色"""
+    x, y = np.asarray(x), np.asarray(y)
+    keep = downsample(x, y, ax)
+    colors = np.where(y[keep] < threshold, below_color, above_color)
+    return ax.scatter(x[keep], y[keep], c=colors, **kwargs)
+
+
+def annotate_extrema(ax, x, y, top_k=5, fmt="{:g}", **kwargs):
+    """只标注最大的 top_k 个局部峰值和全局最小值"""
+    x, y = np.asarray(x), np.asarray(y, dtype=float)
+    if len(y) == 0:
+        return []
+    is_peak = np.r_[True, y[1:] >= y[:-1]] & np.r_[y[:-1] >= y[1:], True]  # 不低于两侧相邻点
+    peaks = np.where(is_peak & ~np.isnan(y))[0]
+    chosen = peaks[np.argsort(-y[peaks])[:top_k]]
+    chosen = np.unique(np.r_[chosen, np.nanargmin(y)])
+    kwargs.setdefault("textcoords", "offset points")
+    kwargs.setdefault("xytext", (0, 5))
+    kwargs.setdefault("ha", "center")
+    return [ax.annotate(fmt.format(y[i]), (x[i], y[i]), **kwargs) for i in chosen]
@@ -0,0 +1,352 @@
+import os
+import glob
+import argparse
+import importlib
+
+import duckdb
+import pandas as pd
+
+# 数据源：数据集 -> [(glob 模式, sheet)]，Parquet 文件直接查询，Excel 文件先转换为 Parquet 缓存
+SOURCES = {
+    "posts": [("xhs_data/*帖子*.xlsx", 0), ("xhs_data/*笔记*.xlsx", 0), ("xhs_data/*帖子*.parquet", None)],
+    "comments": [("xhs_data/*评论*.xlsx", 0), ("xhs_data/*评论*.parquet", None)],
+    "labeled": [("results/result*.xlsx", 0), ("评论update.xlsx", "有标记的"), ("results/*.parquet", None)],
+}
+CACHE_DIR = "parquet_cache"  # Excel 转换后的 Parquet 缓存目录（源文件更新后自动重新转换）
+MEMORY_LIMIT = "2GB"  # DuckDB 内存上限，超出部分溢写到缓存目录下的临时文件
+BATCH_ROWS = 100_000  # 流式读取结果时每批的行数
+PREVIEW_ROWS = 50  # 命令行默认显示的行数
+
+# 预定义视图，说明会在 --list 时显示
+VIEW_DESCRIPTIONS = {
+    "posts": "帖子（计数列已清洗，含 用户类型）",
+    "comments": "评论（计数列已清洗，含 评论用户类型）",
+    "labeled": "LLM 标注结果（含 映射情感值、日期）",
+    "topic_daily": "同附件五 compute_topic_daily",
+    "topic_overall": "同附件五 compute_topic_overall",
+    "volume_weekly": "话题 × 周 × 用户来源 的声量",
+    "vad_by_sentiment": "各情感类别的 VAD 均值",
+    "help_comments": "带 互助类型 的互助评论明细",
+    "help_stats": "同附件三 analyze_help_content 的 help_stats",
+    "bilingual_result": "同附件三 analyze_bilingual_advantage 的 result",
+}
+
+
+def _sql_str(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _sql_list(values):
+    return "[" + ", ".join(_sql_str(v) for v in values) + "]"
+
+
+def _any_of(column, words):
+    """column 中包含任一关键词（纯子串匹配，与 pandas 的 in 判断一致）"""
+    return "(" + " OR ".join(f"contains({column}, {_sql_str(w)})" for w in words) + ")"
+
+
+def resolve_sources(patterns, root="."):
+    """展开 glob，返回 [(路径, sheet)]，按修改时间排序（与附件三 load_data 一致，后加载的视为最新）"""
+    found = {}
+    for pattern, sheet in patterns:
+        for path in glob.glob(os.path.join(root, pattern)):
+            found.setdefault(os.path.abspath(path), sheet)
+    return sorted(found.items(), key=lambda item: os.path.getmtime(item[0]))
+
+
+def cache_path(path, sheet, cache_dir, dataset):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if isinstance(sheet, str):
+        stem = f"{stem}-{sheet}"
+    return os.path.join(cache_dir, dataset, f"{stem}.parquet")
+
+
+def to_parquet_cache(path, sheet, target):
+    """Excel -> Parquet，缓存比源文件新时跳过；混合类型的 object 列统一存为字符串"""
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+        return target
+    df = pd.read_excel(path, sheet_name=sheet)
+    df.columns = df.columns.astype(str)
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].astype("string")
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = target + ".tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, target)
+    print(f"已缓存 {os.path.basename(path)} -> {target}（{len(df)} 行）")
+    return target
+
+
+def build_cache(sources=SOURCES, root=".", cache_dir=CACHE_DIR):
+    """返回 数据集 -> Parquet 文件列表（按加载顺序）"""
+    files = {}
+    for dataset, patterns in sources.items():
+        files[dataset] = []
+        for path, sheet in resolve_sources(patterns, root):
+            if not path.endswith(".parquet"):
+                path = os.path.abspath(to_parquet_cache(path, sheet, cache_path(path, sheet, cache_dir, dataset)))
+            files[dataset].append(path)
+    return files
+
+
+def _columns(con, relation):
+    return [row[0] for row in con.execute(f"DESCRIBE {relation}").fetchall()]
+
+
+def _register_macros(con):
+    # 与附件三 clean_column 一致："1.2万"、"3k"、"12赞" -> 整数，无法解析记为0
+    con.execute(r"""
+        CREATE OR REPLACE MACRO parse_count(x) AS (
+            CASE
+                WHEN x IS NULL OR lower(trim(CAST(x AS VARCHAR))) IN ('', 'nan', 'null', 'none') THEN 0
+                WHEN contains(CAST(x AS VARCHAR), '万') THEN coalesce(CAST(trunc(
+                    TRY_CAST(regexp_extract(CAST(x AS VARCHAR), '[\d.]+') AS DOUBLE) * 10000) AS BIGINT), 0)
+                WHEN contains(lower(CAST(x AS VARCHAR)), 'k') THEN coalesce(CAST(trunc(
+                    TRY_CAST(regexp_extract(CAST(x AS VARCHAR), '[\d.]+') AS DOUBLE) * 1000) AS BIGINT), 0)
+                ELSE coalesce(TRY_CAST(regexp_extract(CAST(x AS VARCHAR), '\d+') AS BIGINT), 0)
+            END)
+    """)
+    # 爬取数据中混有 '%Y/%m/%d'、'%m/%d/%Y %H:%M' 等格式，无法解析记为 NULL（同 errors="coerce"）
+    con.execute("""
+        CREATE OR REPLACE MACRO parse_time(x) AS coalesce(
+            TRY_CAST(x AS TIMESTAMP),
+            try_strptime(CAST(x AS VARCHAR), ['%Y/%m/%d', '%Y/%m/%d %H:%M', '%Y/%m/%d %H:%M:%S',
+                                              '%m/%d/%Y %H:%M', '%m/%d/%Y']))
+    """)
+
+
+def _create_raw_view(con, dataset, files, dedup):
+    """合并同一数据集的所有文件；dedup 时按附件九的ID列精确去重，保留最后加载的一条"""
+    source = f"read_parquet({_sql_list(files)}, union_by_name = true, filename = true)"
+    columns = _columns(con, f"SELECT * FROM {source}")
+    sql = f"SELECT * EXCLUDE (filename) FROM {source}"
+    if dedup:
+        dedup_module = importlib.import_module("附件九：去重")
+        id_col = next((c for c in dedup_module.ID_COLUMNS if c in columns), None)
+        if id_col is not None:
+            sql += (f' QUALIFY "{id_col}" IS NULL OR row_number() OVER ('
+                    f'PARTITION BY "{id_col}" ORDER BY list_position({_sql_list(files)}, filename) DESC) = 1')
+    con.execute(f"CREATE OR REPLACE VIEW {dataset}_raw AS {sql}")
+
+
+def _create_views(con, datasets):
+    analysis = importlib.import_module("附件三：dataAnalysis")
+    topic_filter = importlib.import_module("附件五：话题筛选")
+
+    if "posts" in datasets:
+        cols = _columns(con, "posts_raw")
+        replace = [f"parse_count({c}) AS {c}" for c in ["点赞数", "评论数", "收藏数"] if c in cols]
+        if "发布时间" in cols:
+            replace.append("parse_time(发布时间) AS 发布时间")
+        ip_col = next((c for c in ["IP地址", "IP属地"] if c in cols), None)
+        user_type = "'未知'" if ip_col is None else f"""CASE
+            WHEN {_any_of(ip_col, analysis.FOREIGN_LOCATIONS)} THEN '外国用户'
+            WHEN {_any_of(ip_col, analysis.CHINESE_LOCATIONS)} THEN '中国用户'
+            ELSE '未知' END"""
+        replace_sql = f" REPLACE ({', '.join(replace)})" if replace else ""
+        con.execute(f"CREATE OR REPLACE VIEW posts AS SELECT *{replace_sql}, {user_type} AS 用户类型 FROM posts_raw")
+
+        cols = _columns(con, "posts")
+        if all(c in cols for c in ["笔记详情", "评论数", "点赞数"]):
+            views = "点赞数 + 评论数" + (" + 收藏数" if "收藏数" in cols else "")
+            con.execute(f"""
+                CREATE OR REPLACE VIEW bilingual_result AS
+                WITH typed AS (
+                    SELECT *,
+                        CASE
+                            WHEN regexp_matches(笔记详情, '[一-鿿]') AND regexp_matches(笔记详情, '[A-Za-z]') THEN '双语混合'
+                            WHEN regexp_matches(笔记详情, '[一-鿿]') THEN '纯中文'
+                            WHEN regexp_matches(笔记详情, '[A-Za-z]') THEN '纯英文'
+                            ELSE '未知'
+                        END AS 语言类型,
+                        {views} AS 浏览量估算
+                    FROM posts
+                )
+                SELECT 用户类型, 语言类型,
+                    round(avg(评论数 / 浏览量估算), 4) AS 平均评论互动率,
+                    count(*) AS 样本数,
+                    round(avg(点赞数 / 浏览量估算), 4) AS 平均点赞互动率
+                FROM typed
+                WHERE 语言类型 <> '未知' AND 浏览量估算 > 0
+                GROUP BY 用户类型, 语言类型
+                ORDER BY 用户类型, 语言类型
+            """)
+
+    if "comments" in datasets:
+        cols = _columns(con, "comments_raw")
+        replace = ["parse_count(点赞数) AS 点赞数"] if "点赞数" in cols else []
+        if "评论时间" in cols:
+            replace.append("parse_time(评论时间) AS 评论时间")
+        ip_col = next((c for c in ["IP地址", "IP属地"] if c in cols), None)
+        extra = "" if ip_col is None else (
+            f", CASE WHEN regexp_matches({ip_col}, '[A-Za-z]') THEN '外国用户' ELSE '中国用户' END AS 评论用户类型")
+        replace_sql = f" REPLACE ({', '.join(replace)})" if replace else ""
+        con.execute(f"CREATE OR REPLACE VIEW comments AS SELECT *{replace_sql}{extra} FROM comments_raw")
+
+        if all(c in cols for c in ["评论内容", "点赞数"]):
+            tags = ", ".join(f"CASE WHEN {_any_of('lower(评论内容)', words)} THEN {_sql_str(category)} END"
+                             for category, words in analysis.HELP_CATEGORIES.items())
+            con.execute(f"""
+                CREATE OR REPLACE VIEW help_comments AS
+                SELECT * FROM (SELECT *, concat_ws(', ', {tags}) AS 互助类型 FROM comments
+                               WHERE 评论内容 IS NOT NULL AND 点赞数 IS NOT NULL)
+                WHERE 互助类型 <> ''
+            """)
+            con.execute("""
+                CREATE OR REPLACE VIEW help_stats AS
+                SELECT 互助类型,
+                    count(评论内容) AS 数量,
+                    round(avg(点赞数), 4) AS 平均点赞数,
+                    round(count(评论内容) / sum(count(评论内容)) OVER (), 4) AS 占比
+                FROM help_comments
+                GROUP BY 互助类型
+                ORDER BY 数量 DESC
+            """)
+
+    if "labeled" in datasets:
+        cols = _columns(con, "labeled_raw")
+        # 附件四的 result*.xlsx 用 topic 列，评论update.xlsx 用 笔记topic 列
+        topic_cols = [c for c in ["笔记topic", "topic"] if c in cols]
+        topic = f"coalesce({', '.join(topic_cols)})" if topic_cols else "NULL"
+        comment_id = "评论ID" if "评论ID" in cols else "NULL"
+        comment_time = "parse_time(评论时间)" if "评论时间" in cols else "NULL::TIMESTAMP"
+        vad = ", ".join(f"TRY_CAST({c} AS DOUBLE) AS {c}" for c in ["valence", "arousal", "dominance"] if c in cols)
+        exclude = [c for c in ["笔记topic", "评论ID", "评论时间", "valence", "arousal", "dominance", "user_origin"]
+                   if c in cols]
+        exclude_sql = f" EXCLUDE ({', '.join(exclude)})" if exclude else ""
+        con.execute(f"""
+            CREATE OR REPLACE VIEW labeled AS
+            SELECT *, CAST(评论时间 AS DATE) AS 日期 FROM (
+                SELECT *{exclude_sql},
+                    {topic} AS 笔记topic,
+                    {comment_id} AS 评论ID,
+                    {comment_time} AS 评论时间,
+                    {vad + "," if vad else ""}
+                    -- 即附件五 map_sentiment 得到的 Valence（DuckDB 列名不区分大小写，与 valence 列冲突，故改名）
+                    CASE
+                        WHEN sentiment IN {tuple(topic_filter.POSITIVE_SENTIMENTS)} THEN 5.0
+                        WHEN sentiment IN {tuple(topic_filter.NEGATIVE_SENTIMENTS)} THEN 0.0
+                        WHEN sentiment IN {tuple(topic_filter.MIXED_SENTIMENTS)} THEN 2.0
+                        ELSE 2.5
+                    END::DOUBLE AS 映射情感值,
+                    CASE WHEN user_origin IN ('中国用户', '外国用户') THEN user_origin ELSE '未知' END AS user_origin
+                FROM (SELECT * REPLACE (CAST(sentiment AS VARCHAR) AS sentiment,
+                                        CAST(user_origin AS VARCHAR) AS user_origin) FROM labeled_raw)
+            )
+        """)
+        con.execute("""
+            CREATE OR REPLACE VIEW topic_daily AS
+            SELECT 笔记topic, 日期, count(评论ID) AS 声量, avg(映射情感值) AS 情感均值
+            FROM labeled
+            WHERE 日期 IS NOT NULL
+            GROUP BY 笔记topic, 日期
+            ORDER BY 笔记topic, 日期
+        """)
+        con.execute("""
+            CREATE OR REPLACE VIEW topic_overall AS
+            SELECT 笔记topic,
+                count(评论ID) AS 总声量,
+                avg(映射情感值) AS 平均情感,
+                count(DISTINCT user_origin) AS 参与人数,
+                coalesce(date_diff('day', min(日期), max(日期)), 0) AS 话题生命周期
+            FROM labeled
+            GROUP BY 笔记topic
+            ORDER BY 笔记topic
+        """)
+        con.execute("""
+            CREATE OR REPLACE VIEW volume_weekly AS
+            SELECT 笔记topic, date_trunc('week', 评论时间) AS 周, user_origin, count(*) AS 声量
+            FROM labeled
+            WHERE 评论时间 IS NOT NULL
+            GROUP BY ALL
+            ORDER BY 笔记topic, 周, user_origin
+        """)
+        if vad:
+            con.execute("""
+                CREATE OR REPLACE VIEW vad_by_sentiment AS
+                SELECT sentiment, count(*) AS 样本数,
+                    round(avg(valence), 4) AS valence, round(avg(arousal), 4) AS arousal,
+                    round(avg(dominance), 4) AS dominance
+                FROM labeled
+                GROUP BY sentiment
+                ORDER BY 样本数 DESC
+            """)
+
+
+def connect(sources=SOURCES, root=".", cache_dir=CACHE_DIR, dedup=True, memory_limit=MEMORY_LIMIT):
+    """
+    建立 DuckDB 连接并注册各数据集与预定义视图，数据不会整体载入内存。
+    dedup 只做ID精确去重；附件九的近重复（MinHash）去重仍需走 pandas 流程。
+    """
+    files = build_cache(sources, root, cache_dir)
+    con = duckdb.connect()
+    con.execute(f"SET memory_limit = {_sql_str(memory_limit)}")
+    con.execute(f"SET temp_directory = {_sql_str(os.path.join(cache_dir, 'duckdb_tmp'))}")
+    _register_macros(con)
+    datasets = [name for name, paths in files.items() if paths]
+    for name in datasets:
+        _create_raw_view(con, name, files[name], dedup)
+    _create_views(con, datasets)
+    return con
+
+
+def list_views(con):
+    return [row[0] for row in con.execute(
+        "SELECT view_name FROM duckdb_views() WHERE NOT internal ORDER BY view_name").fetchall()]
+
+
+def stream(con, sql, batch_rows=BATCH_ROWS):
+    """按批返回查询结果（pandas.DataFrame），结果集大于内存时使用"""
+    reader = con.execute(sql).to_arrow_reader(batch_rows)
+    for batch in reader:
+        yield batch.to_pandas()
+
+
+def query(con, sql):
+    """小结果集直接返回 DataFrame"""
+    return con.execute(sql).df()
+
+
+def export(con, sql, path):
+    """查询结果直接由 DuckDB 写出为 Parquet/CSV，不经过 pandas"""
+    fmt = "PARQUET" if path.endswith(".parquet") else "CSV"
+    con.execute(f"COPY ({sql}) TO {_sql_str(path)} (FORMAT {fmt}, HEADER)" if fmt == "CSV"
+                else f"COPY ({sql}) TO {_sql_str(path)} (FORMAT {fmt})")
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="基于 DuckDB 的 SQL 查询（Excel 自动缓存为 Parquet）")
+    parser.add_argument("sql", nargs="?", help="SQL 语句，可直接查询 posts、comments、labeled 等视图")
+    parser.add_argument("--view", help="查询预定义视图，等价于 SELECT * FROM <view>")
+    parser.add_argument("--list", action="store_true", help="列出可用视图")
+    parser.add_argument("--out", help="结果写出为 .parquet 或 .csv")
+    parser.add_argument("--limit", type=int, default=PREVIEW_ROWS, help="终端显示的行数")
+    parser.add_argument("--root", default=".", help="数据根目录（SOURCES 中的路径相对于此目录）")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--memory-limit", default=MEMORY_LIMIT)
+    parser.add_argument("--no-dedup", action="store_true", help="不按ID去重")
+    args = parser.parse_args(argv)
+
+    con = connect(root=args.root, cache_dir=args.cache_dir, dedup=not args.no_dedup,
+                  memory_limit=args.memory_limit)
+    if args.list or not (args.sql or args.view):
+        for name in list_views(con):
+            print(f"{name:<20}{VIEW_DESCRIPTIONS.get(name, '')}")
+        return
+
+    sql = args.sql or f"SELECT * FROM {args.view}"
+    if args.out:
+        print(f"已写出 {export(con, sql, args.out)}")
+        return
+
+    # 多取一行用于判断结果是否被截断，不会读取完整结果
+    preview = query(con, f"SELECT * FROM ({sql}) LIMIT {args.limit + 1}")
+    with pd.option_context("display.max_columns", None, "display.width", 200):
+        print(preview.head(args.limit).to_string(index=False))
+    if len(preview) > args.limit:
+        print(f"...（仅显示前 {args.limit} 行，完整结果请用 --out 导出）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+# 合成数据配置
+TOPICS = ["cattax", "communicate", "daily", "learn", "Music", "取名", "物价对比", "friend", "remain"]
+SENTIMENTS = ["快乐", "悲伤", "厌恶", "恐惧", "愤怒", "惊讶", "赞美", "感动", "疑惑", "对比", "中性"]
+ORIGINS = ["中国用户", "外国用户", "未知"]
+CN_LOCATIONS = ["北京", "上海", "广东", "浙江", "四川", "江苏", "湖北", "香港", "台湾"]
+FOREIGN_LOCATIONS = ["美国", "加拿大", "英国", "澳大利亚", "德国", "法国", "日本", "韩国", "United States"]
+CN_PHRASES = ["欢迎来到小红书", "哈哈哈笑死", "这个猫税交得好", "今天吃了火锅", "物价对比太震惊了", "我来教你说中文",
+              "给你取个中文名", "真的很可爱", "怎么办好担心", "加油我们支持你", "原来美国的药这么贵", "一起学习吧"]
+EN_PHRASES = ["hello from the US", "tiktok refugee here", "paying my cat tax", "how to learn chinese",
+              "this app is amazing", "so happy to be here", "the music is great", "I am worried about the ban",
+              "thank you for the welcome", "prices in China are so low", "what is my chinese name", "lol so funny"]
+XLSX_MAX_ROWS = 1_000_000  # Excel 单表行数上限（1048576）以内分文件写出
+CHUNK_ROWS = 1_000_000  # 分块生成，控制内存
+
+
+def _texts(rng, n, min_phrases=1, max_phrases=6):
+    """中英文短语随机拼接，模拟中文、英文和双语混合内容"""
+    phrases = np.array(CN_PHRASES + EN_PHRASES, dtype=object)
+    counts = rng.integers(min_phrases, max_phrases + 1, n)
+    picked = phrases[rng.integers(0, len(phrases), counts.sum())]
+    bounds = np.cumsum(counts)[:-1]
+    return [" ".join(p) for p in np.split(picked, bounds)]
+
+
+def _count_strings(rng, n):
+    """点赞数等计数列：混合 '1.2万'、'3k'、纯数字和空值"""
+    values = rng.lognormal(3, 2, n).astype(np.int64)
+    kind = rng.random(n)
+    out = values.astype(str).astype(object)
+    wan = kind < 0.1
+    out[wan] = np.char.add(np.round(values[wan] / 10000 + 1, 1).astype(str), "万")
+    k = (kind >= 0.1) & (kind < 0.15)
+    out[k] = np.char.add(np.round(values[k] / 1000 + 1, 1).astype(str), "k")
+    out[kind > 0.98] = ""
+    return out
+
+
+def _mixed_dates(rng, n, start="2025-01-01", days=210):
+    """混合日期格式：'%Y/%m/%d'、'%m/%d/%Y %H:%M' 和 Timestamp"""
+    stamps = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days * 86400, n), unit="s")
+    kind = rng.random(n)
+    out = np.empty(n, dtype=object)
+    slash = kind < 0.4
+    us = (kind >= 0.4) & (kind < 0.7)
+    out[slash] = stamps[slash].strftime("%Y/%m/%d")
+    out[us] = stamps[us].strftime("%m/%d/%Y %H:%M")
+    rest = ~(slash | us)
+    out[rest] = list(stamps[rest].to_pydatetime())
+    return out
+
+
+def _locations(rng, n, foreign_share=0.35):
+    foreign = rng.random(n) < foreign_share
+    out = np.array(CN_LOCATIONS, dtype=object)[rng.integers(0, len(CN_LOCATIONS), n)]
+    out[foreign] = np.array(FOREIGN_LOCATIONS, dtype=object)[rng.integers(0, len(FOREIGN_LOCATIONS), foreign.sum())]
+    return out
+
+
+def generate_posts(n, seed=0, id_offset=0):
+    rng = np.random.default_rng(seed)
+    details = _texts(rng, n, 2, 12)
+    return pd.DataFrame({
+        "笔记ID": np.arange(id_offset, id_offset + n),
+        "笔记详情": details,
+        "combine_notes": details,
+        "笔记类型": rng.choice(["视频", "图文", "normal"], n, p=[0.45, 0.5, 0.05]),
+        "点赞数": _count_strings(rng, n),
+        "评论数": _count_strings(rng, n),
+        "收藏数": _count_strings(rng, n),
+        "IP属地": _locations(rng, n),
+        "发布时间": _mixed_dates(rng, n),
+        "笔记topic": rng.choice(TOPICS, n),
+    })
+
+
+def generate_comments(n, n_posts, seed=0, id_offset=0):
+    rng = np.random.default_rng(seed + 1)
+    note_ids = rng.integers(0, max(n_posts, 1), n)
+    sentiments = rng.choice(SENTIMENTS, n).astype(object)
+    origins = rng.choice(ORIGINS, n, p=[0.6, 0.35, 0.05]).astype(object)
+    failed = rng.random(n) < 0.01  # 模拟LLM解析失败记为0的行
+    sentiments[failed], origins[failed] = 0, 0
+    return pd.DataFrame({
+        "评论ID": np.arange(id_offset, id_offset + n),
+        "笔记ID": note_ids,
+        "笔记topic": np.array(TOPICS, dtype=object)[note_ids % len(TOPICS)],
+        "评论内容": _texts(rng, n),
+        "点赞数": _count_strings(rng, n),
+        "IP属地": _locations(rng, n),
+        "评论时间": _mixed_dates(rng, n),
+        "sentiment": sentiments,
+        "user_origin": origins,
+        "valence": np.where(failed, 0, rng.integers(0, 6, n)),
+        "arousal": np.where(failed, 0, rng.integers(0, 6, n)),
+        "dominance": np.where(failed, 0, rng.integers(0, 6, n)),
+    })
+
+
+def write_dataset(out_dir, n_comments, fmt="xlsx", posts_ratio=0.1, seed=0):
+    """
+    写出一套与各脚本读取格式一致的数据：
+    - 帖子*.xlsx / 评论*.xlsx：附件三 load_data 读取的目录
+    - 评论update.xlsx（有标记的、筛选后的sum 两个sheet）：附件五~八使用
+    - fmt="parquet" 时写出 帖子.parquet / 评论.parquet，按 CHUNK_ROWS 作为行组
+    返回写出的文件列表
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    n_posts = max(1, int(n_comments * posts_ratio))
+    written = []
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        for name, n, make in [("帖子", n_posts, lambda k, off: generate_posts(k, seed + off, off)),
+                              ("评论", n_comments, lambda k, off: generate_comments(k, n_posts, seed + off, off))]:
+            path = os.path.join(out_dir, f"{name}.parquet")
+            writer = None
+            for offset in range(0, n, CHUNK_ROWS):
+                chunk = make(min(CHUNK_ROWS, n - offset), offset)
+                chunk = chunk.astype({c: str for c in chunk.columns if chunk[c].dtype == object})
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = writer or pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+            writer.close()
+            written.append(path)
+        return written
+
+    for name, n, make in [("帖子", n_posts, lambda k, off: generate_posts(k, seed + off, off)),
+                          ("评论", n_comments, lambda k, off: generate_comments(k, n_posts, seed + off, off))]:
+        for part, offset in enumerate(range(0, n, XLSX_MAX_ROWS)):
+            path = os.path.join(out_dir, f"{name}{part + 1}.xlsx")
+            make(min(XLSX_MAX_ROWS, n - offset), offset).to_excel(path, index=False)
+            written.append(path)
+
+    labeled = generate_comments(min(n_comments, XLSX_MAX_ROWS), n_posts, seed)
+    path = os.path.join(out_dir, "评论update.xlsx")
+    with pd.ExcelWriter(path) as writer:
+        labeled.to_excel(writer, sheet_name='有标记的', index=False)
+        labeled[labeled['user_origin'] != 0].to_excel(writer, sheet_name='筛选后的sum', index=False)
+    written.append(path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成的帖子与评论数据")
+    parser.add_argument("rows", type=int, help="评论行数（帖子数为其 1/10）")
+    parser.add_argument("--out", default="synthetic_data", help="输出目录")
+    parser.add_argument("--format", choices=["xlsx", "parquet"], default="xlsx")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for path in write_dataset(args.out, args.rows, args.format, seed=args.seed):
+        print(f"已写出 {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import re
+import numpy as np
+
+# 本地 token 估算（没有分词器时的近似值）：中文及全角字符约 0.6 token/字，其余约 0.3 token/字符
+CJK_TOKENS_PER_CHAR = 0.6
+OTHER_TOKENS_PER_CHAR = 0.3
+HEAD_SHARE = 0.7  # 超出预算时开头保留的比例，其余留给结尾（结尾常有总结或提问）
+ELLIPSIS = "……"
+MAX_HASHTAGS = 3  # 最多保留的话题标签个数
+MAX_REPEAT = 2  # 连续重复的表情最多保留的个数
+
+URL_PATTERN = re.compile(r"https?://\S+|www\.\S+")
+# 小红书导出的话题标签形如 "#cattax[话题]#"，也兼容普通的 "#tag"
+HASHTAG_PATTERN = re.compile(r"#([^#\s]+?)\[话题\]#|#([^#\s]+)")
+# 小红书表情代码（如 "[笑哭R]"）和 Unicode 表情
+EMOJI = r"(?:\[[^\[\]\s]{1,8}\]|[\U0001F300-\U0001FAFF☀-➿])"
+REPEAT_PATTERN = re.compile(rf"({EMOJI})(?:\s*\1){{{MAX_REPEAT},}}")
+SPACE_PATTERN = re.compile(r"\s+")
+
+
+def _token_weights(text):
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    wide = ((codes >= 0x2E80) & (codes <= 0x9FFF)) | ((codes >= 0xF900) & (codes <= 0xFAFF)) | (
+        (codes >= 0xFF00) & (codes <= 0xFFEF))
+    return np.where(wide, CJK_TOKENS_PER_CHAR, OTHER_TOKENS_PER_CHAR)
+
+
+def estimate_tokens(text):
+    if not text:
+        return 0
+    return int(np.ceil(_token_weights(text).sum()))
+
+
+def clean_text(text, max_hashtags=MAX_HASHTAGS):
+    """去掉链接，只保留前几个不重复的话题标签，折叠连续重复的表情和多余空白"""
+    text = URL_PATTERN.sub(" ", text)
+    kept = []
+
+    def keep_hashtag(match):
+        tag = match.group(1) or match.group(2)
+        if tag in kept or len(kept) >= max_hashtags:
+            return " "
+        kept.append(tag)
+        return f"#{tag} "
+
+    text = HASHTAG_PATTERN.sub(keep_hashtag, text)
+    text = REPEAT_PATTERN.sub(lambda m: m.group(1) * MAX_REPEAT, text)
+    return SPACE_PATTERN.sub(" ", text).strip()
+
+
+def truncate(text, budget, head_share=HEAD_SHARE):
+    """超出 budget 时保留开头和结尾，中间用省略号代替"""
+    weights = _token_weights(text)
+    if weights.sum() <= budget:
+        return text
+    budget = max(budget - estimate_tokens(ELLIPSIS), 0)
+    head = int(np.searchsorted(np.cumsum(weights), budget * head_share, side="right"))
+    tail = int(np.searchsorted(np.cumsum(weights[::-1]), budget * (1 - head_share), side="right"))
+    tail = min(tail, len(text) - head)
+    return text[:head] + ELLIPSIS + (text[len(text) - tail:] if tail else "")
+
+
+def fit_text(text, budget, clean=True):
+    """清理并裁剪到 budget 个 token 以内，返回 (文本, 原始 token 估计, 处理后 token 估计)"""
+    if not isinstance(text, str) or not text:
+        return text, 0, 0
+    before = estimate_tokens(text)
+    fitted = truncate(clean_text(text) if clean else text, budget)
+    return fitted, before, estimate_tokens(fitted)
@@ -0,0 +1,333 @@
+import os
+import re
+import json
+import hashlib
+import argparse
+import importlib
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# 默认路径配置，可用 --config 指定 JSON 文件覆盖（替代各脚本中写死的 D:/ 路径）
+DEFAULT_CONFIG = {
+    "posts": "data/帖子.xlsx",  # 帖子（需包含 combine_notes 列）
+    "comments": "data/comments.xlsx",  # 评论（需包含 笔记topic、评论内容 列）
+    "xhs_data": "xhs_data",  # 爬虫原始数据目录（附件三使用）
+    "work_dir": "data/deal",  # 中间结果与分析输出目录
+    "topic_mode": "api",  # 附件一的主题匹配模式："api" 或 "local"
+}
+STATE_FILE = ".pipeline_state.json"  # 记录每个阶段上次成功运行时的哈希
+
+
+class Stage:
+    """流水线阶段：inputs/outputs 为产物名称，code 为该阶段直接运行的脚本（间接导入的附件由 code_dependencies 展开）"""
+
+    def __init__(self, name, func, inputs, outputs, code, description=""):
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.outputs = outputs
+        self.code = code
+        self.description = description
+
+
+def artifacts(config):
+    """产物名称 -> (路径, 类型)，类型为 file 或 dir"""
+    work_dir = config["work_dir"]
+    return {
+        "posts": (config["posts"], "file"),
+        "comments": (config["comments"], "file"),
+        "xhs_data": (config["xhs_data"], "dir"),
+        "topic_result": (os.path.join(work_dir, "result_topic.xlsx"), "file"),
+        "sentiment_result": (os.path.join(work_dir, "result_sentiment.xlsx"), "file"),
+        "label_db": (os.path.join(work_dir, "labels.db"), "file"),
+        "labeled": (os.path.join(work_dir, "评论update.xlsx"), "file"),
+        "resonance": (os.path.join(work_dir, "跨文化情感共鸣.csv"), "file"),
+        "origin_tables": (os.path.join(work_dir, "评论特点.xlsx"), "file"),
+        "wordclouds": (os.path.join(work_dir, "wordclouds"), "dir"),
+        "report": (os.path.join(work_dir, "report"), "dir"),
+    }
+
+#------------------------------------------------------------------------------------------各阶段实现
+def run_topic(config, paths):
+    topic = importlib.import_module("附件一：topic")
+    topic.INPUT_EXCEL = paths["posts"][0]
+    topic.OUTPUT_EXCEL = paths["topic_result"][0]
+    if config["topic_mode"] == "local":
+        topic.process_excel_local()
+    else:
+        topic.process_excel()
+
+
+def run_sentiment(config, paths):
+    llm = importlib.import_module("附件二：LLM")
+    if not llm.process_excel(paths["comments"][0], paths["sentiment_result"][0], batch_size=80, max_retries=2,
+                             start=0, end=None, db_path=paths["label_db"][0]):
+        raise RuntimeError("情感标注未完成（输入检查失败或运行中断），详见上方输出")
+
+
+def run_merge(config, paths):
+    """
+    把LLM标注结果按结果库键（评论ID，没有ID时为 笔记topic+评论内容 的哈希）拼回评论表，
+    生成附件五~八使用的工作簿（附件四直接读取标注结果库）；结果库中没有的评论不进入工作簿
+    """
+    reader = importlib.import_module("附件二十三：流式读取")
+    store = importlib.import_module("附件十八：标注结果库")
+    comments = pd.read_excel(paths["comments"][0]).reset_index(drop=True)
+    # 键用与附件二写入时相同的方式读取和计算，ID的类型与格式保持一致
+    keys = [store.label_key(*row) for row in reader.iter_rows(paths["comments"][0], ['评论ID', '笔记topic', '评论内容'])]
+    con = store.connect(paths["label_db"][0])
+    try:
+        labels = store.fetch(con, keys)
+    finally:
+        con.close()
+    labeled = pd.concat([comments, labels[store.LABEL_FIELDS]], axis=1)
+    found = labels['status'].notna().to_numpy()
+    filtered = labeled[(labels['status'] == 'ok').to_numpy()]
+    labeled = labeled[found]
+    with pd.ExcelWriter(paths["labeled"][0]) as writer:
+        labeled.to_excel(writer, sheet_name='有标记的', index=False)
+        filtered.to_excel(writer, sheet_name='筛选后的sum', index=False)
+
+
+def run_report(config, paths):
+    report = importlib.import_module("附件十：报告渲染")
+    jobs = report.collect_jobs(paths["xhs_data"][0], paths["labeled"][0])
+    report.render_report(jobs, out_dir=paths["report"][0])
+
+
+def run_resonance(config, paths):
+    resonance = importlib.import_module("附件四：跨文化情感共鸣分析")
+    df_clean = resonance.clean_results(resonance.load_results_from_store(paths["label_db"][0]))
+    resonance.compute_resonance(df_clean).to_csv(paths["resonance"][0], index=False, encoding="utf-8-sig")
+
+
+def run_origin_tables(config, paths):
+    comment_stats = importlib.import_module("附件七：评论特点分析")
+    percentage_table, grouped_data = comment_stats.compute_origin_tables(paths["labeled"][0])
+    with pd.ExcelWriter(paths["origin_tables"][0]) as writer:
+        percentage_table.to_excel(writer, sheet_name='sentiment百分比')
+        grouped_data.to_excel(writer, sheet_name='VAD统计')
+
+
+def run_wordclouds(config, paths):
+    segment = importlib.import_module("附件六：分词")
+    segment.batch_word_clouds(segment.load_comments(paths["labeled"][0]), out_dir=paths["wordclouds"][0])
+
+
+STAGES = [
+    Stage("topic", run_topic, ["posts"], ["topic_result"], ["附件一：topic.py"], "帖子主题标注（附件一）"),
+    Stage("sentiment", run_sentiment, ["comments"], ["sentiment_result", "label_db"],
+          ["附件二：LLM.py", "附件十八：标注结果库.py"], "评论情感标注（附件二）"),
+    Stage("merge", run_merge, ["comments", "label_db"], ["labeled"], ["附件十八：标注结果库.py", "附件二十三：流式读取.py"],
+          "合并标注结果"),
+    Stage("report", run_report, ["xhs_data", "labeled"], ["report"],
+          ["附件三：dataAnalysis.py", "附件五：话题筛选.py", "附件八：话题声量分析.py", "附件十：报告渲染.py",
+           "附件十一：降采样绘图.py"], "附件三/五/八 图表报告"),
+    Stage("resonance", run_resonance, ["label_db"], ["resonance"],
+          ["附件四：跨文化情感共鸣分析.py", "附件十八：标注结果库.py"], "跨文化情感共鸣（附件四）"),
+    Stage("origin_tables", run_origin_tables, ["labeled"], ["origin_tables"], ["附件七：评论特点分析.py"],
+          "用户来源 × 情感统计（附件七）"),
+    Stage("wordclouds", run_wordclouds, ["labeled"], ["wordclouds"], ["附件六：分词.py", "附件十：报告渲染.py"],
+          "话题词云（附件六）"),
+]
+
+#------------------------------------------------------------------------------------------哈希与调度
+IMPORT_PATTERN = re.compile(r"""import_module\(\s*["'](附件[^"']+)["']\s*\)""")
+
+
+def code_dependencies(code_files, script_dir):
+    """沿 importlib.import_module("附件…") 调用递归收集脚本依赖的全部附件（含自身），按文件名排序"""
+    seen, todo = set(), list(code_files)
+    while todo:
+        name = todo.pop()
+        path = os.path.join(script_dir, name)
+        if name in seen or not os.path.isfile(path):
+            continue
+        seen.add(name)
+        with open(path, encoding="utf-8") as f:
+            todo.extend(module + ".py" for module in IMPORT_PATTERN.findall(f.read()))
+    return sorted(seen)
+
+
+def hash_path(path, cache):
+    """文件按内容哈希，目录按其中所有文件的哈希；(大小, 修改时间) 未变时复用上次结果"""
+    if os.path.isdir(path):
+        h = hashlib.sha256()
+        for root, dirs, files in sorted(os.walk(path)):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                h.update(os.path.relpath(file_path, path).encode("utf-8"))
+                h.update(hash_path(file_path, cache).encode())
+        return h.hexdigest()
+    if not os.path.exists(path):
+        return "missing"
+    stat = os.stat(path)
+    cached = cache.get(path)
+    if cached and cached["size"] == stat.st_size and cached["mtime"] == stat.st_mtime:
+        return cached["sha256"]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    cache[path] = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": h.hexdigest()}
+    return cache[path]["sha256"]
+
+
+def stage_key(stage, config, paths, cache):
+    """阶段哈希：输入内容 + 代码版本 + 相关配置"""
+    h = hashlib.sha256()
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in stage.inputs:
+        h.update(name.encode())
+        h.update(hash_path(paths[name][0], cache).encode())
+    # 流水线脚本自身只按文件哈希；其中 run_* 按需导入的附件属于各自阶段，不展开
+    for code_file in code_dependencies(stage.code, script_dir) + [os.path.basename(__file__)]:
+        h.update(code_file.encode())
+        h.update(hash_path(os.path.join(script_dir, code_file), cache).encode())
+    h.update(json.dumps({"topic_mode": config["topic_mode"]} if stage.name == "topic" else {}).encode())
+    return h.hexdigest()
+
+
+def outputs_exist(stage, paths):
+    for name in stage.outputs:
+        path, kind = paths[name]
+        if not (os.path.isdir(path) if kind == "dir" else os.path.isfile(path)):
+            return False
+    return True
+
+
+def topological_levels(stages):
+    """按依赖关系分层，同一层的阶段互不依赖，可以并行"""
+    producer = {out: stage.name for stage in stages for out in stage.outputs}
+    deps = {stage.name: {producer[i] for i in stage.inputs if i in producer} for stage in stages}
+    levels, done = [], set()
+    while len(done) < len(stages):
+        level = [s for s in stages if s.name not in done and deps[s.name] <= done]
+        if not level:
+            raise ValueError("流水线存在循环依赖")
+        levels.append(level)
+        done.update(s.name for s in level)
+    return levels
+
+
+def _run_stage(stage_name, config):
+    """在子进程中运行阶段（无界面绘图）"""
+    os.environ["MPLBACKEND"] = "Agg"
+    stage = next(s for s in STAGES if s.name == stage_name)
+    paths = artifacts(config)
+    for name in stage.outputs:
+        path, kind = paths[name]
+        os.makedirs(path if kind == "dir" else os.path.dirname(path) or ".", exist_ok=True)
+    stage.func(config, paths)
+    if not outputs_exist(stage, paths):  # 阶段函数只打印错误就返回时，不能记为成功
+        missing = [name for name in stage.outputs if not os.path.exists(paths[name][0])]
+        raise RuntimeError(f"阶段 {stage_name} 运行后缺少产物：{missing}")
+    return stage_name
+
+
+def load_state(config):
+    state_path = os.path.join(config["work_dir"], STATE_FILE)
+    if os.path.exists(state_path):
+        with open(state_path, encoding="utf-8") as f:
+            return json.load(f)
+    return {"stages": {}, "hash_cache": {}}
+
+
+def save_state(config, state):
+    os.makedirs(config["work_dir"], exist_ok=True)
+    with open(os.path.join(config["work_dir"], STATE_FILE), "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+
+def select_stages(only):
+    """只运行指定阶段时，连同其上游阶段一起纳入"""
+    if not only:
+        return STAGES
+    producer = {out: stage for stage in STAGES for out in stage.outputs}
+    selected, queue = set(), list(only)
+    while queue:
+        name = queue.pop()
+        if name in selected:
+            continue
+        stage = next((s for s in STAGES if s.name == name), None)
+        if stage is None:
+            raise ValueError(f"未知阶段：{name}")
+        selected.add(name)
+        queue.extend(producer[i].name for i in stage.inputs if i in producer)
+    return [s for s in STAGES if s.name in selected]
+
+
+def run_pipeline(config, only=None, force=False, n_workers=None):
+    """逐层运行流水线：跳过输入与代码都未变化且输出存在的阶段，同层阶段并行"""
+    paths = artifacts(config)
+    state = load_state(config)
+    failed = set()
+    for level in topological_levels(select_stages(only)):
+        pending = {}
+        for stage in level:
+            upstream_failed = any(name in failed for name in stage.inputs)
+            if upstream_failed:
+                print(f"[{stage.name}] 上游阶段失败，跳过")
+                failed.update(stage.outputs)
+                continue
+            key = stage_key(stage, config, paths, state["hash_cache"])
+            if not force and state["stages"].get(stage.name) == key and outputs_exist(stage, paths):
+                print(f"[{stage.name}] 已是最新，跳过")
+                continue
+            pending[stage.name] = (stage, key)
+        if not pending:
+            continue
+        print(f"运行阶段：{', '.join(pending)}")
+        with ProcessPoolExecutor(max_workers=n_workers or len(pending)) as executor:
+            futures = {name: executor.submit(_run_stage, name, config) for name in pending}
+            for name, future in futures.items():
+                stage, key = pending[name]
+                try:
+                    future.result()
+                    state["stages"][name] = key
+                    print(f"[{name}] 完成")
+                except Exception as e:
+                    print(f"[{name}] 失败：{str(e)}")
+                    state["stages"].pop(name, None)
+                    failed.update(stage.outputs)
+        save_state(config, state)
+    return not failed
+
+
+def show_status(config):
+    paths = artifacts(config)
+    state = load_state(config)
+    for stage in STAGES:
+        key = stage_key(stage, config, paths, state["hash_cache"])
+        up_to_date = state["stages"].get(stage.name) == key and outputs_exist(stage, paths)
+        print(f"{stage.name:<15}{'最新' if up_to_date else '需要运行':<8}{stage.description}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="小红书'TikTok难民'事件分析流水线")
+    parser.add_argument("command", choices=["run", "status", "list"], help="run：运行；status：查看各阶段是否最新；list：列出阶段")
+    parser.add_argument("--config", help="JSON 配置文件，覆盖默认路径")
+    parser.add_argument("--only", nargs="+", help="只运行指定阶段（及其上游）")
+    parser.add_argument("--force", action="store_true", help="忽略哈希，强制重新运行")
+    parser.add_argument("--workers", type=int, help="同层并行的最大进程数")
+    args = parser.parse_args(argv)
+
+    config = dict(DEFAULT_CONFIG)
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            config.update(json.load(f))
+
+    if args.command == "list":
+        for stage in STAGES:
+            print(f"{stage.name:<15}{' + '.join(stage.inputs):<30} -> {' + '.join(stage.outputs):<30}{stage.description}")
+    elif args.command == "status":
+        show_status(config)
+    else:
+        ok = run_pipeline(config, only=args.only, force=args.force, n_workers=args.workers)
+        raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
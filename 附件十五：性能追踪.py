@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import atexit
+import threading
+import functools
+import tracemalloc
+from contextlib import contextmanager
+
+# 通过环境变量开启（默认关闭，关闭时装饰器不做任何包装）：
+#   XHS_TRACE=trace.jsonl          写出 JSON lines（每个阶段一行）
+#   XHS_TRACE_FORMAT=chrome        改为 Chrome trace 格式（可在 chrome://tracing 或 Perfetto 中打开）
+#   XHS_TRACE_MALLOC=1             同时记录 tracemalloc 内存增量（会拖慢纯Python代码）
+TRACE_PATH = os.environ.get("XHS_TRACE", "")
+if TRACE_PATH in ("1", "true"):
+    TRACE_PATH = "trace.jsonl"
+TRACE_FORMAT = os.environ.get("XHS_TRACE_FORMAT", "jsonl")
+TRACE_MALLOC = os.environ.get("XHS_TRACE_MALLOC", "") in ("1", "true")
+ENABLED = bool(TRACE_PATH)
+
+_records = []
+_local = threading.local()
+_start = time.perf_counter()
+
+
+def _peak_rss_mb():
+    """进程峰值常驻内存（MB），取不到时返回 None"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if os.uname().sysname == "Darwin" else peak / 2 ** 10
+    except (ImportError, AttributeError):
+        try:
+            import psutil
+            info = psutil.Process().memory_info()
+            return getattr(info, "peak_wset", info.rss) / 2 ** 20
+        except ImportError:
+            return None
+
+
+def _count_rows(value):
+    """DataFrame/Series 返回行数，{'posts':..., 'comments':...} 返回总行数"""
+    if hasattr(value, "shape") and hasattr(value, "index"):
+        return len(value)
+    if isinstance(value, dict):
+        counts = [_count_rows(v) for v in value.values()]
+        counts = [c for c in counts if c is not None]
+        return sum(counts) if counts else None
+    return None
+
+
+class Span:
+    """一次计时记录，可在 with 块内设置 rows"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = None
+
+
+@contextmanager
+def trace_span(name, rows=None):
+    """记录一个阶段的墙钟时间、CPU时间、峰值RSS和（可选）tracemalloc 增量"""
+    span = Span(name)
+    span.rows = rows
+    if not ENABLED:
+        yield span
+        return
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    parent = stack[-1] if stack else None
+    stack.append(name)
+    malloc_before = tracemalloc.get_traced_memory()[0] if TRACE_MALLOC else None
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield span
+    finally:
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        stack.pop()
+        _records.append({
+            "name": name,
+            "parent": parent,
+            "start_s": round(wall_start - _start, 6),
+            "wall_s": round(wall, 6),
+            "cpu_s": round(cpu, 6),
+            "peak_rss_mb": _peak_rss_mb(),
+            "malloc_delta_mb": None if malloc_before is None else
+            round((tracemalloc.get_traced_memory()[0] - malloc_before) / 2 ** 20, 3),
+            "rows": span.rows,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        })
+
+
+def traced(name=None):
+    """函数装饰器：未开启追踪时原样返回函数；开启时记录耗时、内存和输入/输出行数"""
+    def decorator(func):
+        if not ENABLED:
+            return func
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with trace_span(label) as span:
+                result = func(*args, **kwargs)
+                rows = _count_rows(result)
+                span.rows = rows if rows is not None else (_count_rows(args[0]) if args else None)
+                return result
+        return wrapper
+    return decorator
+
+
+def instrument_matplotlib():
+    """把 plt.show / savefig / tight_layout 记录为绘图阶段（真正的渲染发生在这些调用中）"""
+    if not ENABLED:
+        return
+    import matplotlib.pyplot as plt
+    from matplotlib.figure import Figure
+    for owner, attr, label in [(plt, "show", "plt.show"), (plt, "savefig", "plt.savefig"),
+                               (plt, "tight_layout", "plt.tight_layout"), (Figure, "savefig", "Figure.savefig")]:
+        original = getattr(owner, attr)
+        if getattr(original, "_traced", False):
+            continue
+        wrapped = traced(label)(original)
+        wrapped._traced = True
+        setattr(owner, attr, wrapped)
+
+
+def write_trace(path=None, fmt=None):
+    path, fmt = path or TRACE_PATH, fmt or TRACE_FORMAT
+    if fmt == "chrome":
+        events = [{"name": r["name"], "ph": "X", "ts": r["start_s"] * 1e6, "dur": r["wall_s"] * 1e6,
+                   "pid": r["pid"], "tid": r["tid"],
+                   "args": {k: r[k] for k in ["cpu_s", "peak_rss_mb", "malloc_delta_mb", "rows"]}}
+                  for r in _records]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events}, f, ensure_ascii=False)
+    else:
+        with open(path, "a", encoding="utf-8") as f:
+            for r in _records:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+
+def summary_table():
+    """按阶段名汇总：调用次数、总耗时、CPU时间、峰值RSS、行数"""
+    totals = {}
+    for r in _records:
+        item = totals.setdefault(r["name"], {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_rss_mb": 0.0, "rows": 0})
+        item["calls"] += 1
+        item["wall_s"] += r["wall_s"]
+        item["cpu_s"] += r["cpu_s"]
+        item["peak_rss_mb"] = max(item["peak_rss_mb"], r["peak_rss_mb"] or 0)
+        item["rows"] += r["rows"] or 0
+    lines = [f"{'阶段':<36}{'次数':>6}{'墙钟(s)':>10}{'CPU(s)':>10}{'峰值RSS(MB)':>14}{'行数':>12}"]
+    for name, item in sorted(totals.items(), key=lambda kv: -kv[1]["wall_s"]):
+        lines.append(f"{name:<36}{item['calls']:>6}{item['wall_s']:>10.3f}{item['cpu_s']:>10.3f}"
+                     f"{item['peak_rss_mb']:>14.1f}{item['rows']:>12}")
+    return "\n".join(lines)
+
+
+def _at_exit():
+    if not _records:
+        return
+    write_trace()
+    print("\n=== 性能追踪汇总 ===")
+    print(summary_table())
+    print(f"追踪记录已写入 {TRACE_PATH}")
+
+
+if ENABLED:
+    if TRACE_MALLOC:
+        tracemalloc.start()
+    atexit.register(_at_exit)
@@ -0,0 +1,274 @@
+import os
+import sqlite3
+import hashlib
+import argparse
+from datetime import datetime
+
+import pandas as pd
+
+# LLM 标注结果库：每条评论一行，以评论ID（没有时用 笔记topic+评论内容 的哈希）为主键，重复标注时覆盖
+DB_PATH = "D:/111PythonLearning/data/deal/labels.db"  # 默认结果库路径，附件二写入、附件四等读取都以此为准
+
+# 标注状态
+STATUS_OK = "ok"
+STATUS_PARSE_FAILED = "parse_failed"  # 返回内容缺少字段或取值不合法
+STATUS_API_FAILED = "api_failed"  # 对应旧结果文件中的 "API调用失败"
+STATUS_TIMEOUT = "timeout"  # 对应 "超时失败"
+STATUS_ERROR = "error"  # 对应 "处理错误：..."
+STATUSES = (STATUS_OK, STATUS_PARSE_FAILED, STATUS_API_FAILED, STATUS_TIMEOUT, STATUS_ERROR)
+
+LABEL_FIELDS = ["sentiment", "user_origin", "valence", "arousal", "dominance"]
+SENTIMENTS = ["快乐", "悲伤", "厌恶", "恐惧", "愤怒", "惊讶", "赞美", "感动", "疑惑", "对比", "中性"]  # 与附件二 PROMPT 一致
+ORIGINS = ["中国用户", "外国用户", "未知"]
+VAD_RANGE = (0, 5)
+MAX_REPAIR_ATTEMPTS = 2  # 每行最多追问的次数，超过后不再进入修复队列
+LEGACY_COLUMNS = ["笔记topic", "评论内容"] + LABEL_FIELDS  # 附件二旧版 result*.xlsx 的列顺序
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS labels (
+    key TEXT PRIMARY KEY,
+    comment_id TEXT,
+    topic TEXT,
+    comment TEXT,
+    sentiment TEXT,
+    user_origin TEXT,
+    valence INTEGER,
+    arousal INTEGER,
+    dominance INTEGER,
+    status TEXT NOT NULL CHECK (status IN {STATUSES}),
+    error TEXT,
+    model TEXT,
+    prompt_version TEXT,
+    labeled_at TEXT NOT NULL,
+    repair_attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_labels_status ON labels (status);
+CREATE INDEX IF NOT EXISTS idx_labels_topic ON labels (topic, status);
+CREATE INDEX IF NOT EXISTS idx_labels_origin ON labels (user_origin, status);
+"""
+
+COLUMNS = ["key", "comment_id", "topic", "comment"] + LABEL_FIELDS + [
+    "status", "error", "model", "prompt_version", "labeled_at"]
+
+# 已有 ok 结果时，只有新的 ok 结果才会覆盖它，重新标注失败不会冲掉好的标签
+UPSERT = f"""
+INSERT INTO labels ({", ".join(COLUMNS)}) VALUES ({", ".join("?" * len(COLUMNS))})
+ON CONFLICT (key) DO UPDATE SET
+    {", ".join(f"{c} = excluded.{c}" for c in COLUMNS[1:])},
+    repair_attempts = 0
+WHERE excluded.status = '{STATUS_OK}' OR labels.status <> '{STATUS_OK}'
+"""
+
+
+def connect(path=DB_PATH):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    con = sqlite3.connect(path)
+    con.executescript(SCHEMA)
+    if "repair_attempts" not in [row[1] for row in con.execute("PRAGMA table_info(labels)")]:
+        # 早期版本的结果库没有该列
+        con.execute("ALTER TABLE labels ADD COLUMN repair_attempts INTEGER NOT NULL DEFAULT 0")
+    return con
+
+
+def invalid_fields(labels):
+    """返回缺失或取值不合法的字段（情感不在列表中、来源不在列表中、VAD 不是 0-5 的整数）"""
+    bad = []
+    for field in LABEL_FIELDS:
+        value = labels.get(field)
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            bad.append(field)
+        elif field == "sentiment" and value not in SENTIMENTS:
+            bad.append(field)
+        elif field == "user_origin" and value not in ORIGINS:
+            bad.append(field)
+        elif field in ("valence", "arousal", "dominance") and not (
+                float(value).is_integer() and VAD_RANGE[0] <= value <= VAD_RANGE[1]):
+            bad.append(field)
+    return bad
+
+
+def label_key(comment_id, topic, comment):
+    """有评论ID时以ID为键，否则用 笔记topic+评论内容 的哈希"""
+    if comment_id is not None and not pd.isna(comment_id) and str(comment_id).strip():
+        return f"id:{comment_id}"
+    digest = hashlib.sha1(f"{topic}\x1f{comment}".encode("utf-8")).hexdigest()
+    return f"sha1:{digest}"
+
+
+def make_record(key, topic, comment, labels=None, status=STATUS_OK, error=None,
+                comment_id=None, model=None, prompt_version=None):
+    """labels 为 {字段: 值}，缺失的字段记为 NULL（而不是0）"""
+    labels = labels or {}
+    if comment_id is not None and pd.isna(comment_id):
+        comment_id = None
+    return (key, None if comment_id is None else str(comment_id), topic, comment,
+            *[labels.get(f) for f in LABEL_FIELDS],
+            status, error, model, prompt_version, datetime.now().isoformat(timespec="seconds"))
+
+
+def upsert(con, records):
+    with con:
+        con.executemany(UPSERT, records)
+    return len(records)
+
+
+def done_keys(con, keys, statuses=(STATUS_OK,)):
+    """keys 中已经有指定状态结果的键（用于断点续传）"""
+    keys = list(keys)
+    done = set()
+    placeholders = ", ".join("?" * len(statuses))
+    for i in range(0, len(keys), 500):  # SQLite 单条语句的参数个数有上限
+        chunk = keys[i:i + 500]
+        rows = con.execute(
+            f"SELECT key FROM labels WHERE status IN ({placeholders}) AND key IN ({', '.join('?' * len(chunk))})",
+            (*statuses, *chunk)).fetchall()
+        done.update(row[0] for row in rows)
+    return done
+
+
+def fetch(con, keys):
+    """按 keys 的顺序取出结果（不存在的键对应空行）"""
+    keys = list(keys)
+    frames = []
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        frames.append(pd.read_sql_query(
+            f"SELECT * FROM labels WHERE key IN ({', '.join('?' * len(chunk))})", con, params=chunk))
+    found = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS)
+    return found.set_index("key").reindex(keys).reset_index()
+
+
+def select_ok(con, topics=None, origins=None, columns=None):
+    """只取 status = ok 的结果，可按主题、用户来源过滤（均走索引）"""
+    columns = columns or ["topic", "comment"] + LABEL_FIELDS
+    sql = f"SELECT {', '.join(columns)} FROM labels WHERE status = ?"
+    params = [STATUS_OK]
+    if topics is not None:
+        sql += f" AND topic IN ({', '.join('?' * len(topics))})"
+        params += list(topics)
+    if origins is not None:
+        sql += f" AND user_origin IN ({', '.join('?' * len(origins))})"
+        params += list(origins)
+    return pd.read_sql_query(sql, con, params=params)
+
+
+def repair_queue(con, keys=None, max_attempts=MAX_REPAIR_ATTEMPTS, limit=None):
+    """待修复的行：未成功且追问次数未用完，追问次数少的优先"""
+    sql = "SELECT * FROM labels WHERE status <> ? AND repair_attempts < ? ORDER BY repair_attempts, labeled_at"
+    queue = pd.read_sql_query(sql, con, params=[STATUS_OK, max_attempts])
+    if keys is not None:
+        queue = queue[queue["key"].isin(set(keys))]
+    return queue if limit is None else queue.head(limit)
+
+
+def record_repair(con, key, labels, status, error=None):
+    """写回修复后的字段，并累计追问次数"""
+    with con:
+        con.execute(
+            f"UPDATE labels SET {', '.join(f'{f} = ?' for f in LABEL_FIELDS)}, status = ?, error = ?, "
+            "labeled_at = ?, repair_attempts = repair_attempts + 1 WHERE key = ?",
+            (*[labels.get(f) for f in LABEL_FIELDS], status, error,
+             datetime.now().isoformat(timespec="seconds"), key))
+
+
+def status_counts(con):
+    return pd.read_sql_query(
+        "SELECT topic, status, COUNT(*) AS 数量 FROM labels GROUP BY topic, status ORDER BY topic, status", con)
+
+
+def export_excel(con, keys, path):
+    """按输入顺序导出为工作簿（带表头和 status 列），与旧版 result*.xlsx 的行顺序一致"""
+    df = fetch(con, keys).rename(columns={"topic": "笔记topic", "comment": "评论内容"})
+    df[["笔记topic", "评论内容"] + LABEL_FIELDS + ["status"]].to_excel(path, index=False)
+    return len(df)
+
+#------------------------------------------------------------------------------------------旧结果文件导入
+def legacy_status(sentiment, values):
+    """根据旧 result*.xlsx 中 sentiment 列的错误字符串判断状态"""
+    if isinstance(sentiment, str):
+        if sentiment == "API调用失败" or "API错误" in sentiment:
+            return STATUS_API_FAILED, sentiment
+        if sentiment == "超时失败":
+            return STATUS_TIMEOUT, sentiment
+        if sentiment.startswith("处理错误"):
+            return STATUS_ERROR, sentiment
+    if all(v == 0 for v in values):  # parse_response 对 "API调用失败" 返回全0
+        return STATUS_API_FAILED, None
+    labels = dict(zip(LABEL_FIELDS, values))
+    for field in ("valence", "arousal", "dominance"):
+        labels[field] = pd.to_numeric(labels[field], errors="coerce")
+    if invalid_fields(labels):
+        return STATUS_PARSE_FAILED, None
+    return STATUS_OK, None
+
+
+def read_legacy_excel(path):
+    """旧结果文件续传后会丢失表头，这里统一按列位置读取，首行是表头时去掉"""
+    df = pd.read_excel(path, header=None)
+    if len(df) and [str(v) for v in df.iloc[0, :len(LEGACY_COLUMNS)]] in (
+            LEGACY_COLUMNS, ["topic", "评论内容"] + LABEL_FIELDS):
+        df = df.iloc[1:]
+    df = df.iloc[:, :len(LEGACY_COLUMNS)]
+    df.columns = LEGACY_COLUMNS[:df.shape[1]]
+    return df.reset_index(drop=True)
+
+
+def import_legacy(con, paths, model=None, prompt_version="legacy"):
+    """把 result1..result6.xlsx 导入结果库，文件按先后顺序，后导入的覆盖先导入的"""
+    total = 0
+    for path in paths:
+        df = read_legacy_excel(path)
+        records = []
+        for row in df.itertuples(index=False):
+            topic = "" if pd.isna(row[0]) else str(row[0])
+            comment = "" if pd.isna(row[1]) else str(row[1])
+            values = list(row[2:])
+            status, error = legacy_status(values[0], values)
+            labels = {}
+            if status in (STATUS_OK, STATUS_PARSE_FAILED):
+                for field, value in zip(LABEL_FIELDS, values):
+                    if field in ("sentiment", "user_origin"):
+                        labels[field] = None if pd.isna(value) else str(value)
+                    else:
+                        labels[field] = pd.to_numeric(value, errors="coerce")
+                        labels[field] = None if pd.isna(labels[field]) else int(labels[field])
+                for field in invalid_fields(labels):  # 旧文件中解析失败记为0的字段，留给修复流程
+                    labels[field] = None
+            records.append(make_record(label_key(None, topic, comment), topic, comment, labels, status, error,
+                                       model=model, prompt_version=prompt_version))
+        total += upsert(con, records)
+        print(f"已导入 {path}：{len(records)} 行")
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LLM 标注结果库")
+    parser.add_argument("--db", default=DB_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import", help="导入旧版 result*.xlsx")
+    p_import.add_argument("files", nargs="+")
+    p_import.add_argument("--model", default="deepseek-ai/DeepSeek-V3")
+    sub.add_parser("stats", help="按主题和状态统计")
+    p_export = sub.add_parser("export", help="导出 ok 结果（附件四的列名）")
+    p_export.add_argument("out")
+    args = parser.parse_args(argv)
+
+    con = connect(args.db)
+    if args.command == "import":
+        import_legacy(con, args.files, model=args.model)
+        print(status_counts(con).to_string(index=False))
+    elif args.command == "stats":
+        print(status_counts(con).to_string(index=False))
+    elif args.command == "export":
+        df = select_ok(con)
+        if args.out.endswith(".csv"):
+            df.to_csv(args.out, index=False, encoding="utf-8-sig")
+        else:
+            df.to_excel(args.out, index=False)
+        print(f"已导出 {len(df)} 行 -> {args.out}")
+    con.close()
+
+
+if __name__ == "__main__":
+    main()
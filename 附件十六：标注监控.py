@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import threading
+
+import requests
+
+# 请求延迟直方图的分桶上界（秒）
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 30)
+EXPORT_INTERVAL = 10  # 状态文件写出间隔（秒）
+FAILURE_CAUSES = ("timeout", "429", "5xx", "4xx", "connection", "parse_failure", "other")
+
+
+def classify_error(exc):
+    """把请求异常归类为 timeout / 429 / 5xx / 4xx / connection / other"""
+    if isinstance(exc, requests.exceptions.Timeout):
+        return "timeout"
+    if isinstance(exc, requests.exceptions.HTTPError) and exc.response is not None:
+        status = exc.response.status_code
+        if status == 429:
+            return "429"
+        return "5xx" if status >= 500 else "4xx"
+    if isinstance(exc, requests.exceptions.ConnectionError):
+        return "connection"
+    return "other"
+
+
+class LabelingMetrics:
+    """
+    标注任务的运行指标：请求延迟直方图、token 用量、按原因统计的失败/重试次数、缓存命中、吞吐量和 ETA
+    定期写出 JSON 状态文件或 Prometheus 文本格式文件（fmt="prometheus"），供其他工具读取
+    """
+
+    def __init__(self, job, total_rows, status_path, fmt="json", interval=EXPORT_INTERVAL, done_rows=0):
+        self.job = job
+        self.total_rows = total_rows
+        self.status_path = status_path
+        self.fmt = fmt
+        self.interval = interval
+        self.start_time = time.time()
+        self.start_rows = done_rows  # 续传时已完成的行不计入本次吞吐量
+        self.rows = done_rows
+        self.requests = 0
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.tokens = {"prompt": 0, "completion": 0, "cached": 0}
+        self.failures = {cause: 0 for cause in FAILURE_CAUSES}
+        self.cache_hits = 0
+        self.truncation = {"texts": 0, "tokens_before": 0, "tokens_saved": 0}
+        self.prompt_prefixes = {}  # 系统消息哈希 -> 估计 token 数
+        self.tiers = {}  # 模型梯度级别 -> {"model", "requests", "latency_sum", "rows"}
+        self.pool = None  # 附件二十二的密钥池，登记后状态文件中包含各密钥的用量
+        self.models = {}
+        self._last_export = 0.0
+        self._lock = threading.Lock()
+
+    def observe_request(self, latency, usage=None, model=None):
+        """记录一次成功的请求；usage 为响应中的 usage 字段"""
+        with self._lock:
+            self.requests += 1
+            self.latency_sum += latency
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    self.latency_counts[i] += 1
+                    break
+            else:
+                self.latency_counts[-1] += 1
+            if usage:
+                self.tokens["prompt"] += usage.get("prompt_tokens", 0) or 0
+                self.tokens["completion"] += usage.get("completion_tokens", 0) or 0
+                details = usage.get("prompt_tokens_details") or {}
+                # 不同服务商字段名不同：OpenAI 风格为 prompt_tokens_details.cached_tokens，DeepSeek 为 prompt_cache_hit_tokens
+                self.tokens["cached"] += details.get("cached_tokens", 0) or usage.get("prompt_cache_hit_tokens", 0) or 0
+            if model:
+                self.models[model] = self.models.get(model, 0) + 1
+
+    def record_failure(self, cause):
+        with self._lock:
+            self.failures[cause if cause in self.failures else "other"] += 1
+
+    def _tier(self, tier, model=None):
+        entry = self.tiers.setdefault(tier, {"model": model, "requests": 0, "latency_sum": 0.0, "rows": 0})
+        entry["model"] = model or entry["model"]
+        return entry
+
+    def observe_tier(self, tier, model, latency):
+        """记录模型梯度（附件二十一）某一级的一次请求耗时"""
+        with self._lock:
+            entry = self._tier(tier, model)
+            entry["requests"] += 1
+            entry["latency_sum"] += latency
+
+    def record_routed(self, tier):
+        """一行最终由第 tier 级给出结果"""
+        with self._lock:
+            self._tier(tier)["rows"] += 1
+
+    def escalation_rate(self):
+        routed = sum(entry["rows"] for entry in self.tiers.values())
+        escalated = sum(entry["rows"] for tier, entry in self.tiers.items() if tier > 0)
+        return escalated / routed if routed else 0.0
+
+    def register_pool(self, pool):
+        self.pool = pool
+
+    def register_prompt(self, builder):
+        """登记本次运行使用的固定系统消息（附件二十 PromptBuilder）"""
+        with self._lock:
+            self.prompt_prefixes[builder.fingerprint] = builder.system_tokens
+
+    def cache_ratio(self):
+        """服务商报告的缓存命中 token 占 prompt token 的比例"""
+        return self.tokens["cached"] / self.tokens["prompt"] if self.tokens["prompt"] else 0.0
+
+    def record_truncation(self, tokens_before, tokens_after):
+        """记录一次文本清理/裁剪（附件十九）前后的 token 估计"""
+        with self._lock:
+            self.truncation["tokens_before"] += tokens_before
+            if tokens_after < tokens_before:
+                self.truncation["texts"] += 1
+                self.truncation["tokens_saved"] += tokens_before - tokens_after
+
+    def record_cache_hit(self):
+        with self._lock:
+            self.cache_hits += 1
+
+    def record_row(self):
+        with self._lock:
+            self.rows += 1
+        self.maybe_export()
+
+    def record_skipped(self, n=1):
+        """流式续传时边读边跳过的已完成行：计入进度，不计入本次吞吐量"""
+        with self._lock:
+            self.rows += n
+            self.start_rows += n
+
+    def rows_per_second(self):
+        elapsed = time.time() - self.start_time
+        return (self.rows - self.start_rows) / elapsed if elapsed > 0 else 0.0
+
+    def eta_seconds(self):
+        rate = self.rows_per_second()
+        if rate <= 0 or self.total_rows is None:  # 流式读取时总行数可能未知
+            return None
+        return (self.total_rows - self.rows) / rate
+
+    def snapshot(self):
+        with self._lock:
+            buckets, cumulative = {}, 0
+            for bound, count in zip([*LATENCY_BUCKETS, "+Inf"], self.latency_counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            return {
+                "job": self.job,
+                "updated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "elapsed_seconds": round(time.time() - self.start_time, 1),
+                "rows_done": self.rows,
+                "rows_total": self.total_rows,
+                "rows_per_second": round(self.rows_per_second(), 3),
+                "eta_seconds": None if self.eta_seconds() is None else round(self.eta_seconds(), 1),
+                "requests": self.requests,
+                "latency_seconds": {"buckets": buckets, "sum": round(self.latency_sum, 3),
+                                    "mean": round(self.latency_sum / self.requests, 3) if self.requests else None},
+                "tokens": dict(self.tokens),
+                "prompt_cache_ratio": round(self.cache_ratio(), 4),
+                "prompt_prefixes": dict(self.prompt_prefixes),
+                "failures": dict(self.failures),
+                "cache_hits": self.cache_hits,
+                "truncation": dict(self.truncation),
+                "escalation_rate": round(self.escalation_rate(), 4),
+                "tiers": {str(tier): {**entry, "latency_sum": round(entry["latency_sum"], 3),
+                                      "latency_mean": round(entry["latency_sum"] / entry["requests"], 3)
+                                      if entry["requests"] else None}
+                          for tier, entry in sorted(self.tiers.items())},
+                "models": dict(self.models),
+                "keys": self.pool.usage() if self.pool else [],
+            }
+
+    def to_prometheus(self, snap):
+        job = f'job="{self.job}"'
+        lines = [
+            "# TYPE xhs_label_rows_total counter", f"xhs_label_rows_total{{{job}}} {snap['rows_done']}",
+            "# TYPE xhs_label_rows_target gauge", f"xhs_label_rows_target{{{job}}} {'NaN' if snap['rows_total'] is None else snap['rows_total']}",
+            "# TYPE xhs_label_rows_per_second gauge", f"xhs_label_rows_per_second{{{job}}} {snap['rows_per_second']}",
+            "# TYPE xhs_label_eta_seconds gauge", f"xhs_label_eta_seconds{{{job}}} {snap['eta_seconds'] or 'NaN'}",
+            "# TYPE xhs_label_request_seconds histogram",
+        ]
+        for bound, count in snap["latency_seconds"]["buckets"].items():
+            lines.append(f'xhs_label_request_seconds_bucket{{{job},le="{bound}"}} {count}')
+        lines += [f"xhs_label_request_seconds_sum{{{job}}} {snap['latency_seconds']['sum']}",
+                  f"xhs_label_request_seconds_count{{{job}}} {snap['requests']}",
+                  "# TYPE xhs_label_tokens_total counter"]
+        lines += [f'xhs_label_tokens_total{{{job},type="{k}"}} {v}' for k, v in snap["tokens"].items()]
+        lines += ["# TYPE xhs_label_prompt_cache_ratio gauge",
+                  f"xhs_label_prompt_cache_ratio{{{job}}} {snap['prompt_cache_ratio']}"]
+        lines.append("# TYPE xhs_label_failures_total counter")
+        lines += [f'xhs_label_failures_total{{{job},cause="{k}"}} {v}' for k, v in snap["failures"].items()]
+        lines += ["# TYPE xhs_label_cache_hits_total counter", f"xhs_label_cache_hits_total{{{job}}} {snap['cache_hits']}",
+                  "# TYPE xhs_label_truncated_texts_total counter",
+                  f"xhs_label_truncated_texts_total{{{job}}} {snap['truncation']['texts']}",
+                  "# TYPE xhs_label_tokens_saved_total counter",
+                  f"xhs_label_tokens_saved_total{{{job}}} {snap['truncation']['tokens_saved']}",
+                  "# TYPE xhs_label_escalation_ratio gauge",
+                  f"xhs_label_escalation_ratio{{{job}}} {snap['escalation_rate']}"]
+        for name, key in [("xhs_label_tier_request_seconds_sum", "latency_sum"),
+                          ("xhs_label_tier_requests_total", "requests"), ("xhs_label_tier_rows_total", "rows")]:
+            lines.append(f"# TYPE {name} counter")
+            lines += [f'{name}{{{job},tier="{tier}",model="{entry["model"]}"}} {entry[key]}'
+                      for tier, entry in snap["tiers"].items()]
+        for name, key in [("xhs_label_key_requests_total", "requests"), ("xhs_label_key_tokens_total", "tokens"),
+                          ("xhs_label_key_rate_limited_total", "rate_limited"),
+                          ("xhs_label_key_auth_failures_total", "auth_failures")]:
+            lines.append(f"# TYPE {name} counter")
+            lines += [f'{name}{{{job},key="{entry["key"]}"}} {entry[key]}' for entry in snap["keys"]]
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        """原子写出状态文件（先写临时文件再替换），读取方不会读到半个文件"""
+        snap = self.snapshot()
+        content = self.to_prometheus(snap) if self.fmt == "prometheus" else json.dumps(snap, ensure_ascii=False, indent=2)
+        tmp_path = f"{self.status_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, self.status_path)
+        self._last_export = time.time()
+        return snap
+
+    def maybe_export(self):
+        if time.time() - self._last_export >= self.interval:
+            try:
+                self.export()
+            except OSError as e:
+                print(f"状态文件写出失败: {str(e)[:30]}")
+
+    def postfix(self):
+        """tqdm 进度条后缀"""
+        return {"行/秒": f"{self.rows_per_second():.2f}", "tokens": self.tokens["prompt"] + self.tokens["completion"],
+                "失败": sum(self.failures.values()), "缓存": self.cache_hits}
+
+    def summary(self):
+        snap = self.export()
+        failures = ", ".join(f"{k}={v}" for k, v in snap["failures"].items() if v) or "无"
+        return (f"请求 {snap['requests']} 次，平均延迟 {snap['latency_seconds']['mean']}s，"
+                f"prompt tokens {snap['tokens']['prompt']}（缓存 {snap['tokens']['cached']}，"
+                f"{snap['prompt_cache_ratio']:.1%}），"
+                f"completion tokens {snap['tokens']['completion']}，失败：{failures}，缓存命中 {snap['cache_hits']}，"
+                f"裁剪 {snap['truncation']['texts']} 条文本，节省约 {snap['truncation']['tokens_saved']} tokens"
+                + self.tier_summary(snap) + (f"\n{self.pool.summary()}" if self.pool else ""))
+
+    @staticmethod
+    def tier_summary(snap):
+        if not snap["tiers"]:
+            return ""
+        tiers = "；".join(f"{entry['model']}：{entry['rows']} 行，{entry['requests']} 次请求，平均 {entry['latency_mean']}s"
+                         for entry in snap["tiers"].values())
+        return f"\n模型梯度：升级率 {snap['escalation_rate']:.1%}；{tiers}"
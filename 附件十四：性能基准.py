@@ -0,0 +1,183 @@
+import os
+import gc
+import json
+import time
+import argparse
+import tempfile
+import importlib
+import tracemalloc
+
+os.environ.setdefault("MPLBACKEND", "Agg")  # 基准测试中 plt.show() 不阻塞
+
+# 基准测试配置
+BASELINE_FILE = "benchmarks/baseline.json"  # 基线结果
+LATEST_FILE = "benchmarks/latest.json"  # 最近一次结果
+DEFAULT_SCALES = [10_000, 100_000]  # 评论行数（帖子数为其 1/10）
+TOLERANCE = 0.25  # 耗时超过基线 25% 视为退化
+NOISE_FLOOR = 0.05  # 耗时差小于 0.05 秒时忽略
+LOAD_DATA_MAX_ROWS = 200_000  # load_data 需要先写出 Excel，超过该规模时跳过
+
+synthetic = importlib.import_module("附件十三：合成数据")
+analysis = importlib.import_module("附件三：dataAnalysis")
+resonance = importlib.import_module("附件四：跨文化情感共鸣分析")
+segment = importlib.import_module("附件六：分词")
+
+
+def _quiet(func, *args, **kwargs):
+    """屏蔽被测函数的打印输出"""
+    import contextlib, io
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+#------------------------------------------------------------------------------------------各被测函数的准备与调用
+def prepare_load_data(posts, comments):
+    tmp = tempfile.TemporaryDirectory(prefix="bench_xhs_")
+    posts.to_excel(os.path.join(tmp.name, "帖子.xlsx"), index=False)
+    comments.to_excel(os.path.join(tmp.name, "评论.xlsx"), index=False)
+    run = lambda: _quiet(analysis.load_data, tmp.name)
+    run.cleanup = tmp.cleanup  # 计时结束后删除临时目录
+    return run
+
+
+def prepare_clean_column(posts, comments):
+    series = comments["点赞数"]
+    return lambda: analysis.clean_column(series)
+
+
+def prepare_emotion_impact(posts, comments):
+    data = _quiet(analysis.preprocess_data, {"posts": posts.copy(), "comments": comments.copy()})
+    return lambda: _quiet(analysis.analyze_emotion_impact, data)
+
+
+def prepare_help_content(posts, comments):
+    data = _quiet(analysis.preprocess_data, {"posts": posts.copy(), "comments": comments.copy()})
+    return lambda: _quiet(analysis.analyze_help_content, data)
+
+
+def prepare_topic_resonance(posts, comments):
+    df_clean = resonance.clean_results(comments.rename(columns={"笔记topic": "topic"}))
+    groups = [group for _, group in df_clean.groupby("topic")]
+    return lambda: [resonance.calculate_topic_resonance(group) for group in groups]
+
+
+def prepare_topic_bootstrap(posts, comments):
+    df_clean = resonance.clean_results(comments.rename(columns={"笔记topic": "topic"}))
+    tasks = resonance.build_resampling_tasks(df_clean)
+    return lambda: [resonance.bootstrap_topic_resonance(task) for task in tasks]
+
+
+def prepare_word_cloud(posts, comments):
+    from PIL import ImageFont
+    from wordcloud import WordCloud
+    params = dict(segment.CLOUD_PARAMS)
+    try:
+        ImageFont.truetype(params["font_path"], 12)
+    except OSError:
+        params.pop("font_path")  # 没有 simhei.ttf 时使用 wordcloud 自带字体
+    texts = comments.loc[comments["笔记topic"] == synthetic.TOPICS[0], "评论内容"]
+    import jieba
+    jieba.initialize()  # 词典加载不计入耗时
+    return lambda: WordCloud(**params).generate_from_frequencies(segment.word_frequencies(texts))
+
+
+BENCHMARKS = {
+    "load_data": prepare_load_data,
+    "clean_column": prepare_clean_column,
+    "analyze_emotion_impact": prepare_emotion_impact,
+    "analyze_help_content": prepare_help_content,
+    "calculate_topic_resonance": prepare_topic_resonance,
+    "bootstrap_topic_resonance": prepare_topic_bootstrap,
+    "word_cloud": prepare_word_cloud,
+}
+
+#------------------------------------------------------------------------------------------计时与对比
+def measure(run, memory=True):
+    """返回 (耗时秒数, tracemalloc 峰值MB)；内存单独再跑一次，避免 tracemalloc 影响计时"""
+    import matplotlib.pyplot as plt  # 在计时开始前导入，导入耗时不计入第一个被测函数
+    gc.collect()
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+    plt.close("all")
+    peak_mb = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        run()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+        plt.close("all")
+    return seconds, peak_mb
+
+
+def run_benchmarks(scales, names, memory=True):
+    results = {}
+    for scale in scales:
+        comments = synthetic.generate_comments(scale, max(1, scale // 10))
+        posts = synthetic.generate_posts(max(1, scale // 10))
+        for name in names:
+            if name == "load_data" and scale > LOAD_DATA_MAX_ROWS:
+                print(f"{name:<28}{scale:>10}  跳过（超过 LOAD_DATA_MAX_ROWS）")
+                continue
+            run = BENCHMARKS[name](posts, comments)
+            try:
+                seconds, peak_mb = measure(run, memory)
+            finally:
+                getattr(run, "cleanup", lambda: None)()
+            results.setdefault(name, {})[str(scale)] = {"seconds": round(seconds, 4),
+                                                        "peak_mb": None if peak_mb is None else round(peak_mb, 1)}
+            peak = "" if peak_mb is None else f"{peak_mb:>10.1f} MB"
+            print(f"{name:<28}{scale:>10}{seconds:>10.3f} s{peak}")
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance=TOLERANCE):
+    """返回退化列表 [(函数, 规模, 基线耗时, 当前耗时)]"""
+    regressions = []
+    for name, by_scale in results.items():
+        for scale, current in by_scale.items():
+            base = baseline.get(name, {}).get(scale)
+            if not base:
+                continue
+            if (current["seconds"] > base["seconds"] * (1 + tolerance)
+                    and current["seconds"] - base["seconds"] > NOISE_FLOOR):
+                regressions.append((name, scale, base["seconds"], current["seconds"]))
+    return regressions
+
+
+def save_json(path, payload):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="各分析函数在不同数据规模下的耗时与内存基准")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES, help="评论行数，例如 10000 100000 1000000")
+    parser.add_argument("--functions", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--no-memory", action="store_true", help="不统计内存峰值（更快）")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.scales, args.functions, memory=not args.no_memory)
+    save_json(LATEST_FILE, results)
+    if args.save_baseline:
+        save_json(BASELINE_FILE, results)
+        print(f"基线已保存至 {BASELINE_FILE}")
+        return
+    if not os.path.exists(BASELINE_FILE):
+        print(f"未找到基线 {BASELINE_FILE}，可使用 --save-baseline 生成")
+        return
+    with open(BASELINE_FILE, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    for name, scale, base, current in regressions:
+        print(f"性能退化：{name} @ {scale} 行，基线 {base:.3f} s -> 当前 {current:.3f} s")
+    if regressions:
+        raise SystemExit(1)
+    print("未发现性能退化")
+
+
+if __name__ == "__main__":
+    main()
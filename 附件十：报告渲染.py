@@ -0,0 +1,191 @@
+import os
+import re
+import json
+import html
+import hashlib
+import inspect
+import functools
+import importlib
+import warnings
+from types import ModuleType
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# 无界面报告配置
+REPORT_DIR = "report"  # 图片与 index.html 的输出目录
+FORMATS = ("png", "svg")  # 输出格式
+DPI = 150
+N_WORKERS = None  # 进程数，None 表示使用全部CPU核
+MANIFEST = "manifest.json"  # 记录每张图的缓存键
+RENDER_VERSION = 1  # 绘图环境中不在附件源码里的改动（字体文件、matplotlib 全局配置等）后加1，使已缓存的图片失效
+
+
+def figure_job(name, module, func, *args, **kwargs):
+    """描述一张（或一组）图：由 module 中的 func(*args, **kwargs) 绘制"""
+    return {"name": name, "module": module, "func": func, "args": args, "kwargs": kwargs}
+
+
+def _hash_value(value, h):
+    if isinstance(value, pd.DataFrame) or isinstance(value, pd.Series):
+        h.update(str(list(value.columns) if isinstance(value, pd.DataFrame) else value.name).encode())
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, dict):
+        for key in sorted(value, key=str):
+            h.update(str(key).encode())
+            _hash_value(value[key], h)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _hash_value(item, h)
+    else:
+        h.update(repr(value).encode())
+
+
+@functools.lru_cache(maxsize=None)
+def code_digest(module_name):
+    """绘图模块及其递归引用的附件模块（降采样、pyplot(rc) 等辅助函数所在）的源码哈希"""
+    h = hashlib.sha256()
+    seen, todo = set(), [importlib.import_module(module_name)]
+    while todo:
+        module = todo.pop()
+        if module.__name__ in seen:
+            continue
+        seen.add(module.__name__)
+        h.update(module.__name__.encode())
+        h.update(inspect.getsource(module).encode())
+        todo.extend(value for value in vars(module).values()
+                    if isinstance(value, ModuleType) and value.__name__.startswith("附件"))
+    return h.hexdigest()
+
+
+def job_key(job):
+    """缓存键：绘图代码（含辅助模块）+ 输入数据 + 参数 + 渲染版本的哈希，任一变化都会重新绘制"""
+    import matplotlib
+    h = hashlib.sha256()
+    h.update(f"{RENDER_VERSION}|{matplotlib.__version__}|{job['module']}|{job['func']}".encode())
+    h.update(code_digest(job["module"]).encode())
+    _hash_value(job["args"], h)
+    _hash_value(job["kwargs"], h)
+    return h.hexdigest()
+
+
+def _render_job(job, out_dir, formats, dpi):
+    """在子进程中以 Agg 后端绘图，保存该函数产生的全部图片"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    func = getattr(importlib.import_module(job["module"]), job["func"])
+    plt.close("all")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # Agg 下 plt.show() 的提示
+        func(*job["args"], **job["kwargs"])
+    files = []
+    for i, num in enumerate(plt.get_fignums()):
+        fig = plt.figure(num)
+        for fmt in formats:
+            safe_name = re.sub(r'[\\/:*?"<>|]', "_", job["name"])  # 话题名中可能含有路径字符
+            file_name = f"{safe_name}_{i + 1}.{fmt}"
+            fig.savefig(os.path.join(out_dir, file_name), dpi=dpi, bbox_inches="tight")
+            files.append(file_name)
+    plt.close("all")
+    return files
+
+
+def write_index(out_dir, manifest, order):
+    """生成包含全部图片的 index.html"""
+    sections = []
+    for name in order:
+        images = [f for f in manifest[name]["files"] if f.endswith((".png", ".svg"))]
+        shown = [f for f in images if f.endswith(".png")] or images  # 优先展示 png，svg 作为链接
+        body = "\n".join(f'<img src="{html.escape(f)}" style="max-width:100%">' for f in shown)
+        links = " ".join(f'<a href="{html.escape(f)}">{html.escape(f)}</a>' for f in images)
+        sections.append(f"<h2>{html.escape(name)}</h2>\n{body}\n<p>{links}</p>")
+    page = ("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>分析报告</title></head><body>\n"
+            "<h1>小红书'TikTok难民'事件数据分析报告</h1>\n" + "\n".join(sections) + "\n</body></html>\n")
+    index_path = os.path.join(out_dir, "index.html")
+    with open(index_path, "w", encoding="utf-8") as f:
+        f.write(page)
+    return index_path
+
+
+def render_report(jobs, out_dir=REPORT_DIR, formats=FORMATS, dpi=DPI, n_workers=N_WORKERS):
+    """
+    并行渲染所有图，输入与参数未变化的图直接跳过
+    返回 index.html 路径
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    os.environ["MPLBACKEND"] = "Agg"
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    pending = {}
+    for job in jobs:
+        key = job_key(job)
+        cached = manifest.get(job["name"])
+        if (cached and cached["key"] == key and cached["files"]
+                and all(os.path.exists(os.path.join(out_dir, f)) for f in cached["files"])):
+            continue
+        pending[job["name"]] = (job, key)
+    print(f"共 {len(jobs)} 张图，{len(jobs) - len(pending)} 张未变化已跳过，{len(pending)} 张需要绘制")
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = {name: executor.submit(_render_job, job, out_dir, formats, dpi)
+                       for name, (job, key) in pending.items()}
+            for name, future in futures.items():
+                try:
+                    manifest[name] = {"key": pending[name][1], "files": future.result()}
+                except Exception as e:
+                    print(f"绘制 {name} 失败: {str(e)}")
+                    manifest.pop(name, None)
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    index_path = write_index(out_dir, manifest, [job["name"] for job in jobs if job["name"] in manifest])
+    print(f"报告已生成：{index_path}")
+    return index_path
+
+
+def collect_jobs(data_dir="xhs_data", labeled_path=None):
+    """收集附件三、附件五、附件八的全部图，labeled_path 为空时使用各脚本中配置的文件"""
+    jobs = []
+    analysis = importlib.import_module("附件三：dataAnalysis")
+    try:
+        data = analysis.load_data(data_dir)
+        data = {"posts": data["posts"], "comments": data["comments"]}
+        for func in ["analyze_bilingual_advantage", "analyze_content_preference",
+                     "analyze_emotion_impact", "analyze_help_content"]:
+            jobs.append(figure_job(func, analysis.__name__, func, data))
+    except Exception as e:
+        print(f"附件三数据加载失败: {str(e)}")
+
+    topic_module = importlib.import_module("附件五：话题筛选")
+    try:
+        df = topic_module.load_topic_data(labeled_path or topic_module.file_path)
+        topic_daily = topic_module.compute_topic_daily(df)
+        topic_overall, high_volume_threshold = topic_module.classify_topics(topic_module.compute_topic_overall(df))
+        jobs.append(figure_job("话题象限图", topic_module.__name__, "plot_topic_quadrant",
+                               topic_overall, high_volume_threshold))
+        for topic in topic_daily['笔记topic'].unique():
+            jobs.append(figure_job(f"话题演化_{topic}", topic_module.__name__, "volume_sentiment_analyse",
+                                   topic, topic_daily[topic_daily['笔记topic'] == topic]))
+    except Exception as e:
+        print(f"附件五数据加载失败: {str(e)}")
+
+    volume_module = importlib.import_module("附件八：话题声量分析")
+    try:
+        topic_volume_over_time = volume_module.compute_topic_volume(
+            volume_module.load_volume_data(labeled_path or volume_module.file_path))
+        jobs.append(figure_job("话题声量趋势", volume_module.__name__, "plot_topic_volume", topic_volume_over_time))
+        jobs.append(figure_job("每日总声量", volume_module.__name__, "plot_daily_total_volume", topic_volume_over_time))
+    except Exception as e:
+        print(f"附件八数据加载失败: {str(e)}")
+    return jobs
+
+
+if __name__ == "__main__":
+    render_report(collect_jobs())
@@ -1,28 +1,20 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy.stats import pearsonr
 from collections import defaultdict
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+import importlib
 import os
 
-plt.rcParams["font.family"] = ["SimHei", "WenQuanYi Micro Hei", "Heiti TC"]
+PLOT_RC = {"font.family": ["SimHei", "WenQuanYi Micro Hei", "Heiti TC"]}
+plotting = importlib.import_module("附件十一：降采样绘图")  # 绘图时才导入 matplotlib / seaborn
+tracing = importlib.import_module("附件十五：性能追踪")
+store = importlib.import_module("附件十八：标注结果库")
 
 
 data_dir = "results" 
 file_names = [f"result{i}.xlsx" for i in range(1, 7)] 
-
-all_data = []
-for file in file_names:
-    file_path = os.path.join(data_dir, file)
-    if not os.path.exists(file_path):
-        print(f"警告：文件 {file_path} 不存在，已跳过")
-        continue
-    df = pd.read_excel(file_path)
-    all_data.append(df)
-
-df_combined = pd.concat(all_data, ignore_index=True)
-
+result_db = store.DB_PATH  # 附件二写入的标注结果库（路径在附件十八中配置），存在时优先使用
 
 valid_topics = [
     "tiktok难民", "cattax", "Music", "取名", "物价对比", 
@@ -33,16 +25,62 @@ valid_sentiments = ["快乐", "悲伤", "厌恶", "恐惧", "愤怒", "惊讶",
                     "赞美", "感动", "疑惑", "对比", "中性","失望"]
 valid_origins = ["中国用户", "外国用户"]
 
-df_clean = df_combined[
-    (df_combined["topic"].isin(valid_topics)) &
-    (df_combined["sentiment"].isin(valid_sentiments)) &
-    (df_combined["user_origin"].isin(valid_origins))
-].copy()
+# 重抽样参数
+N_BOOT = 2000  # bootstrap 次数
+N_PERM = 2000  # 置换检验次数
+CI_LEVEL = 0.95  # 置信水平
+SEED = 42  # 随机种子，保证结果可复现；各主题使用由它派生的独立子种子
+BLOCK_SIZE = 500  # 每批重抽样的列数上限
+BLOCK_BYTES = 256 * 2 ** 20  # 每批重抽样矩阵的内存预算，样本多的主题自动减少每批列数
+BYTES_PER_CELL = 48  # 每个（样本×列）单元同时存活的字节数：索引矩阵、取值矩阵、中心化结果等约6个8字节数组
+N_WORKERS = None  # 进程数，None 表示使用全部CPU核
+
+
+@tracing.traced()
+def load_results(data_dir, file_names, dedup=True):
+    """读取并合并所有LLM结果文件，文件按编号先后视为由旧到新"""
+    all_data = []
+    for file in file_names:
+        file_path = os.path.join(data_dir, file)
+        if not os.path.exists(file_path):
+            print(f"警告：文件 {file_path} 不存在，已跳过")
+            continue
+        df = pd.read_excel(file_path)
+        all_data.append(df)
+
+    df_combined = pd.concat(all_data, ignore_index=True)
+    if dedup:
+        dedup_module = importlib.import_module("附件九：去重")
+        df_combined, _ = dedup_module.deduplicate(df_combined, name="LLM结果")
+    return df_combined
+
+
+@tracing.traced()
+def load_results_from_store(db_path):
+    """从标注结果库中只取 status=ok 且主题、用户来源有效的行（走索引，无需逐文件匹配错误字符串）"""
+    con = store.connect(db_path)
+    try:
+        return store.select_ok(con, topics=valid_topics, origins=valid_origins)
+    finally:
+        con.close()
+
+
+@tracing.traced()
+def clean_results(df_combined):
+    """过滤出主题、情感、用户来源均有效的数据"""
+    df_clean = df_combined[
+        (df_combined["topic"].isin(valid_topics)) &
+        (df_combined["sentiment"].isin(valid_sentiments)) &
+        (df_combined["user_origin"].isin(valid_origins))
+    ].copy()
+    for col in ["valence", "arousal", "dominance"]:
+        df_clean[col] = pd.to_numeric(df_clean[col], errors="coerce")
+    return df_clean.dropna(subset=["valence", "arousal", "dominance"])
 
-print(f"清洗后有效数据量：{len(df_clean)} 条")
 
 # 计算情感共鸣强度
 def calculate_topic_resonance(topic_group):
+    from scipy.stats import pearsonr
     cn_data = topic_group[topic_group["user_origin"] == "中国用户"]
     foreign_data = topic_group[topic_group["user_origin"] == "外国用户"]
     if len(cn_data) < 5 or len(foreign_data) < 5:  
@@ -70,29 +108,186 @@ def calculate_topic_resonance(topic_group):
         "dominance_corr": round(dominance_corr, 2)  # 支配度相关性
     }
 
-# 按主题分组计算共鸣强度
-resonance_list = []
-for topic, group in df_clean.groupby("topic"):
-    resonance = calculate_topic_resonance(group)
-    if resonance:
-        resonance_list.append(resonance)
+#------------------------------------------------------------------------------------------此线下方为批量重抽样引擎
+def columnwise_corr(x, Y):
+    """x 为长度 n 的向量，Y 为 n×B 矩阵，返回 x 与 Y 每一列的 Pearson 相关系数"""
+    xc = x - x.mean()
+    Yc = Y - Y.mean(axis=0)
+    denom = np.sqrt((xc ** 2).sum()) * np.sqrt((Yc ** 2).sum(axis=0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (xc @ Yc) / denom  # 常数列（方差为0）得到 nan
+
+
+def overlap_rates(cn_codes, foreign_codes, n_labels):
+    """cn_codes、foreign_codes 为 (样本数×B) 的情感编码矩阵，逐列计算情感标签重合率"""
+    n_boot = cn_codes.shape[1]
+    cols = np.arange(n_boot)
+    cn_present = np.zeros((n_boot, n_labels), dtype=bool)
+    foreign_present = np.zeros((n_boot, n_labels), dtype=bool)
+    cn_present[cols, cn_codes] = True  # 广播：每列出现过的情感置为 True
+    foreign_present[cols, foreign_codes] = True
+    common = (cn_present & foreign_present).sum(axis=1)
+    union = (cn_present | foreign_present).sum(axis=1)
+    return common / union
+
+
+def percentile_ci(values, level=CI_LEVEL):
+    """百分位法置信区间，忽略 nan"""
+    alpha = (1 - level) / 2
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return np.nan, np.nan
+    low, high = np.quantile(values, [alpha, 1 - alpha])
+    return low, high
+
+
+def resampling_block_size(n_rows, max_block=BLOCK_SIZE, budget=BLOCK_BYTES):
+    """按内存预算和主题样本数（中外合计）确定每批重抽样的列数，至少1列"""
+    return int(max(1, min(max_block, budget // (BYTES_PER_CELL * max(n_rows, 1)))))
+
+
+def bootstrap_topic_resonance(task, n_boot=N_BOOT, n_perm=N_PERM, seed=SEED,
+                              ci_level=CI_LEVEL, block_size=None):
+    """
+    单个主题的批量重抽样：
+    - VAD 相关性：每次从外国用户中有放回抽取 len(cn) 条，与中国用户配对计算相关性
+    - 情感重合率：中外两组分别 bootstrap 后计算重合率
+    - 置换检验：打乱用户来源标签，得到重合率的 p 值
+    重抽样以索引矩阵（样本数×B）表示，相关性按列批量计算；block_size 为空时按 BLOCK_BYTES 预算确定。
+    seed 可以是整数或 np.random.SeedSequence（bootstrap_all_topics 为每个主题派生独立的子种子）
+    """
+    topic, cn_vad, foreign_vad, cn_codes, foreign_codes, n_labels = task
+    n_cn, n_foreign = len(cn_vad), len(foreign_vad)
+    block_size = block_size or resampling_block_size(n_cn + n_foreign)
+    rng = np.random.default_rng(seed)
+
+    corr_samples = {dim: [] for dim in ["valence", "arousal", "dominance"]}
+    overlap_samples = []
+    for start in range(0, n_boot, block_size):
+        b = min(block_size, n_boot - start)
+        foreign_idx = rng.integers(0, n_foreign, size=(n_cn, b))
+        cn_idx = rng.integers(0, n_cn, size=(n_cn, b))
+        boot_foreign_idx = rng.integers(0, n_foreign, size=(n_foreign, b))
+        for k, dim in enumerate(corr_samples):
+            corr_samples[dim].append(columnwise_corr(cn_vad[:, k], foreign_vad[foreign_idx, k]))
+        overlap_samples.append(overlap_rates(cn_codes[cn_idx], foreign_codes[boot_foreign_idx], n_labels))
+
+    # 置换检验：合并两组后随机打乱，前 n_cn 条视为中国用户
+    observed = overlap_rates(cn_codes[:, None], foreign_codes[:, None], n_labels)[0]
+    pooled = np.concatenate([cn_codes, foreign_codes])
+    perm_hits = 0
+    for start in range(0, n_perm, block_size):
+        b = min(block_size, n_perm - start)
+        perm_idx = rng.random((len(pooled), b)).argsort(axis=0)
+        permuted = pooled[perm_idx]
+        perm_rates = overlap_rates(permuted[:n_cn], permuted[n_cn:], n_labels)
+        perm_hits += (perm_rates <= observed).sum()  # 重合率越低说明中外差异越大
+
+    result = {"topic": topic}
+    overlap_samples = np.concatenate(overlap_samples)
+    low, high = percentile_ci(overlap_samples, ci_level)
+    result["overlap_ci_low"], result["overlap_ci_high"] = round(low, 2), round(high, 2)
+    result["overlap_perm_p"] = round((perm_hits + 1) / (n_perm + 1), 4)
+    for dim, samples in corr_samples.items():
+        samples = np.concatenate(samples)
+        low, high = percentile_ci(samples, ci_level)
+        result[f"{dim}_corr_mean"] = round(np.nanmean(samples), 2) if not np.isnan(samples).all() else np.nan
+        result[f"{dim}_ci_low"], result[f"{dim}_ci_high"] = round(low, 2), round(high, 2)
+    return result
+
+
+def build_resampling_tasks(df_clean):
+    """把每个主题的数据转换为 numpy 数组，便于跨进程传递"""
+    sentiment_codes = {s: i for i, s in enumerate(valid_sentiments)}
+    tasks = []
+    for topic, group in df_clean.groupby("topic"):
+        cn_data = group[group["user_origin"] == "中国用户"]
+        foreign_data = group[group["user_origin"] == "外国用户"]
+        if len(cn_data) < 5 or len(foreign_data) < 5:
+            continue
+        tasks.append((
+            topic,
+            cn_data[["valence", "arousal", "dominance"]].to_numpy(dtype=float),
+            foreign_data[["valence", "arousal", "dominance"]].to_numpy(dtype=float),
+            cn_data["sentiment"].map(sentiment_codes).to_numpy(),
+            foreign_data["sentiment"].map(sentiment_codes).to_numpy(),
+            len(valid_sentiments),
+        ))
+    return tasks
+
+
+@tracing.traced()
+def bootstrap_all_topics(df_clean, n_workers=N_WORKERS, seed=SEED):
+    """在进程池中并行计算所有主题的置信区间，每个主题使用由 seed 派生的独立随机流"""
+    tasks = build_resampling_tasks(df_clean)
+    if not tasks:
+        return pd.DataFrame()
+    seeds = np.random.SeedSequence(seed).spawn(len(tasks))
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        results = list(executor.map(bootstrap_topic_resonance, tasks, repeat(N_BOOT), repeat(N_PERM), seeds))
+    return pd.DataFrame(results)
+
+
+@tracing.traced()
+def compute_resonance(df_clean):
+    """点估计与 bootstrap 置信区间合并后的共鸣强度表"""
+    # 按主题分组计算共鸣强度
+    resonance_list = []
+    for topic, group in df_clean.groupby("topic"):
+        resonance = calculate_topic_resonance(group)
+        if resonance:
+            resonance_list.append(resonance)
+
+    resonance_df = pd.DataFrame(resonance_list)
+    ci_df = bootstrap_all_topics(df_clean)
+    if not ci_df.empty:
+        resonance_df = resonance_df.merge(ci_df, on="topic", how="left")
+    return resonance_df
 
-resonance_df = pd.DataFrame(resonance_list)
-print("\n跨文化情感共鸣强度分析结果：")
-print(resonance_df.sort_values("sentiment_overlap_rate", ascending=False))
 
 # 共鸣强度可视化
-plt.figure(figsize=(14, 6))
-sns.barplot(
-    data=resonance_df.sort_values("sentiment_overlap_rate", ascending=False),
-    x="topic",
-    y="sentiment_overlap_rate",
-    palette="pastel"
-)
-plt.title("各主题跨文化情感标签重合率", fontsize=14)
-plt.xlabel("主题")
-plt.ylabel("情感标签重合率")
-plt.xticks(rotation=45, ha="right")
-plt.ylim(0, 1) 
-plt.tight_layout()
-plt.show()
+def plot_resonance(resonance_df):
+    import seaborn as sns
+    plt = plotting.pyplot(PLOT_RC)
+    plot_df = resonance_df.sort_values("sentiment_overlap_rate", ascending=False).reset_index(drop=True)
+    plt.figure(figsize=(14, 6))
+    sns.barplot(
+        data=plot_df,
+        x="topic",
+        y="sentiment_overlap_rate",
+        palette="pastel"
+    )
+    if "overlap_ci_low" in plot_df.columns:
+        # 误差线表示 bootstrap 置信区间
+        plt.errorbar(
+            x=np.arange(len(plot_df)),
+            y=plot_df["sentiment_overlap_rate"],
+            yerr=[(plot_df["sentiment_overlap_rate"] - plot_df["overlap_ci_low"]).clip(lower=0),
+                  (plot_df["overlap_ci_high"] - plot_df["sentiment_overlap_rate"]).clip(lower=0)],
+            fmt="none", ecolor="gray", capsize=4
+        )
+    plt.title("各主题跨文化情感标签重合率", fontsize=14)
+    plt.xlabel("主题")
+    plt.ylabel("情感标签重合率")
+    plt.xticks(rotation=45, ha="right")
+    plt.ylim(0, 1) 
+    plt.tight_layout()
+    plt.show()
+
+
+def main():
+    if os.path.exists(result_db):
+        df_combined = load_results_from_store(result_db)
+    else:
+        df_combined = load_results(data_dir, file_names)
+    df_clean = clean_results(df_combined)
+    print(f"清洗后有效数据量：{len(df_clean)} 条")
+
+    resonance_df = compute_resonance(df_clean)
+    print("\n跨文化情感共鸣强度分析结果：")
+    print(resonance_df.sort_values("sentiment_overlap_rate", ascending=False))
+    plot_resonance(resonance_df)
+
+
+if __name__ == "__main__":
+    main()